@@ -0,0 +1,163 @@
+"""
+Benchmark de sincronización a MIDI clock externo.
+
+Reproduce un stream de reloj (grabado o sintético con jitter) contra
+MidiClockFollower sin tiempo real y compara el jitter de los steps:
+  - crudo: step en la llegada de cada 6º tick (sin suavizado),
+  - suavizado: step en el instante predicho por el PLL (como en main.py).
+
+Con --out mide el reloj maestro (MidiClockSender) en tiempo real: retraso
+de cada tick respecto a su deadline absoluto, contra puertos nulos o los
+indicados, opcionalmente con el bucle de steps generando a la vez (--load).
+
+Uso:
+    python -m bench.clock_sync [--bpm 174] [--jitter 2.0] [--seconds 30]
+    python -m bench.clock_sync --file clock.txt
+    python -m bench.clock_sync --record "Puerto DAW" --file clock.txt --seconds 30
+    python -m bench.clock_sync --out [PUERTO ...] [--load --profile live_berlin]
+"""
+import argparse
+import statistics
+import time
+
+from core.clock import Clock
+from core.midi_clock import (
+    MidiClockFollower,
+    MidiClockSender,
+    load_clock_stream,
+    record_clock,
+    synthetic_clock_stream,
+)
+
+
+def simulate(events, alpha: float):
+    """
+    Devuelve (steps crudos, steps suavizados, seguidor). Antes de entregar
+    cada evento se disparan los steps cuyo deadline ya ha pasado, con la
+    información disponible hasta ese momento (igual que el bucle en vivo).
+    """
+    clock = Clock()
+    follower = MidiClockFollower(clock, alpha=alpha)
+    tps = follower.ticks_per_step
+
+    raw_steps = []
+    smooth_steps = []
+    next_tick = 0
+    epoch = follower.epoch
+
+    for t, kind, pos in events:
+        while True:
+            if follower.epoch != epoch:
+                epoch = follower.epoch
+                next_tick = -(-follower.epoch_tick // tps) * tps
+            deadline = follower.step_deadline(next_tick)
+            if deadline is None or deadline > t:
+                break
+            smooth_steps.append(deadline)
+            next_tick += tps
+
+        follower.feed(kind, t, pos)
+        if kind == "clock" and follower.running and (follower.ticks - 1) % tps == 0:
+            raw_steps.append(t)
+
+    return raw_steps, smooth_steps, follower
+
+
+def jitter_ms(times, skip: int = 16):
+    diffs = [b - a for a, b in zip(times, times[1:])][skip:]
+    if len(diffs) < 2:
+        return 0.0, 0.0
+    mean = statistics.fmean(diffs)
+    return statistics.pstdev(diffs) * 1000, max(abs(d - mean) for d in diffs) * 1000
+
+
+def measure_sender(ports, bpm: float, seconds: float, load_profile=None) -> None:
+    from core.ports import PortManager
+    from core.synth import MidiSynth, NullPort
+
+    if ports:
+        port_mgr = PortManager()
+        names = ports
+    else:
+        names = ["null"]
+        port_mgr = PortManager(lister=lambda: names, opener=lambda name: NullPort())
+
+    engine = None
+    clock = Clock(bpm=int(bpm))
+    if load_profile:
+        from core.engine import Engine
+        from core.profiles import ProfileManager
+
+        session = ProfileManager().load_profile(load_profile)
+        if session is None:
+            raise SystemExit(f"Perfil '{load_profile}' no encontrado")
+        engine = Engine(session, [MidiSynth(t.port_name, port=NullPort()) for t in session.tracks], seed=1)
+        engine.clock = clock
+
+    sender = MidiClockSender(clock, names, port_mgr=port_mgr)
+    sender.start()
+    sender.play()
+
+    end = time.monotonic() + seconds
+    steps = 0
+    while time.monotonic() < end:
+        if engine is not None:
+            # Bucle de steps en el hilo principal, como en vivo
+            engine.step()
+            steps += 1
+            time.sleep(clock.get_step_duration())
+        else:
+            time.sleep(0.05)
+    sender.stop()
+
+    mean, p99, worst = sender.jitter()
+    print(f"Reloj maestro: {bpm:.0f} bpm, {seconds:.0f} s, puertos {', '.join(names)}"
+          + (f", carga: {steps} steps de '{load_profile}'" if engine is not None else ""))
+    print(f"Ticks: {sender.ticks} enviados ({sender.dropped} descartados)")
+    print(f"Retraso por tick: media {mean:.3f} ms | p99 {p99:.3f} ms | máx {worst:.3f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de sync a MIDI clock")
+    parser.add_argument("--file", help="Stream grabado (segundos tipo [songpos] por línea)")
+    parser.add_argument("--record", metavar="PORT", help="Grabar desde un puerto de entrada a --file")
+    parser.add_argument("--bpm", type=float, default=174.0)
+    parser.add_argument("--jitter", type=float, default=2.0, help="Jitter sintético (ms, desviación)")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--alpha", type=float, default=0.08)
+    parser.add_argument("--out", nargs="*", metavar="PORT",
+                        help="Medir el reloj maestro (sin puertos: puerto nulo)")
+    parser.add_argument("--load", action="store_true", help="Con --out, generar steps a la vez")
+    parser.add_argument("--profile", default="live_berlin", help="Perfil para --load")
+    args = parser.parse_args()
+
+    if args.out is not None:
+        measure_sender(args.out, args.bpm, args.seconds, args.profile if args.load else None)
+        return
+
+    if args.record:
+        if not args.file:
+            raise SystemExit("--record necesita --file")
+        n = record_clock(args.record, args.file, args.seconds)
+        print(f"✓ {n} eventos grabados en {args.file}")
+        return
+
+    if args.file:
+        events = load_clock_stream(args.file)
+        source = args.file
+    else:
+        events = synthetic_clock_stream(args.bpm, args.seconds, args.jitter)
+        source = f"sintético {args.bpm} bpm, jitter {args.jitter} ms"
+
+    raw, smooth, follower = simulate(events, args.alpha)
+    raw_std, raw_max = jitter_ms(raw)
+    smooth_std, smooth_max = jitter_ms(smooth)
+
+    print(f"Fuente: {source} ({len(events)} eventos)")
+    print(f"Tempo estimado: {follower.bpm or 0:.3f} bpm (reenganches: {follower.relocks})")
+    print(f"Steps crudos:     {len(raw):5d} | jitter {raw_std:.3f} ms (máx {raw_max:.3f} ms)")
+    print(f"Steps suavizados: {len(smooth):5d} | jitter {smooth_std:.3f} ms (máx {smooth_max:.3f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Regresión de render con seeds fijos ("golden files").
+
+Para cada perfil de profiles/ (salvo last_session, que cambia al tocar) y
+cada seed fijo, genera dos streams de eventos:
+
+  - export: los mensajes del .mid que escribe MidiExporter.render_loop
+    (tick absoluto, tipo y campos de cada mensaje, pista a pista), con la
+    energía y los set_tempo de la automatización del perfil si tiene,
+  - engine: las notas que Engine.step entrega a los synths en un render
+    offline (step, pista, nota, velocidad, duración e instante en µs con
+    swing/micro), con un cambio de escena si el perfil tiene escenas.
+
+Cada stream se resume en un sha256 y se compara con el de
+bench/golden/<perfil>__<seed>.json. Si no coincide, se indica el primer
+evento distinto. Cada stream se genera dos veces: si difieren, algo usa
+aleatoriedad fuera del RNG de cada pista.
+
+Sirve para reescribir core/pattern.py o core/midi_export.py (rendimiento)
+con la garantía de que la música no cambia. Si un cambio musical es
+intencionado, se regeneran con --update.
+
+Uso:
+    python -m bench.golden                       # comprobar
+    python -m bench.golden --update              # regenerar
+    python -m bench.golden --profiles live_berlin --seeds 1 dark
+"""
+import argparse
+import hashlib
+import json
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import mido
+
+from core.automation import AutomationMap
+from core.engine import Engine, build_patterns
+from core.midi_export import MidiExporter
+from core.pattern import parse_seed
+from core.profiles import ProfileManager
+
+ROOT = Path(__file__).resolve().parent.parent
+GOLDEN_DIR = Path(__file__).resolve().parent / "golden"
+DEFAULT_SEEDS = ["1", "42", "dark"]
+EXCLUDED_PROFILES = {"last_session"}
+BARS = 4
+
+
+class RecordingSynth:
+    """Synth offline: apunta cada nota que le entrega el motor."""
+
+    def __init__(self, track: int, events: List[list], loop_state: dict) -> None:
+        self.track = track
+        self.events = events
+        self.loop_state = loop_state
+        self.online = True
+
+    def schedule_note(self, note: int, velocity: int, length: float, at: Optional[float] = None) -> None:
+        self.events.append([
+            self.loop_state["step"], self.track, note, velocity,
+            round(length * 1e6), None if at is None else round(at * 1e6),
+        ])
+
+    def process_pending(self) -> None:
+        pass
+
+
+def render_export(session, seed: Optional[int], bars: int) -> List[list]:
+    """Mensajes del .mid exportado: [pista, tick absoluto, tipo, campos...]."""
+    _, patterns, _ = build_patterns(session, seed)
+    energies = tempo_map = None
+    if session.automation:
+        # Como el render offline de main.py: automatización desde su compás 0
+        auto = AutomationMap(session.automation, session.steps)
+        steps = bars * session.steps
+        energies = auto.energies(0, steps, session.energy)
+        tempo_map = auto.tempo_map(0, steps, MidiExporter.TICKS_PER_BEAT // 4) or None
+    with tempfile.TemporaryDirectory(prefix="dm_golden_") as tmp:
+        path = MidiExporter(output_dir=tmp).render_loop(
+            patterns=[p.clone_for_export() for p in patterns],
+            track_names=[t.name for t in session.tracks],
+            bars=bars,
+            steps_per_bar=session.steps,
+            bpm=session.bpm,
+            energy=session.energy,
+            filename="golden",
+            energies=energies,
+            tempo_map=tempo_map,
+        )
+        mid = mido.MidiFile(path)
+    events = []
+    for i, track in enumerate(mid.tracks):
+        tick = 0
+        for msg in track:
+            tick += msg.time
+            fields = msg.dict()
+            events.append([i, tick, msg.type] + [fields[k] for k in sorted(fields) if k not in ("type", "time")])
+    return events
+
+
+def render_engine(session, seed: Optional[int], bars: int) -> List[list]:
+    """Notas que el motor entrega a los synths: [step, pista, nota, vel, dur µs, instante µs]."""
+    events: List[list] = []
+    loop_state = {"step": 0}
+    synths = [RecordingSynth(i, events, loop_state) for i in range(len(session.tracks))]
+    engine = Engine(session, synths, seed=seed)
+    slots = sorted(engine.scene_mgr.scenes)
+    t = 0.0
+    for k in range(bars * session.steps):
+        if k == session.steps and slots:
+            # Cambio de escena cuantizado al compás 2 (ruta de SceneBlock)
+            engine.queue_scene(slots[0])
+        loop_state["step"] = k
+        engine.step(at=t)
+        t += engine.clock.get_step_duration()
+    return events
+
+
+RENDERERS = {"export": render_export, "engine": render_engine}
+
+
+def digest(events: List[list]) -> str:
+    data = json.dumps(events, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def first_divergence(expected: List[list], actual: List[list]) -> str:
+    for i, (e, a) in enumerate(zip(expected, actual)):
+        if e != a:
+            return f"evento {i}: esperado {e}, obtenido {a}"
+    if len(expected) != len(actual):
+        i = min(len(expected), len(actual))
+        extra = actual[i] if len(actual) > len(expected) else expected[i]
+        return (
+            f"longitud {len(actual)} (esperada {len(expected)}); "
+            f"primer evento sin pareja ({i}): {extra}"
+        )
+    return "mismos eventos (cambió solo el formato)"
+
+
+def golden_path(profile: str, seed_text: str) -> Path:
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in seed_text)
+    return GOLDEN_DIR / f"{profile}__{safe}.json"
+
+
+def render_case(session, seed: Optional[int], bars: int) -> Dict[str, Dict]:
+    streams = {}
+    for name, render in RENDERERS.items():
+        events = render(session, seed, bars)
+        again = render(session, seed, bars)
+        streams[name] = {
+            "sha256": digest(events),
+            "count": len(events),
+            "deterministic": events == again,
+            "events": events,
+        }
+    return streams
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Regresión de render con seeds fijos")
+    parser.add_argument("--profiles", nargs="+", help="Perfiles (por defecto todos menos last_session)")
+    parser.add_argument("--seeds", nargs="+", default=DEFAULT_SEEDS, help="Seeds (enteros o texto, como en main.py)")
+    parser.add_argument("--bars", type=int, default=BARS)
+    parser.add_argument("--update", action="store_true", help="Regenerar los golden files")
+    args = parser.parse_args()
+
+    pm = ProfileManager(str(ROOT / "profiles"))
+    profiles = args.profiles or [p for p in pm.list_profiles() if p not in EXCLUDED_PROFILES]
+    GOLDEN_DIR.mkdir(exist_ok=True)
+
+    failures = 0
+    for profile in profiles:
+        session = pm.load_profile(profile)
+        if session is None:
+            print(f"✗ {profile}: perfil no encontrado o inválido")
+            failures += 1
+            continue
+        for seed_text in args.seeds:
+            seed = parse_seed(seed_text)
+            label = f"{profile} seed={seed_text}"
+            streams = render_case(session, seed, args.bars)
+            for name, st in streams.items():
+                if not st["deterministic"]:
+                    print(f"✗ {label} [{name}]: dos renders con el mismo seed no coinciden")
+                    failures += 1
+
+            path = golden_path(profile, seed_text)
+            if args.update:
+                data = {"profile": profile, "seed": seed_text, "seed_value": seed, "bars": args.bars}
+                data["streams"] = {
+                    name: {"sha256": st["sha256"], "count": st["count"], "events": st["events"]}
+                    for name, st in streams.items()
+                }
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+                    f.write("\n")
+                counts = ", ".join(f"{n} {st['count']} ev" for n, st in streams.items())
+                print(f"✓ {label}: {counts} -> {path.name}")
+                continue
+
+            if not path.exists():
+                print(f"✗ {label}: falta {path.name} (generar con --update)")
+                failures += 1
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                golden = json.load(f)
+            if golden.get("bars") != args.bars:
+                print(f"✗ {label}: el golden es de {golden.get('bars')} compases (--bars {args.bars})")
+                failures += 1
+                continue
+            for name, st in streams.items():
+                expected = golden["streams"].get(name)
+                if expected is None:
+                    print(f"✗ {label} [{name}]: stream ausente en {path.name}")
+                    failures += 1
+                elif expected["sha256"] == st["sha256"]:
+                    print(f"✓ {label} [{name}]: {st['count']} ev, {st['sha256'][:12]}")
+                else:
+                    print(f"✗ {label} [{name}]: {first_divergence(expected['events'], st['events'])}")
+                    failures += 1
+
+    if failures:
+        print(f"\n✗ {failures} fallo(s)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmark de microtiming (swing + micro por step) a 260 BPM.
+
+Ejecuta el bucle de steps (Engine real, mismo esquema que main.py: cada
+step se genera `lead` antes y las notas salen desde NoteQueue) con todas
+las pistas con swing y micro-offsets, contra puertos que anotan el
+instante real de cada envío. Mide:
+
+  - error de cada note_on respecto a su instante previsto
+    (step + desplazamiento) y de cada note_off respecto a step + duración,
+  - diferencia entre el desplazamiento en vivo y el que escribe el export
+    (ticks -> ms) para el mismo step de la misma pista.
+
+Uso:
+    python -m bench.microtiming [--profile live_berlin] [--seconds 10] [--swing 0.25] [--load 0.3] [--spin 1]
+"""
+import argparse
+import threading
+import time
+from dataclasses import replace
+
+from bench.mp_jitter import cpu_load, percentiles
+from core.engine import Engine
+from core.midi_export import MidiExporter
+from core.note_queue import NoteQueue
+from core.profiles import ProfileManager
+from core.synth import MidiSynth
+
+# Micro por step (fracciones de step), dentro de ±MAX_MICRO
+MICRO = [0.0, -0.2, 0.1, 0.3, 0.0, -0.1, 0.2, -0.3]
+
+
+class TimedPort:
+    """Puerto nulo que anota (instante, tipo, nota) de cada mensaje."""
+
+    def __init__(self) -> None:
+        self.sent = []
+
+    def send(self, msg) -> None:
+        self.sent.append((time.monotonic(), msg.type, msg.note))
+
+    def close(self) -> None:
+        pass
+
+
+class ExpectSynth(MidiSynth):
+    """MidiSynth que anota el instante previsto de cada nota y su step."""
+
+    def __init__(self, note_queue: NoteQueue, loop_state: dict) -> None:
+        super().__init__("bench", port=TimedPort(), note_queue=note_queue)
+        self.loop_state = loop_state
+        self.expected_on = []
+        self.expected_off = []
+        self.live_offsets = {}  # step local -> desplazamiento en vivo (ms)
+
+    def schedule_note(self, note, velocity, length, at=None) -> None:
+        self.expected_on.append(at)
+        self.expected_off.append(at + max(0.01, length))
+        self.live_offsets[self.loop_state["step"]] = (at - self.loop_state["step_time"]) * 1000
+        super().schedule_note(note, velocity, length, at=at)
+
+
+def run_loop(engine, seconds: float, loop_state: dict, lookahead: float) -> None:
+    step_time = time.monotonic() + 0.2
+    end = step_time + seconds
+    while step_time < end:
+        step_duration = engine.clock.get_step_duration()
+        deadline = step_time - (lookahead + engine.max_early() * step_duration)
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        loop_state["step_time"] = step_time
+        loop_state["step"] = engine.current_step
+        engine.step(at=step_time)
+        step_time += step_duration
+
+
+def errors_ms(expected, actual):
+    return [(a - e) * 1000 for e, a in zip(sorted(expected), sorted(actual))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Precisión del microtiming en vivo y en el export")
+    parser.add_argument("--profile", default="live_berlin")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--bpm", type=int, default=260)
+    parser.add_argument("--swing", type=float, default=0.25)
+    parser.add_argument("--load", type=float, default=0.0, help="Fracción de CPU de la carga sintética (0-0.9)")
+    parser.add_argument("--lookahead", type=float, default=20.0, help="Lookahead en ms")
+    parser.add_argument("--spin", type=float, default=1.0, help="Espera activa de NoteQueue antes de cada evento (ms)")
+    args = parser.parse_args()
+
+    session = ProfileManager().load_profile(args.profile)
+    if session is None:
+        raise SystemExit(f"Perfil '{args.profile}' no encontrado")
+    session.bpm = args.bpm
+    session.tracks = [replace(t, swing=args.swing, micro=list(MICRO)) for t in session.tracks]
+
+    stop = threading.Event()
+    if args.load > 0:
+        threading.Thread(target=cpu_load, args=(stop, min(0.9, args.load)), daemon=True).start()
+
+    queue = NoteQueue(spin=args.spin / 1000)
+    queue.start()
+    loop_state = {"step_time": 0.0, "step": 0}
+    synths = [ExpectSynth(queue, loop_state) for _ in session.tracks]
+    engine = Engine(session, synths, seed=1)
+    export_patterns = [p.clone_for_export() for p in engine.track_patterns]
+    run_loop(engine, args.seconds, loop_state, args.lookahead / 1000)
+    time.sleep(0.5)
+    queue.stop()
+    stop.set()
+
+    on_err = []
+    off_err = []
+    for s in synths:
+        sent_on = [t for t, kind, _ in s.port.sent if kind == "note_on"]
+        sent_off = [t for t, kind, _ in s.port.sent if kind == "note_off"]
+        on_err += errors_ms(s.expected_on, sent_on)
+        off_err += errors_ms(s.expected_off, sent_off)
+
+    # Export: mismo desplazamiento por step, en ticks
+    exporter = MidiExporter()
+    ms_per_tick = 60_000 / (args.bpm * exporter.TICKS_PER_BEAT)
+    ticks_per_step = exporter.TICKS_PER_BEAT // 4
+    diffs = []
+    for s, pattern in zip(synths, export_patterns):
+        for start, _, _, _ in exporter.render_notes(pattern, 2, session.steps, session.energy):
+            # Con swing + micro una nota puede caer en el step vecino: se
+            # compara con el step cuyo desplazamiento en vivo encaja mejor
+            base = start // ticks_per_step
+            candidates = [
+                abs((start - step * ticks_per_step) * ms_per_tick - s.live_offsets[step % session.steps])
+                for step in (base - 1, base, base + 1)
+                if step % session.steps in s.live_offsets
+            ]
+            if candidates:
+                diffs.append(min(candidates))
+
+    step_ms = 60_000 / (args.bpm * 4)
+    print(
+        f"Perfil: {args.profile} ({len(session.tracks)} pistas) a {args.bpm} BPM "
+        f"(step {step_ms:.2f} ms), swing {args.swing}, micro {MICRO}"
+    )
+    print(f"note_on:  {percentiles([abs(e) for e in on_err])}")
+    print(f"note_off: {percentiles([abs(e) for e in off_err])}")
+    if diffs:
+        print(f"Export vs directo: máx {max(diffs):.3f} ms de diferencia ({len(diffs)} notas, 1 tick = {ms_per_tick:.3f} ms)")
+    print(queue.stats())
+
+
+if __name__ == "__main__":
+    main()
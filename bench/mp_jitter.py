@@ -0,0 +1,115 @@
+"""
+Benchmark de jitter de salida: proceso único vs salida en otro proceso.
+
+Ejecuta el bucle de steps (Engine real, mismo esquema que main.py: cada step
+se genera `lookahead` ms antes y `engine.step(at=step_time)`) con una carga
+sintética en otro hilo que imita la UI/guardados/exports (ráfagas de CPU en
+Python que compiten por el GIL), en dos modos:
+
+  - proceso único: MidiSynth con NoteQueue; el hilo de la cola envía cada
+    note_on/note_off en su deadline (lo que hace main.py sin --mp),
+  - --mp: RingSynth escribe en memoria compartida y un proceso aparte envía
+    cada evento en su deadline.
+
+Mide el retraso de cada evento MIDI respecto a su instante previsto.
+
+Uso:
+    python -m bench.mp_jitter [--profile live_berlin] [--seconds 10] [--load 0.3] [--lookahead 20]
+"""
+import argparse
+import threading
+import time
+
+from core.engine import Engine
+from core.note_queue import NoteQueue
+from core.profiles import ProfileManager
+from core.shm_output import OutputProcess, RingSynth
+from core.synth import MidiSynth, NullPort
+from core.voices import VoiceTable
+
+
+def cpu_load(stop: threading.Event, duty: float, period: float = 0.05) -> None:
+    """Ráfagas de CPU en Python (como un render de rich o un yaml.dump)."""
+    busy = period * duty
+    while not stop.is_set():
+        t0 = time.monotonic()
+        x = 0
+        while time.monotonic() - t0 < busy:
+            for i in range(500):
+                x += i * i
+        stop.wait(period - busy)
+
+
+def run_loop(engine, seconds: float, lookahead: float) -> None:
+    """Bucle de steps como el de main.py: cada step se genera `lead` antes de su instante."""
+    lead = lookahead + engine.max_early() * engine.clock.get_step_duration()
+    step_time = time.monotonic() + 0.2
+    end = step_time + seconds
+    while step_time < end:
+        remaining = step_time - lead - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        engine.step(at=step_time)
+        step_time += engine.clock.get_step_duration()
+
+
+def summary(sent: int, mean: float, p99: float, worst: float) -> str:
+    return f"media {mean:.3f} ms | p99 {p99:.3f} ms | máx {worst:.3f} ms ({sent} ev)"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Jitter de salida con y sin proceso de salida aparte")
+    parser.add_argument("--profile", default="live_berlin")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--load", type=float, default=0.3, help="Fracción de CPU de la carga sintética (0-0.9)")
+    parser.add_argument("--lookahead", type=float, default=20.0, help="Lookahead de --mp en ms")
+    args = parser.parse_args()
+
+    session = ProfileManager().load_profile(args.profile)
+    if session is None:
+        raise SystemExit(f"Perfil '{args.profile}' no encontrado")
+
+    stop = threading.Event()
+    load = threading.Thread(target=cpu_load, args=(stop, min(0.9, max(0.0, args.load))), daemon=True)
+    load.start()
+
+    lookahead = args.lookahead / 1000
+
+    # Proceso único: cola de notas en un hilo (main.py sin --mp)
+    note_queue = NoteQueue(history=1_000_000)
+    voices = {}
+    synths = [
+        MidiSynth(t.port_name, port=NullPort(), note_queue=note_queue,
+                  voices=voices.setdefault(t.port_name, VoiceTable()))
+        for t in session.tracks
+    ]
+    engine = Engine(session, synths, seed=1)
+    note_queue.start()
+    run_loop(engine, args.seconds, lookahead)
+    time.sleep(0.3)
+    note_queue.stop()
+    local = summary(note_queue.sent, *note_queue.jitter())
+
+    # Salida en otro proceso
+    out_proc = OutputProcess([t.port_name for t in session.tracks], lookahead=lookahead, null=True)
+    engine = Engine(session, [RingSynth(out_proc, t.port_name) for t in session.tracks], seed=1)
+    out_proc.start()
+    run_loop(engine, args.seconds, lookahead)
+    time.sleep(0.3)
+    sent, mean, p99, worst = out_proc.ring.read_stats()
+    dropped = out_proc.ring.dropped
+    out_proc.stop()
+
+    stop.set()
+    print(
+        f"Perfil: {args.profile}, {args.seconds:.0f} s por modo, carga sintética {args.load:.0%} de CPU, "
+        f"lookahead {args.lookahead:.0f} ms"
+    )
+    print(f"Proceso único (NoteQueue) todos: {local}")
+    print(
+        f"--mp                      todos: media {mean:.3f} ms | p99 ≤{p99:.1f} ms | "
+        f"máx {worst:.3f} ms ({sent} ev, {dropped} descartados)"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark de control OSC en ráfaga.
+
+Arranca OscServer en un puerto libre de localhost y un bucle de steps como
+el de main.py (Engine contra puertos nulos, comandos aplicados entre
+steps). Mide el retraso de cada step respecto a su deadline sin tráfico y
+con ráfagas de mensajes OSC (faders de densidad, mutes, BPM...), y cuántos
+comandos llegaron, se aplicaron o se fundieron.
+
+Uso:
+    python -m bench.osc_burst [--profile live_berlin] [--rate 5000] [--seconds 5]
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+from core.commands import CommandInbox
+from core.engine import Engine
+from core.osc import OscServer
+from core.profiles import ProfileManager
+from core.synth import MidiSynth, NullPort
+
+
+def run_steps(engine, inbox, seconds: float):
+    """Bucle de steps con deadlines y comandos entre steps. Devuelve retrasos (ms)."""
+    lateness = []
+    deadline = time.monotonic()
+    end = deadline + seconds
+    while deadline < end:
+        lateness.append((time.monotonic() - deadline) * 1000)
+        inbox.drain(engine)
+        engine.step()
+        deadline += engine.clock.get_step_duration()
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if inbox.wait(remaining):
+                inbox.drain(engine)
+    return lateness
+
+
+SENDER = """
+import socket, sys, time
+from core.osc import encode_message
+
+port, n_tracks, rate, seconds = int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]), float(sys.argv[4])
+packets = []
+for i in range(100):
+    track = i % n_tracks + 1
+    kind = i % 4
+    if kind == 0:
+        packets.append(encode_message(f"/track/{track}/density", (i % 10) / 10))
+    elif kind == 1:
+        packets.append(encode_message(f"/track/{track}/mute", i % 2))
+    elif kind == 2:
+        packets.append(encode_message("/bpm", 170.0 + i % 8))
+    else:
+        packets.append(encode_message(f"/track/{track}/root", 36 + i % 12))
+
+sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+sent = 0
+end = time.monotonic() + seconds
+while time.monotonic() < end:
+    for data in packets:
+        sock.sendto(data, ("127.0.0.1", port))
+    sent += len(packets)
+    time.sleep(100 / rate)
+print(sent)
+"""
+
+
+def start_sender(port: int, n_tracks: int, rate: int, seconds: float) -> subprocess.Popen:
+    """
+    Emisor en otro proceso (como una tablet u otra app): ráfagas de 100
+    mensajes hasta ~rate mensajes/s, sin competir por el GIL del motor.
+    """
+    return subprocess.Popen(
+        [sys.executable, "-c", SENDER, str(port), str(n_tracks), str(rate), str(seconds)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+
+
+def summary(lateness):
+    lat = sorted(lateness[1:])
+    if not lat:
+        return "sin datos"
+    return (
+        f"media {sum(lat) / len(lat):.3f} ms | p99 {lat[min(len(lat) - 1, int(len(lat) * 0.99))]:.3f} ms | "
+        f"máx {lat[-1]:.3f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de ráfagas OSC")
+    parser.add_argument("--profile", default="live_berlin")
+    parser.add_argument("--rate", type=int, default=5000, help="Mensajes OSC por segundo")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    session = ProfileManager().load_profile(args.profile)
+    if session is None:
+        raise SystemExit(f"Perfil '{args.profile}' no encontrado")
+
+    inbox = CommandInbox()
+    engine = Engine(session, [MidiSynth(t.port_name, port=NullPort()) for t in session.tracks], seed=1)
+    server = OscServer(inbox, port=0)
+    if not server.start():
+        raise SystemExit(f"No se pudo abrir el servidor OSC: {server.error}")
+
+    quiet = run_steps(engine, inbox, args.seconds)
+
+    sender = start_sender(server.port, len(session.tracks), args.rate, args.seconds)
+    loaded = run_steps(engine, inbox, args.seconds)
+    out, _ = sender.communicate()
+    sent = int(out.strip() or 0)
+    server.stop()
+
+    print(f"Perfil: {args.profile} ({len(session.tracks)} pistas), {args.seconds:.0f} s por fase")
+    print(f"Sin OSC:   {summary(quiet)}")
+    print(f"Con ráfaga: {summary(loaded)}")
+    print(
+        f"OSC: {sent} enviados, {server.received} recibidos, "
+        f"{inbox.applied} aplicados, {inbox.coalesced} fundidos"
+    )
+    print(inbox.stats())
+
+
+if __name__ == "__main__":
+    main()
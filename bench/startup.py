@@ -0,0 +1,167 @@
+"""
+Benchmark de arranque.
+
+Mide, en procesos nuevos de Python:
+  - tiempo hasta el primer step (import de main + carga de perfil +
+    construcción del Engine + primer Engine.step() contra un puerto nulo),
+  - los módulos más caros según `python -X importtime`,
+  - qué módulos perezosos (rich, readchar, asyncio) hay cargados al llegar
+    al primer step,
+  - que `main.py --preview` (render offline de un compás, en un directorio
+    temporal) no importa rich ni readchar, ni asyncio sin --osc. Si alguno
+    aparece, sale con código 1.
+
+Uso:
+    python -m bench.startup [--profile live_berlin] [--runs 5]
+"""
+import argparse
+import statistics
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+TARGET_MS = 200.0
+
+CHILD = """
+import sys
+import main
+from core.engine import Engine
+from core.profiles import ProfileManager
+from core.synth import MidiSynth, NullPort
+
+session = ProfileManager().load_profile({profile!r})
+synths = [MidiSynth(t.port_name, port=NullPort()) for t in session.tracks]
+engine = Engine(session, synths, seed=1)
+engine.step()
+print("FIRST_STEP", flush=True)
+print("LAZY", "rich" in sys.modules, "readchar" in sys.modules, "asyncio" in sys.modules, flush=True)
+"""
+
+
+# main.py --preview tal cual (argv incluido); los módulos se miran al salir
+PREVIEW_CHILD = """
+import runpy
+import sys
+
+sys.argv = ["main.py", "--preview", "--profile", {profile!r}, "--seed", "1", "--bars", "1"]
+runpy.run_path({main!r}, run_name="__main__")
+print("LAZY", "rich" in sys.modules, "readchar" in sys.modules, "asyncio" in sys.modules, flush=True)
+"""
+
+
+def _parse_lazy(line: str) -> tuple:
+    _, rich, readchar, aio = line.split()
+    return rich == "True", readchar == "True", aio == "True"
+
+
+def time_to_first_step(profile: str) -> tuple:
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", CHILD.format(profile=profile)],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    first_ms = None
+    lazy = None
+    for line in proc.stdout:
+        if line.startswith("FIRST_STEP") and first_ms is None:
+            first_ms = (time.perf_counter() - t0) * 1000
+        elif line.startswith("LAZY"):
+            lazy = _parse_lazy(line)
+    proc.wait()
+    if first_ms is None:
+        raise SystemExit("El proceso hijo no llegó al primer step.")
+    return first_ms, lazy
+
+
+def preview_imports(profile: str) -> tuple:
+    """
+    (rich, readchar, asyncio) importados por `main.py --preview`. Corre en
+    un directorio temporal (el .mid y el .wav van a su out/) con profiles/
+    enlazado al del repo.
+    """
+    with tempfile.TemporaryDirectory(prefix="dm_startup_") as tmp:
+        os.symlink(ROOT / "profiles", Path(tmp) / "profiles")
+        res = subprocess.run(
+            [sys.executable, "-c", PREVIEW_CHILD.format(profile=profile, main=str(ROOT / "main.py"))],
+            cwd=tmp,
+            env=dict(os.environ, PYTHONPATH=str(ROOT)),
+            capture_output=True,
+            text=True,
+        )
+    for line in res.stdout.splitlines():
+        if line.startswith("LAZY"):
+            return _parse_lazy(line)
+    raise SystemExit(f"main.py --preview falló:\n{res.stderr.strip()}")
+
+
+def import_profile(top: int) -> list:
+    """Top de módulos por tiempo acumulado (solo los importados directamente por main)."""
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue  # cabecera
+        name = parts[2]
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            rows.append((cumulative / 1000.0, name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de arranque de Dark Makina")
+    parser.add_argument("--profile", default="live_berlin")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    samples = []
+    lazy = None
+    for _ in range(max(1, args.runs)):
+        ms, lazy = time_to_first_step(args.profile)
+        samples.append(ms)
+
+    print(f"Primer step ({args.profile}, {len(samples)} runs):")
+    print(f"  min {min(samples):.1f} ms | mediana {statistics.median(samples):.1f} ms | "
+          f"max {max(samples):.1f} ms | objetivo < {TARGET_MS:.0f} ms")
+    status = "OK" if statistics.median(samples) < TARGET_MS else "LENTO"
+    print(f"  -> {status}")
+
+    if lazy is not None:
+        rich, readchar, aio = lazy
+        print(f"rich importado antes del primer step: {'SÍ' if rich else 'no'}")
+        print(f"readchar importado antes del primer step: {'SÍ' if readchar else 'no'}")
+        print(f"asyncio importado antes del primer step: {'SÍ' if aio else 'no'}")
+
+    rich, readchar, aio = preview_imports(args.profile)
+    print("\nmain.py --preview:")
+    print(f"  rich: {'SÍ ✗' if rich else 'no ✓'} | readchar: {'SÍ ✗' if readchar else 'no ✓'} | "
+          f"asyncio: {'SÍ ✗' if aio else 'no ✓'}")
+
+    print(f"\nImports más caros de `import main` (-X importtime, acumulado):")
+    for ms, name in import_profile(args.top):
+        print(f"  {ms:8.1f} ms  {name}")
+
+    if rich or readchar or aio:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
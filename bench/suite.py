@@ -0,0 +1,334 @@
+"""
+Suite de benchmarks sin TUI ni puertos MIDI.
+
+Casos:
+  - step_note/<estilo>/<rol>: TrackPattern.step_note por rol y estilo,
+  - engine_step/<n>trk: Engine.step completo contra puertos nulos (hasta 64 pistas),
+  - render_loop/<bars>bars/<n>trk: MidiExporter.render_loop (escribe el .mid),
+  - dashboard/<n>trk: Dashboard.render de un frame (rich sobre un StringIO; solo
+    se dibuja el banco visible),
+  - profile/load_cached, profile/parse_yaml, profile/save: ProfileManager,
+  - synth/send, synth/queue_push: MidiSynth contra NullPort,
+  - grooves/generate, grooves/score: búsqueda de grooves (core/grooves.py)
+    por candidato, en este proceso.
+
+Cada caso se calibra para que una repetición dure al menos --min-time y se
+repite --repeat veces; el valor es el mejor tiempo por operación (el menos
+afectado por ruido) y se guarda también la mediana.
+
+Con --json se escribe el resultado en formato máquina. Con --baseline se
+compara contra un JSON anterior: un caso más lento que la base en más de
+--threshold cuenta como regresión y el proceso sale con código 1.
+
+Uso:
+    python -m bench.suite [--filter step_note] [--quick]
+    python -m bench.suite --json base.json
+    python -m bench.suite --baseline base.json [--threshold 0.15] [--json nuevo.json]
+"""
+import argparse
+import io
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from core.config import ROLES, SessionConfig, TrackSetup
+from core.engine import Engine
+from core.grooves import CHUNK, GrooveSpec, generate, kick_reference, score
+from core.midi_export import MidiExporter
+from core.note_queue import NoteQueue
+from core.pattern import TrackConfig, TrackPattern
+from core.profiles import ProfileManager
+from core.synth import MidiSynth, NullPort
+from ui.dashboard import Dashboard, TrackState
+
+ROOT = Path(__file__).resolve().parent.parent
+STYLES = ["dark_174", "makina_180", "industrial_172", "custom"]
+SCHEMA = 1
+
+
+@dataclass
+class Case:
+    """
+    Un benchmark: `setup()` prepara el estado y devuelve run(n), que
+    ejecuta n operaciones. Así la preparación no entra en la medida.
+    """
+    name: str
+    setup: Callable[[], Callable[[int], None]]
+    unit: str = "op"
+
+
+# --- Casos ---
+
+def _session(n_tracks: int, steps: int = 16) -> SessionConfig:
+    roles = ["kick", "bass", "hats", "perc", "lead", "stab", "pad", "fx"]
+    tracks = [
+        TrackSetup(
+            name=f"T{i + 1}", role=roles[i % len(roles)], port_name="null",
+            root=36 + (i * 5) % 40, scale="darktech", density=0.6, steps=steps,
+        )
+        for i in range(n_tracks)
+    ]
+    return SessionConfig(bpm=174, steps=steps, energy=4, tracks=tracks, theme="makina_180")
+
+
+def _step_note(style: str, role: str) -> Callable[[], Callable[[int], None]]:
+    def setup():
+        pattern = TrackPattern(
+            TrackConfig(name=role.upper(), role=role, root=48, scale="darktech",
+                        density=0.7, steps=16, style=style),
+            seed=1,
+        )
+
+        def run(n: int) -> None:
+            step_note = pattern.step_note
+            for i in range(n):
+                step_note(i & 15, 4)
+        return run
+    return setup
+
+
+def _engine_step(n_tracks: int):
+    def setup():
+        session = _session(n_tracks)
+        engine = Engine(session, [MidiSynth("null", port=NullPort()) for _ in session.tracks], seed=1)
+
+        def run(n: int) -> None:
+            for _ in range(n):
+                engine.step()
+        return run
+    return setup
+
+
+def _render_loop(bars: int, n_tracks: int, out_dir: Path):
+    def setup():
+        session = _session(n_tracks)
+        engine = Engine(session, [MidiSynth("null", port=NullPort()) for _ in session.tracks], seed=1)
+        exporter = MidiExporter(output_dir=str(out_dir))
+        names = [c.name for c in engine.track_cfgs]
+
+        def run(n: int) -> None:
+            for _ in range(n):
+                exporter.render_loop(
+                    [p.clone_for_export() for p in engine.track_patterns], names,
+                    bars=bars, steps_per_bar=session.steps, bpm=174, energy=4, filename="bench",
+                )
+        return run
+    return setup
+
+
+def _dashboard(n_tracks: int):
+    def setup():
+        from rich.console import Console
+
+        buf = io.StringIO()
+        dash = Dashboard(steps=16, console=Console(file=buf, width=120, force_terminal=True))
+        tracks = [TrackState(f"T{i + 1}") for i in range(n_tracks)]
+        tracks[0].muted = True
+
+        def run(n: int) -> None:
+            for i in range(n):
+                dash.render(
+                    bpm=174, energy=4, mode="Jam", current_step=i & 15, tracks=tracks,
+                    selected_index=0, selected_info="SEL: T1 | ROLE: kick", seed=1,
+                    stats="LAT: 0.3 ms | avg 0.2 ms | max 1.0 ms",
+                )
+                buf.seek(0)
+                buf.truncate()
+        return run
+    return setup
+
+
+def _profile(kind: str, profiles_dir: Path):
+    def setup():
+        pm = ProfileManager(str(profiles_dir))
+        session = pm.load_profile("bench")
+        path = profiles_dir / "bench.yml"
+
+        def run(n: int) -> None:
+            for _ in range(n):
+                if kind == "load_cached":
+                    pm.load_profile("bench")
+                elif kind == "parse_yaml":
+                    pm._parse_profile(path)
+                else:
+                    pm.save_profile("bench_save", session)
+        return run
+    return setup
+
+
+def _synth(kind: str):
+    def setup():
+        if kind == "send":
+            synth = MidiSynth("null", port=NullPort())
+
+            def run(n: int) -> None:
+                # Ruta inmediata: construir y enviar el note_on y apuntar su
+                # note_off. Se vacían voces y heap cada 32 notas para no medir
+                # retriggers.
+                for i in range(n):
+                    synth.schedule_note(36 + (i & 31), 100, 0.05)
+                    if i & 31 == 31:
+                        synth.voices.clear()
+                        synth.pending.clear()
+            return run
+
+        # Cola de notas sin hilo: solo el coste de programar (lo que paga el bucle)
+        queue = NoteQueue()
+        synth = MidiSynth("null", port=NullPort(), note_queue=queue)
+
+        def run(n: int) -> None:
+            t = time.monotonic()
+            for i in range(n):
+                synth.schedule_note(36 + (i & 31), 100, 0.05, at=t)
+            queue._incoming.clear()
+        return run
+    return setup
+
+
+def _grooves(kind: str):
+    def setup():
+        spec = GrooveSpec(role="bass")
+        notes, _ = generate(spec, 0, CHUNK, seed=1)
+        kick = kick_reference(spec.style, spec.steps)
+
+        def run(n: int) -> None:
+            # n candidatos, en bloques de CHUNK como el pool
+            for start in range(0, n, CHUNK):
+                count = min(CHUNK, n - start)
+                if kind == "generate":
+                    generate(spec, start, count, seed=1)
+                else:
+                    score(notes[:count], spec, kick)
+        return run
+    return setup
+
+
+def build_cases(tmp: Path) -> List[Case]:
+    cases = [
+        Case(f"step_note/{style}/{role}", _step_note(style, role), "nota")
+        for style in STYLES for role in ROLES
+    ]
+    cases += [Case(f"engine_step/{n}trk", _engine_step(n), "step") for n in (4, 8, 16, 32, 64)]
+    cases += [
+        Case(f"render_loop/{bars}bars/{n}trk", _render_loop(bars, n, tmp / "out"), "render")
+        for bars in (4, 16, 64) for n in (1, 4, 8)
+    ]
+    cases += [Case(f"dashboard/{n}trk", _dashboard(n), "frame") for n in (4, 8, 64)]
+    cases += [
+        Case(f"profile/{kind}", _profile(kind, tmp / "profiles"), "op")
+        for kind in ("load_cached", "parse_yaml", "save")
+    ]
+    cases += [Case(f"synth/{kind}", _synth(kind), "nota") for kind in ("send", "queue_push")]
+    cases += [Case(f"grooves/{kind}", _grooves(kind), "candidato") for kind in ("generate", "score")]
+    return cases
+
+
+# --- Medida ---
+
+def measure(case: Case, min_time: float, repeat: int) -> Dict:
+    run = case.setup()
+    # Calibrar: duplicar n hasta que una repetición dure min_time
+    n = 1
+    while n < 1 << 24:
+        t0 = time.perf_counter()
+        run(n)
+        if time.perf_counter() - t0 >= min_time:
+            break
+        n *= 2
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run(n)
+        samples.append((time.perf_counter() - t0) / n * 1e6)
+    return {
+        "unit": f"µs/{case.unit}",
+        "best": round(min(samples), 4),
+        "median": round(statistics.median(samples), 4),
+        "n": n,
+        "repeat": repeat,
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Nombres de los casos más lentos que la base en más de `threshold`."""
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get(name)
+        if base is None or not base.get("best"):
+            continue
+        ratio = res["best"] / base["best"]
+        res["baseline"] = base["best"]
+        res["ratio"] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Suite de benchmarks de Dark Makina")
+    parser.add_argument("--filter", action="append", default=[], help="Solo casos que contengan este texto (repetible)")
+    parser.add_argument("--quick", action="store_true", help="Menos tiempo por caso (más ruido)")
+    parser.add_argument("--min-time", type=float, default=0.1, help="Segundos mínimos por repetición")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", metavar="FILE", help="Escribir resultados en JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="JSON de referencia con el que comparar")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Margen de regresión (0.15 = 15 %% más lento)")
+    args = parser.parse_args()
+    min_time = 0.02 if args.quick else args.min_time
+    repeat = 3 if args.quick else max(1, args.repeat)
+
+    tmp = Path(tempfile.mkdtemp(prefix="dm_bench_"))
+    try:
+        (tmp / "profiles").mkdir()
+        shutil.copy(ROOT / "profiles" / "live_berlin.yml", tmp / "profiles" / "bench.yml")
+
+        cases = [c for c in build_cases(tmp) if not args.filter or any(f in c.name for f in args.filter)]
+        results: Dict[str, Dict] = {}
+        for case in cases:
+            res = measure(case, min_time, repeat)
+            results[case.name] = res
+            print(f"{case.name:<36} {res['best']:>12.3f} {res['unit']:<10} (mediana {res['median']:.3f}, n={res['n']})")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = compare(results, baseline, args.threshold)
+        print(f"\nComparación con {args.baseline} (umbral +{args.threshold:.0%}):")
+        for name, res in results.items():
+            if "ratio" not in res:
+                print(f"  {name:<36} (sin base)")
+                continue
+            mark = "REGRESIÓN" if name in regressions else ("mejora" if res["ratio"] < 1 - args.threshold else "")
+            print(f"  {name:<36} x{res['ratio']:.2f} {mark}")
+
+    if args.json:
+        data = {
+            "schema": SCHEMA,
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "min_time": min_time,
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados en {args.json}")
+
+    if regressions:
+        print(f"\n✗ {len(regressions)} regresión(es): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
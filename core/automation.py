@@ -0,0 +1,155 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Datos de una automatización (perfil: clave `automation` de la sesión o de
+# una escena):
+#   bpm:    [[compás, bpm], ...]      rampas lineales de tempo entre puntos
+#   energy: [[compás, energía], ...]  curva lineal, redondeada a 1-5
+#   loop:   true/false                al acabar vuelve a empezar (si no, se
+#                                     queda en el último valor)
+# Los compases pueden ser fraccionarios; se redondean al step.
+LANES = ("bpm", "energy")
+
+
+def validate_automation(data: Dict, where: str = "automation") -> List[str]:
+    """Errores de una automatización en datos planos (vacía si es válida)."""
+    errors: List[str] = []
+    if not isinstance(data, dict):
+        return [f"{where}: debe ser un mapa con bpm/energy"]
+    for lane in LANES:
+        points = data.get(lane)
+        if points is None:
+            continue
+        try:
+            pairs = [(float(bar), float(value)) for bar, value in points]
+        except (TypeError, ValueError):
+            errors.append(f"{where}.{lane}: se esperaba una lista de [compás, valor]")
+            continue
+        if not pairs:
+            errors.append(f"{where}.{lane}: sin puntos")
+            continue
+        bars = [bar for bar, _ in pairs]
+        if bars[0] < 0 or any(b2 <= b1 for b1, b2 in zip(bars, bars[1:])):
+            errors.append(f"{where}.{lane}: los compases deben ser >= 0 y crecientes")
+        low, high = (40, 260) if lane == "bpm" else (1, 5)
+        if any(not low <= value <= high for _, value in pairs):
+            errors.append(f"{where}.{lane}: valores fuera de rango ({low}-{high})")
+    if not any(data.get(lane) for lane in LANES):
+        errors.append(f"{where}: sin carriles (bpm/energy)")
+    return errors
+
+
+def _curve(points: Sequence[Tuple[float, float]], steps_per_bar: int, n: int) -> List[float]:
+    """Valor en cada límite de step 0..n (n + 1 valores), lineal entre puntos."""
+    knots = [(round(bar * steps_per_bar), float(value)) for bar, value in points]
+    out = []
+    j = 0
+    for k in range(n + 1):
+        while j + 1 < len(knots) and knots[j + 1][0] <= k:
+            j += 1
+        x0, v0 = knots[j]
+        if k <= x0 or j + 1 == len(knots):
+            out.append(v0)
+        else:
+            x1, v1 = knots[j + 1]
+            out.append(v0 + (v1 - v0) * (k - x0) / (x1 - x0))
+    return out
+
+
+def ramp_duration(b0: float, b1: float, beats: float) -> float:
+    """
+    Segundos que dura un tramo de `beats` pulsos con el tempo pasando
+    linealmente de b0 a b1 BPM: integral de 60 / bpm(x) dx.
+    """
+    if abs(b1 - b0) < 1e-9:
+        return 60.0 * beats / b0
+    return 60.0 * beats * math.log(b1 / b0) / (b1 - b0)
+
+
+class AutomationMap:
+    """
+    Automatización de tempo y energía compilada a tablas por step.
+
+    Al compilar se calculan, para cada step k del recorrido:
+      - bpm[k]: tempo al inicio del step (para la UI),
+      - durations[k]: duración exacta del step (integral de la rampa, no el
+        tempo del inicio), y times[k]: su instante desde el step 0, como
+        suma prefija de las duraciones (times tiene n + 1 valores),
+      - energy[k]: energía del step (1-5),
+      - tempos[k]: µs por negra del set_tempo del step en un .mid. Se eligen
+        de forma que la suma de los redondeos no se acumule: el step k
+        empieza en el .mid a menos de 1 µs de times[k].
+
+    El motor y el exporter solo indexan estas tablas. Un carril que falta
+    deja el BPM o la energía sin tocar (None en su tabla).
+    """
+
+    def __init__(self, data: Dict, steps_per_bar: int, steps_per_beat: int = 4) -> None:
+        self.steps_per_bar = steps_per_bar
+        self.steps_per_beat = steps_per_beat
+        self.loop = bool(data.get("loop", False))
+
+        lanes = {lane: data.get(lane) or [] for lane in LANES}
+        last_bar = max((float(points[-1][0]) for points in lanes.values() if points), default=0.0)
+        n = max(1, round(last_bar * steps_per_bar))
+        self.length = n
+
+        self.bpm: Optional[List[float]] = None
+        self.final_bpm: Optional[float] = None  # tempo al acabar (sin loop)
+        self.durations: Optional[List[float]] = None
+        self.times: Optional[List[float]] = None
+        self.tempos: Optional[List[int]] = None
+        if lanes["bpm"]:
+            edges = _curve(lanes["bpm"], steps_per_bar, n)
+            beats = 1.0 / steps_per_beat
+            self.bpm = edges[:n]
+            self.final_bpm = edges[n]
+            self.durations = [ramp_duration(edges[k], edges[k + 1], beats) for k in range(n)]
+            times = [0.0]
+            for d in self.durations:
+                times.append(times[-1] + d)
+            self.times = times
+            # µs acumulados redondeados por límite de step -> tempo de cada step
+            marks = [round(t * 1e6 * steps_per_beat) for t in times]
+            self.tempos = [marks[k + 1] - marks[k] for k in range(n)]
+
+        self.energy: Optional[List[int]] = None
+        self.final_energy: Optional[int] = None
+        if lanes["energy"]:
+            levels = [max(1, min(5, round(v))) for v in _curve(lanes["energy"], steps_per_bar, n)]
+            self.energy = levels[:n]
+            self.final_energy = levels[n]
+
+    def index(self, pos: int) -> Optional[int]:
+        """Índice de tabla de la posición `pos` (None: acabada y sin loop)."""
+        if pos < self.length:
+            return pos
+        return pos % self.length if self.loop else None
+
+    def tempo_map(self, start: int, steps: int, ticks_per_step: int) -> List[Tuple[int, int]]:
+        """
+        (tick, µs por negra) de los cambios de tempo en `steps` steps desde
+        la posición `start`, para los set_tempo de un .mid. Pasado el final
+        (sin loop) se queda el tempo final.
+        """
+        if self.tempos is None:
+            return []
+        out: List[Tuple[int, int]] = []
+        last = None
+        for s in range(steps):
+            k = self.index(start + s)
+            tempo = round(60e6 / self.final_bpm) if k is None else self.tempos[k]
+            if tempo != last:
+                out.append((s * ticks_per_step, tempo))
+                last = tempo
+        return out
+
+    def energies(self, start: int, steps: int, default: int) -> List[int]:
+        """Energía de cada uno de `steps` steps desde `start` (export)."""
+        if self.energy is None:
+            return [default] * steps
+        out = []
+        for s in range(steps):
+            k = self.index(start + s)
+            out.append(self.final_energy if k is None else self.energy[k])
+        return out
@@ -0,0 +1,94 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from core.config import SessionConfig
+from core.profiles import ProfileManager
+
+
+class AutoSaver:
+    """
+    Guardado automático de la sesión en segundo plano.
+
+    El bucle de steps solo llama a notify(), que es una asignación de un
+    float (sin locks ni I/O). Además, el hilo sondea `version_fn`
+    (Engine.state_version) y cuenta como cambio cualquier valor nuevo: así
+    entran también los cambios que no vienen de un comando (morph,
+    automatización, reloj externo, escena aplicada en el límite).
+
+    Cuando lleva `debounce` segundos sin cambios nuevos (o `max_delay` con
+    cambios continuos, p. ej. una automatización en loop), toma un snapshot
+    con `snapshot_fn` y lo escribe de forma atómica con
+    ProfileManager.save_profile.
+    """
+
+    def __init__(
+            self,
+            snapshot_fn: Callable[[], SessionConfig],
+            profile_name: str = "last_session",
+            profile_mgr: ProfileManager = None,
+            debounce: float = 2.0,
+            poll: float = 0.25,
+            version_fn: Optional[Callable[[], object]] = None,
+            max_delay: float = 30.0,
+    ) -> None:
+        self.snapshot_fn = snapshot_fn
+        self.version_fn = version_fn
+        self.max_delay = max_delay
+        self.profile_name = profile_name
+        self.profile_mgr = profile_mgr or ProfileManager()
+        self.debounce = debounce
+        self.poll = poll
+
+        self._last_change = 0.0
+        self._last_saved = 0.0
+        self._stop = threading.Event()
+        self._save_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+
+        self.saves = 0
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def notify(self) -> None:
+        """Marca que el estado ha cambiado. Seguro desde el bucle de audio."""
+        self._last_change = time.monotonic()
+
+    def _run(self) -> None:
+        version = self.version_fn() if self.version_fn is not None else None
+        dirty_since = None  # primer cambio aún sin guardar
+        while not self._stop.wait(self.poll):
+            now = time.monotonic()
+            if self.version_fn is not None:
+                current = self.version_fn()
+                if current != version:
+                    version = current
+                    self._last_change = now
+            changed_at = self._last_change
+            if changed_at <= self._last_saved:
+                dirty_since = None
+                continue
+            if dirty_since is None:
+                dirty_since = now
+            if now - changed_at < self.debounce and now - dirty_since < self.max_delay:
+                continue
+            if self._save(changed_at):
+                dirty_since = None
+
+    def _save(self, changed_at: float) -> bool:
+        with self._save_lock:
+            ok = self.profile_mgr.save_profile(self.profile_name, self.snapshot_fn())
+            if ok:
+                self._last_saved = max(self._last_saved, changed_at)
+                self.saves += 1
+            return ok
+
+    def stop(self) -> bool:
+        """
+        Para el hilo y hace un último guardado síncrono (salida del programa).
+        """
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        return self._save(time.monotonic())
@@ -1,4 +1,5 @@
 import time
+from typing import Optional
 
 
 class Clock:
@@ -21,6 +22,17 @@ class Clock:
         seconds_per_beat = 60.0 / self.bpm
         self.step_duration = seconds_per_beat / self.steps_per_beat
 
+    def set_tempo(self, bpm: float, step_duration: Optional[float] = None) -> None:
+        """
+        Tempo fraccional (automatizaciones, ver core/automation.py).
+        `step_duration` es la duración exacta del step cuando el tempo cambia
+        dentro de él (rampa). La UI y el export ven el BPM redondeado.
+        """
+        self.bpm = round(bpm)
+        if step_duration is None:
+            step_duration = 60.0 / bpm / self.steps_per_beat
+        self.step_duration = step_duration
+
     def get_step_duration(self) -> float:
         return self.step_duration
 
@@ -0,0 +1,485 @@
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.config import BANK_SIZE, MAX_MORPH_BARS, MAX_SWING
+
+MORPH_CHOICES = (0, 1, 2, 4, MAX_MORPH_BARS)
+
+
+@dataclass
+class Command:
+    """
+    Acción de control sobre el motor.
+    track = -1 si no aplica a una pista; value = argumento numérico opcional
+    (None en los comandos de tipo toggle). ts = instante (monotonic) en que
+    se originó (tecla pulsada, mensaje OSC...), para medir latencia.
+    """
+    name: str
+    track: int = -1
+    value: Optional[float] = None
+    ts: float = 0.0
+
+
+# --- Teclado -> comando ---
+# (nombre, valor, usa pista seleccionada)
+KEYMAP: Dict[str, Tuple[str, Optional[float], bool]] = {
+    " ": ("play", None, False),
+    "i": ("scene_mode", None, False),
+    "m": ("morph_bars", None, False),
+    "n": ("morph_cancel", None, False),
+    "b": ("quantize", None, False),
+    "a": ("bpm", -2, False),
+    "s": ("bpm", 2, False),
+    "z": ("energy", -1, False),
+    "x": ("energy", 1, False),
+    "q": ("mute", None, True),
+    "w": ("solo", None, True),
+    "e": ("randomize", None, True),
+    "l": ("lock", None, True),
+    "o": ("density", -0.1, True),
+    "p": ("density", 0.1, True),
+    ",": ("root", -1, True),
+    ".": ("root", 1, True),
+    "g": ("swing", -0.05, True),
+    "h": ("swing", 0.05, True),
+    "f": ("fill", None, False),
+    "t": ("profile", None, False),
+    "[": ("bank", -1, False),
+    "]": ("bank", 1, False),
+    # Varios decks (--deck, ver core/decks.py); con uno solo no hacen nada
+    "d": ("deck", 1, False),
+    "c": ("xfade", -0.25, False),
+    "v": ("xfade", 0.25, False),
+    "r": ("export", 0, False),
+    "SHIFT+r": ("export", 1, False),
+    "\x1b": ("quit", None, False),
+}
+
+# Mayúsculas de letras que no tienen atajo propio se tratan como la minúscula
+# (A/S, Z/X, Q, W...), igual que antes con key.lower().
+_CASE_INSENSITIVE = {"a", "s", "z", "x", "q", "w", "e", "l", "o", "p", "f", "i", "g", "h", "t", "d", "c", "v"}
+
+
+def key_to_command(key: str, engine, ts: float) -> Optional[Command]:
+    """
+    Traduce una tecla a Command según el estado de control del motor
+    (pista seleccionada, modo escenas). None si la tecla no hace nada.
+    """
+    if key in ("1", "2", "3", "4", "5", "6", "7", "8", "9"):
+        n = int(key)
+        if engine.scene_mode:
+            # Modo escenas: números cargan escenas
+            return Command("scene", value=n, ts=ts)
+        # Modo Jam: números seleccionan pistas (1-8) del banco visible
+        if n > BANK_SIZE:
+            return None
+        return Command("select", track=engine.bank * BANK_SIZE + n - 1, ts=ts)
+
+    if key.startswith("SHIFT+") and key[6:] in ("1", "2", "3", "4", "5", "6", "7", "8", "9"):
+        return Command("scene_save", value=int(key[6:]), ts=ts)
+
+    entry = KEYMAP.get(key)
+    if entry is None and key.startswith("SHIFT+") and key[6:] in _CASE_INSENSITIVE:
+        entry = KEYMAP.get(key[6:])
+    if entry is None:
+        return None
+
+    name, value, uses_track = entry
+    return Command(name, track=engine.selected_track if uses_track else -1, value=value, ts=ts)
+
+
+# --- Handlers: comando -> efecto en el motor ---
+
+def _play(engine, cmd: Command) -> None:
+    engine.playing = not engine.playing if cmd.value is None else bool(cmd.value)
+
+
+def _transport(engine, cmd: Command) -> None:
+    # Start/stop del reloj externo: siempre fija (nunca alterna)
+    engine.playing = bool(cmd.value)
+
+
+def _scene_mode(engine, cmd: Command) -> None:
+    engine.scene_mode = not engine.scene_mode if cmd.value is None else bool(cmd.value)
+
+
+def _select(engine, cmd: Command) -> None:
+    if 0 <= cmd.track < len(engine.track_states):
+        engine.selected_track = cmd.track
+
+
+def _bank(engine, cmd: Command) -> None:
+    # Mismo hueco (1-8) en el banco anterior/siguiente; el último banco
+    # puede estar incompleto
+    n = len(engine.track_states)
+    if not n:
+        return
+    bank = max(0, min(engine.bank_count - 1, engine.bank + int(cmd.value)))
+    engine.selected_track = min(n - 1, bank * BANK_SIZE + engine.selected_track % BANK_SIZE)
+    first = bank * BANK_SIZE
+    engine.status = f"Banco {bank + 1}/{engine.bank_count} (pistas {first + 1}-{min(n, first + BANK_SIZE)})"
+
+
+def _scene(engine, cmd: Command) -> None:
+    slot = int(cmd.value)
+    # Se aplica en el próximo compás/beat (ver Engine.queue_scene)
+    if engine.queue_scene(slot, engine.morph_bars):
+        engine.status = f"✓ Escena {slot} en cola ({engine.quantize})"
+    else:
+        engine.status = f"✗ Escena {slot} no encontrada"
+
+
+def _scene_save(engine, cmd: Command) -> None:
+    slot = int(cmd.value)
+    engine.scene_mgr.save_scene(
+        slot, engine.session, engine.clock, engine.track_states, engine.track_cfgs, engine.energy
+    )
+    engine.touch()
+    engine.status = f"✓ Escena {slot} guardada"
+
+
+def _morph_bars(engine, cmd: Command) -> None:
+    if cmd.value is not None:
+        engine.morph_bars = max(0, min(MAX_MORPH_BARS, int(cmd.value)))
+        return
+    current = engine.morph_bars if engine.morph_bars in MORPH_CHOICES else 0
+    idx = MORPH_CHOICES.index(current)
+    engine.morph_bars = MORPH_CHOICES[(idx + 1) % len(MORPH_CHOICES)]
+
+
+def _morph_cancel(engine, cmd: Command) -> None:
+    engine.cancel_morph()
+
+
+def _quantize(engine, cmd: Command) -> None:
+    engine.quantize = "beat" if engine.quantize == "bar" else "bar"
+
+
+def _bpm(engine, cmd: Command) -> None:
+    # Un cambio a mano manda sobre la automatización en curso
+    engine.set_automation(None)
+    engine.clock.set_bpm(engine.clock.bpm + int(cmd.value))
+
+
+def _bpm_set(engine, cmd: Command) -> None:
+    bpm = float(cmd.value)
+    if not math.isfinite(bpm):
+        return  # int(nan) rompería el bucle de steps
+    engine.set_automation(None)
+    engine.clock.set_bpm(int(bpm))
+
+
+def _energy(engine, cmd: Command) -> None:
+    engine.set_automation(None)
+    engine.energy = max(1, min(5, engine.energy + int(cmd.value)))
+    engine.touch()
+
+
+def _energy_set(engine, cmd: Command) -> None:
+    engine.set_automation(None)
+    engine.energy = max(1, min(5, int(cmd.value)))
+    engine.touch()
+
+
+def _track(engine, cmd: Command):
+    if 0 <= cmd.track < len(engine.track_states):
+        return cmd.track
+    return None
+
+
+def _mute(engine, cmd: Command) -> None:
+    i = _track(engine, cmd)
+    if i is None:
+        return
+    ts = engine.track_states[i]
+    ts.muted = not ts.muted if cmd.value is None else bool(cmd.value)
+    if ts.muted:
+        ts.solo = False
+    engine.touch()
+
+
+def _solo(engine, cmd: Command) -> None:
+    i = _track(engine, cmd)
+    if i is None:
+        return
+    target = engine.track_states[i]
+    enable = not target.solo if cmd.value is None else bool(cmd.value)
+    if not enable:
+        target.solo = False
+    else:
+        for j, ts in enumerate(engine.track_states):
+            ts.solo = (j == i)
+            if ts.solo:
+                ts.muted = False
+    engine.touch()
+
+
+def _lock(engine, cmd: Command) -> None:
+    i = _track(engine, cmd)
+    if i is None:
+        return
+    ts = engine.track_states[i]
+    ts.locked = not ts.locked if cmd.value is None else bool(cmd.value)
+
+
+def _randomize(engine, cmd: Command) -> None:
+    # Random suave pista seleccionada (si no está lock)
+    i = _track(engine, cmd)
+    if i is None or engine.track_states[i].locked:
+        return
+    p = engine.track_patterns[i]
+    p.randomize_mode()
+    p.randomize_density_soft()
+    engine.touch()
+
+
+def _density(engine, cmd: Command) -> None:
+    i = _track(engine, cmd)
+    if i is None:
+        return
+    cfg = engine.track_cfgs[i]
+    cfg.density = max(0.0, min(1.0, cfg.density + cmd.value))
+    engine.touch()
+
+
+def _density_set(engine, cmd: Command) -> None:
+    i = _track(engine, cmd)
+    if i is None:
+        return
+    engine.track_cfgs[i].density = max(0.0, min(1.0, float(cmd.value)))
+    engine.touch()
+
+
+def _root(engine, cmd: Command) -> None:
+    i = _track(engine, cmd)
+    if i is None:
+        return
+    cfg = engine.track_cfgs[i]
+    cfg.root = max(12, min(100, cfg.root + int(cmd.value)))
+    engine.touch()
+
+
+def _root_set(engine, cmd: Command) -> None:
+    i = _track(engine, cmd)
+    if i is None:
+        return
+    engine.track_cfgs[i].root = max(12, min(100, int(cmd.value)))
+    engine.touch()
+
+
+def _swing(engine, cmd: Command) -> None:
+    i = _track(engine, cmd)
+    if i is None:
+        return
+    cfg = engine.track_cfgs[i]
+    cfg.swing = max(0.0, min(MAX_SWING, round(cfg.swing + cmd.value, 3)))
+    engine.touch()
+
+
+def _swing_set(engine, cmd: Command) -> None:
+    i = _track(engine, cmd)
+    if i is None:
+        return
+    engine.track_cfgs[i].swing = max(0.0, min(MAX_SWING, float(cmd.value)))
+    engine.touch()
+
+
+def _fill(engine, cmd: Command) -> None:
+    for p in engine.track_patterns:
+        p.request_fill()
+    engine.touch()
+
+
+def _export(engine, cmd: Command) -> None:
+    # Export rápido (value=0) o stems (value=1): pistas activas, 4 compases
+    stems = bool(cmd.value)
+    active_patterns = []
+    active_names = []
+    for cfg, pattern, ts in zip(engine.track_cfgs, engine.track_patterns, engine.track_states):
+        if ts.muted:
+            continue
+        active_patterns.append(pattern.clone_for_export())
+        active_names.append(cfg.name)
+
+    if not active_patterns:
+        return
+
+    exporter = engine.get_exporter()
+    export_args = dict(
+        patterns=active_patterns,
+        track_names=active_names,
+        bars=4,
+        steps_per_bar=engine.session.steps,
+        bpm=engine.clock.bpm,
+        energy=engine.energy,
+        filename=None,
+    )
+    auto = engine.automation
+    if auto is not None:
+        # Los 4 compases siguen la automatización desde donde va
+        steps = export_args["bars"] * engine.session.steps
+        export_args["energies"] = auto.energies(engine.automation_pos, steps, engine.energy)
+        if auto.tempos is not None and engine.automation_tempo:
+            export_args["tempo_map"] = auto.tempo_map(
+                engine.automation_pos, steps, exporter.TICKS_PER_BEAT // 4
+            )
+    if not stems:
+        engine.last_export = exporter.render_loop(**export_args)
+    else:
+        results = exporter.render_stems(**export_args)
+        timings = ", ".join(f"{st.name} {st.seconds * 1000:.1f}ms" for st in results)
+        engine.last_export = (
+            f"{len(results)} stems en {exporter.output_dir.resolve()} ({timings})"
+        )
+
+
+def _profile(engine, cmd: Command) -> None:
+    # Perfil por fases + overlay en el dashboard
+    prof = engine.profiler
+    prof.enabled = not prof.enabled if cmd.value is None else bool(cmd.value)
+    engine.status = f"Perfil por fases: {'ON' if prof.enabled else 'OFF'}"
+
+
+def _quit(engine, cmd: Command) -> None:
+    engine.quit_requested = True
+
+
+HANDLERS: Dict[str, Callable] = {
+    "play": _play,
+    "transport": _transport,
+    "scene_mode": _scene_mode,
+    "select": _select,
+    "bank": _bank,
+    "scene": _scene,
+    "scene_save": _scene_save,
+    "morph_bars": _morph_bars,
+    "morph_cancel": _morph_cancel,
+    "quantize": _quantize,
+    "bpm": _bpm,
+    "bpm_set": _bpm_set,
+    "energy": _energy,
+    "energy_set": _energy_set,
+    "mute": _mute,
+    "solo": _solo,
+    "lock": _lock,
+    "randomize": _randomize,
+    "density": _density,
+    "density_set": _density_set,
+    "root": _root,
+    "root_set": _root_set,
+    "swing": _swing,
+    "swing_set": _swing_set,
+    "fill": _fill,
+    "export": _export,
+    "profile": _profile,
+    "quit": _quit,
+}
+
+
+# Comandos que fijan un valor absoluto: en una misma tanda solo cuenta el
+# último de cada (comando, pista). Un fader OSC puede mandar cientos por
+# segundo y el motor aplica uno.
+# export también: cada uno es un render completo dentro del bucle de steps.
+COALESCE = {
+    "bpm_set", "energy_set", "density_set", "root_set", "swing_set", "morph_bars", "deck_set", "deck_level",
+    "export",
+}
+
+
+class CommandInbox:
+    """
+    Bandeja de entrada de comandos del motor.
+
+    Cualquier hilo (teclado, OSC...) deposita teclas o comandos con push_*;
+    son append sobre una deque, sin locks (el Event de aviso solo se toca
+    si no estaba ya activado). El bucle principal llama a drain() una vez
+    por ciclo (y cada vez que wait() despierta) y aplica TODO lo pendiente,
+    midiendo la latencia tecla -> efecto.
+    """
+
+    def __init__(self, min_gap: float = 0.001) -> None:
+        self._items = deque()
+        self._wakeup = threading.Event()
+        # Tiempo mínimo entre dos despertares de wait(): una ráfaga de
+        # miles de mensajes se aplica en tandas y no mensaje a mensaje
+        self.min_gap = min_gap
+        self._last_wake = 0.0
+
+        # Latencia (ms) entre el origen del comando y su aplicación
+        self.last_latency_ms = 0.0
+        self.avg_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.applied = 0
+        self.coalesced = 0
+
+    def _notify(self) -> None:
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def push_key(self, key: str, ts: Optional[float] = None) -> None:
+        self._items.append((key, time.monotonic() if ts is None else ts))
+        self._notify()
+
+    def push(self, cmd: Command) -> None:
+        if not cmd.ts:
+            cmd.ts = time.monotonic()
+        self._items.append(cmd)
+        self._notify()
+
+    def wait(self, timeout: float) -> bool:
+        """Duerme hasta `timeout` o hasta que llegue algo. True si hay pendientes."""
+        if not self._items:
+            self._wakeup.wait(timeout)
+        gap = self._last_wake + self.min_gap - time.monotonic()
+        if gap > 0:
+            time.sleep(min(gap, timeout))
+        self._wakeup.clear()
+        self._last_wake = time.monotonic()
+        return bool(self._items)
+
+    def drain(self, engine) -> List[Command]:
+        items = self._items
+        batch = []
+        while items:
+            batch.append(items.popleft())
+
+        # Último índice de cada comando "fijar valor" de la tanda
+        last = {}
+        for i, item in enumerate(batch):
+            if isinstance(item, Command) and item.name in COALESCE:
+                last[(item.name, item.track)] = i
+
+        applied: List[Command] = []
+        for i, item in enumerate(batch):
+            if isinstance(item, Command):
+                cmd = item
+                if cmd.name in COALESCE and last[(cmd.name, cmd.track)] != i:
+                    self.coalesced += 1
+                    continue
+            else:
+                cmd = key_to_command(item[0], engine, item[1])
+                if cmd is None:
+                    continue
+            engine.apply(cmd)
+            applied.append(cmd)
+            self._record_latency(cmd.ts)
+        return applied
+
+    def _record_latency(self, ts: float) -> None:
+        ms = (time.monotonic() - ts) * 1000
+        self.last_latency_ms = ms
+        self.max_latency_ms = max(self.max_latency_ms, ms)
+        self.applied += 1
+        # Media móvil exponencial: estable y O(1)
+        alpha = 0.2 if self.applied > 1 else 1.0
+        self.avg_latency_ms += alpha * (ms - self.avg_latency_ms)
+
+    def stats(self) -> str:
+        return (
+            f"LAT: {self.last_latency_ms:.1f} ms | avg {self.avg_latency_ms:.1f} ms | "
+            f"max {self.max_latency_ms:.1f} ms"
+        )
@@ -1,7 +1,9 @@
-import mido
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Dict, Optional
 
+from core.automation import validate_automation
+from core.ports import output_names
+
 # Roles disponibles
 ROLES = ["kick", "bass", "hats", "perc", "stab", "lead", "pad", "fx", "raw"]
 
@@ -28,6 +30,24 @@ THEMES: Dict[str, Dict] = {
 }
 
 
+# Pistas por sesión. Las teclas 1-8 seleccionan dentro del banco visible
+# de BANK_SIZE pistas; [ y ] cambian de banco.
+MAX_TRACKS = 64
+BANK_SIZE = 8
+
+# Límites de microtiming (fracciones de step)
+MAX_SWING = 0.5
+MAX_MICRO = 0.3
+
+# Compases máximos de un morph de escena (tecla M: 0, 1, 2, 4, 8)
+MAX_MORPH_BARS = 8
+
+# Servidor OSC (--osc): aquí y no en core/osc.py para que la CLI no
+# importe asyncio si no se usa
+OSC_HOST = "127.0.0.1"
+OSC_PORT = 9000
+
+
 @dataclass
 class TrackSetup:
     name: str
@@ -37,6 +57,9 @@ class TrackSetup:
     scale: str
     density: float
     steps: int
+    # Swing (retraso de los steps impares) y desplazamiento por step, en fracciones de step
+    swing: float = 0.0
+    micro: List[float] = field(default_factory=list)
 
 
 @dataclass
@@ -47,6 +70,54 @@ class SessionConfig:
     tracks: List[TrackSetup]
     # Clave del tema usado (dark_174, makina_180, industrial_172, custom...)
     theme: str = "custom"
+    # Escenas persistidas {slot: datos}, ver SceneManager.to_data()
+    scenes: Dict[int, Dict] = field(default_factory=dict)
+    # Puertos a los que se envía MIDI clock (somos el maestro); vacío = no se envía
+    clock_out: List[str] = field(default_factory=list)
+    # Automatización de tempo/energía desde el arranque (ver core/automation.py); vacío = ninguna
+    automation: Dict = field(default_factory=dict)
+
+
+def validate_session(session: SessionConfig) -> List[str]:
+    """
+    Comprueba rangos y roles de una sesión.
+    Devuelve la lista de errores (vacía si es válida). No valida puertos:
+    dependen de la máquina en la que se cargue el perfil.
+    """
+    errors: List[str] = []
+    if not 40 <= session.bpm <= 260:
+        errors.append(f"bpm {session.bpm} fuera de rango (40-260)")
+    if not 4 <= session.steps <= 64:
+        errors.append(f"steps {session.steps} fuera de rango (4-64)")
+    if not 1 <= session.energy <= 5:
+        errors.append(f"energy {session.energy} fuera de rango (1-5)")
+    if not session.tracks:
+        errors.append("el perfil no tiene pistas")
+    if len(session.tracks) > MAX_TRACKS:
+        errors.append(f"el perfil tiene {len(session.tracks)} pistas (máx. {MAX_TRACKS})")
+
+    for t in session.tracks:
+        if t.role not in ROLES:
+            errors.append(f"pista {t.name}: rol '{t.role}' desconocido")
+        if not 0 <= t.root <= 127:
+            errors.append(f"pista {t.name}: root {t.root} fuera de rango (0-127)")
+        if not 0.0 <= t.density <= 1.0:
+            errors.append(f"pista {t.name}: density {t.density} fuera de rango (0-1)")
+        if not 4 <= t.steps <= 64:
+            errors.append(f"pista {t.name}: steps {t.steps} fuera de rango (4-64)")
+        if not 0.0 <= t.swing <= MAX_SWING:
+            errors.append(f"pista {t.name}: swing {t.swing} fuera de rango (0-{MAX_SWING})")
+        if len(t.micro) > t.steps:
+            errors.append(f"pista {t.name}: micro tiene {len(t.micro)} valores (máx. {t.steps})")
+        if any(not -MAX_MICRO <= m <= MAX_MICRO for m in t.micro):
+            errors.append(f"pista {t.name}: micro fuera de rango (±{MAX_MICRO})")
+
+    if session.automation:
+        errors.extend(validate_automation(session.automation))
+    for slot, scene in (session.scenes or {}).items():
+        if isinstance(scene, dict) and scene.get("automation"):
+            errors.extend(validate_automation(scene["automation"], f"escena {slot}: automation"))
+    return errors
 
 
 def _ask_int(prompt: str, default: int, min_v: int, max_v: int) -> int:
@@ -76,7 +147,7 @@ def _ask_choice(prompt: str, options: List[str], default_idx: int = 0) -> str:
 
 
 def _list_ports() -> List[str]:
-    return mido.get_output_names()
+    return output_names()
 
 
 def _propose_quick_setup(ports: List[str]) -> Optional[SessionConfig]:
@@ -178,7 +249,7 @@ def initial_setup() -> SessionConfig:
         )
 
     # Pistas
-    num_tracks = _ask_int("\nNúmero de pistas (1-8)", 4, 1, 8)
+    num_tracks = _ask_int(f"\nNúmero de pistas (1-{MAX_TRACKS})", 4, 1, MAX_TRACKS)
     tracks: List[TrackSetup] = []
 
     for i in range(num_tracks):
@@ -0,0 +1,97 @@
+import json
+import math
+import struct
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core.commands import HANDLERS, Command
+from core.config import SessionConfig
+from core.profiles import session_to_data
+
+# --- Formato ---
+# MAGIC, u32 con la longitud de la cabecera, cabecera JSON (sesión de
+# partida, seed, tabla de nombres de comando) y después registros fijos de
+# RECORD.size bytes, solo añadidos al final.
+MAGIC = b"DMLOG\x01"
+_LEN = struct.Struct("<I")
+# step (nº de Engine.step desde el arranque), comando (índice en la tabla),
+# pista (-1 = global), valor (float64; NaN = None)
+RECORD = struct.Struct("<IBhd")
+
+# Pseudo-comandos del log (no pasan por HANDLERS)
+LOCATE = "locate"  # Engine.locate (start/songpos de un reloj externo)
+END = "end"  # cierre ordenado: step final del set
+COMMAND_NAMES = sorted(HANDLERS) + [LOCATE, END]
+
+
+class ControlLog:
+    """
+    Log append-only de las acciones de control de un set.
+
+    Cada comando que aplica el motor se escribe con el número de step en
+    que se aplicó (antes de generar ese step), en un registro binario de 15
+    bytes. Cada registro se vuelca al sistema operativo al escribirse: un
+    cierre inesperado pierde como mucho el registro a medias. Con la sesión
+    y el seed de la cabecera, core/replay.py reconstruye el set entero.
+    """
+
+    def __init__(self, path: str, session: SessionConfig, seed: Optional[int]) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._codes = {name: i for i, name in enumerate(COMMAND_NAMES)}
+        header = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "seed": seed,
+            "commands": COMMAND_NAMES,
+            "session": session_to_data(session),
+        }
+        raw = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        self._f = open(self.path, "xb")
+        self._f.write(MAGIC + _LEN.pack(len(raw)) + raw)
+        self._f.flush()
+        self.records = 0
+
+    def write(self, step: int, cmd: Command) -> None:
+        code = self._codes.get(cmd.name)
+        if code is None or self._f is None:
+            return
+        value = math.nan if cmd.value is None else float(cmd.value)
+        self._f.write(RECORD.pack(step, code, cmd.track, value))
+        self._f.flush()
+        self.records += 1
+
+    def close(self, step: int) -> None:
+        if self._f is None:
+            return
+        self.write(step, Command(END))
+        self._f.close()
+        self._f = None
+
+
+def default_log_path() -> str:
+    return f"logs/set_{datetime.now().strftime('%Y%m%d_%H%M%S')}.dmlog"
+
+
+def read_log(path: str) -> Tuple[Dict, List[Tuple[int, Command]]]:
+    """
+    (cabecera, [(step, Command)]). Un registro final incompleto (corte a
+    mitad de escritura) se ignora. Lanza ValueError si no es un log.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} no es un log de control")
+    offset = len(MAGIC)
+    (size,) = _LEN.unpack_from(data, offset)
+    offset += _LEN.size
+    header = json.loads(data[offset:offset + size].decode("utf-8"))
+    offset += size
+
+    names = header["commands"]
+    records = []
+    for step, code, track, value in RECORD.iter_unpack(data[offset:offset + (len(data) - offset) // RECORD.size * RECORD.size]):
+        if code >= len(names):
+            continue
+        records.append((step, Command(names[code], track=track, value=None if math.isnan(value) else value)))
+    return header, records
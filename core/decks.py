@@ -0,0 +1,227 @@
+import math
+from typing import Callable, Dict, List, Optional
+
+from core.commands import Command
+
+# Con cuánto fader entra cada rol (0..1). Al subir un deck entran primero
+# hats/perc/fx, luego lo melódico, el kick a la mitad y el bajo al final:
+# en un cruce a pasos de 0.25 nunca suenan dos bajos a la vez.
+FADE_IN: Dict[str, float] = {
+    "hats": 0.0,
+    "perc": 0.0,
+    "fx": 0.0,
+    "stab": 0.25,
+    "lead": 0.25,
+    "pad": 0.25,
+    "raw": 0.25,
+    "kick": 0.5,
+    "bass": 0.75,
+}
+DECK_NAMES = "ABCDEFGH"
+
+
+def deck_seed(seed: Optional[int], deck: int) -> Optional[int]:
+    """Seed de sesión de cada deck (el deck A usa el seed tal cual)."""
+    if seed is None or deck == 0:
+        return seed
+    return (seed + deck * 7_919_003) & 0xFFFFFFFF
+
+
+def energy_cap(level: float) -> int:
+    """Tope de energía de un deck según su fader: 1.0 -> 5 ... 0.25 -> 2."""
+    return 1 + round(level * 4)
+
+
+class DeckSet:
+    """
+    Varios motores (decks) con un único reloj.
+
+    Cada deck es un Engine con su sesión, pistas, patrones y escenas. Todos
+    comparten el Clock del deck A (una escena con BPM cambia el tempo de
+    todos) y avanzan un step por cada step del reloj, cada uno con su
+    posición (pueden tener ciclos de distinta longitud). `position` cuenta
+    los steps del reloj común: un deck que se pone en marcha espera al
+    siguiente límite de compás y entra en position % sus pasos, así que los
+    compases de todos los decks caen a la vez.
+
+    El cruce va por fader de deck (0..1): abre los grupos de roles de
+    FADE_IN y limita la energía, sin tocar mutes ni energía del usuario.
+
+    Se usa como un Engine en el bucle principal: los comandos de deck se
+    resuelven aquí, `play` (tecla) se cuantiza al compás, `transport`
+    (reloj externo) arranca o para todos los decks y el resto va al deck
+    seleccionado; los atributos que no define DeckSet (pistas, escenas,
+    estado de la UI...) son los del deck seleccionado.
+    """
+
+    def __init__(self, engines: List, bar_steps: Optional[int] = None) -> None:
+        self.decks = engines
+        self.clock = engines[0].clock
+        for deck in engines[1:]:
+            deck.clock = self.clock
+            deck.profiler = engines[0].profiler
+        # Compás del reloj común: el del deck A (como Engine._quantum)
+        self.bar_steps = bar_steps or engines[0].session.steps
+        self.position = 0
+        self.selected = 0
+        self.levels = [1.0] + [0.0] * (len(engines) - 1)
+        self.cued = [False] * len(engines)  # play pendiente del próximo compás
+        self.quit_requested = False
+        for i in range(len(engines)):
+            self._apply_level(i)
+
+    def __getattr__(self, name):
+        # Solo se llama si DeckSet no tiene el atributo: deck seleccionado
+        return getattr(self.decks[self.selected], name)
+
+    @property
+    def engine(self):
+        """Deck seleccionado (el que reciben las teclas y muestra la UI)."""
+        return self.decks[self.selected]
+
+    @property
+    def playing(self) -> bool:
+        return any(deck.playing for deck in self.decks) or any(self.cued)
+
+    @playing.setter
+    def playing(self, value: bool) -> None:
+        # Transporte de todos (p. ej. --sync parado hasta start)
+        self.cued = [False] * len(self.decks)
+        for deck in self.decks:
+            deck.playing = value
+
+    # --- Control ---
+
+    def apply(self, cmd: Command) -> None:
+        handler = DECK_HANDLERS.get(cmd.name)
+        if handler is not None:
+            handler(self, cmd)
+        else:
+            self.engine.apply(cmd)
+            self.quit_requested = self.quit_requested or self.engine.quit_requested
+
+    def _apply_level(self, i: int) -> None:
+        deck = self.decks[i]
+        level = self.levels[i]
+        deck.fade_muted = [level <= 0.0 or level < FADE_IN.get(c.role, 0.0) for c in deck.track_cfgs]
+        deck.energy_cap = energy_cap(level)
+        deck.touch()
+
+    def set_level(self, i: int, level: float) -> None:
+        self.levels[i] = max(0.0, min(1.0, round(level, 3)))
+        self._apply_level(i)
+
+    # --- Reloj ---
+
+    def step(self, at: Optional[float] = None) -> None:
+        """
+        Un step del reloj común para todos los decks. Las notas llevan su
+        instante absoluto (at + swing/micro), así que el orden en que se
+        generan los decks no retrasa la salida de ninguno mientras el step
+        completo quepa en el lookahead.
+        """
+        if self.position % self.bar_steps == 0:
+            for i, deck in enumerate(self.decks):
+                if self.cued[i]:
+                    self.cued[i] = False
+                    deck.locate(self.position)
+                    deck.playing = True
+        for deck in self.decks:
+            deck.step(at)
+        self.position += 1
+
+    def locate(self, step: int) -> None:
+        self.position = step
+        for deck in self.decks:
+            deck.locate(step)
+
+    def max_early(self) -> float:
+        return max(deck.max_early() for deck in self.decks)
+
+    def process_pending(self) -> None:
+        for deck in self.decks:
+            deck.process_pending()
+
+    def all_notes_off(self) -> None:
+        for deck in self.decks:
+            deck.all_notes_off()
+
+    # --- Guardado automático ---
+
+    def live_session(self):
+        """
+        Lo que escribe el autosave con varios decks: la sesión viva del deck
+        A (el perfil principal, el que se recupera al arrancar). Los demás
+        decks vienen de sus propios perfiles (--deck) y no se sobrescriben;
+        el tempo es el del reloj común.
+        """
+        return self.decks[0].live_session()
+
+    def state_version(self) -> tuple:
+        return self.decks[0].state_version()
+
+    def status_line(self) -> str:
+        """Una línea por todos los decks (la UI no crece con su número)."""
+        parts = []
+        for i, (deck, level) in enumerate(zip(self.decks, self.levels)):
+            state = "▶" if deck.playing else ("…" if self.cued[i] else "■")
+            mark = "*" if i == self.selected else ""
+            parts.append(f"{mark}{DECK_NAMES[i]} {state} {level:.2f} {deck.current_step + 1}/{deck.session.steps}")
+        return "DECKS: " + "  ".join(parts)
+
+
+# --- Handlers de comandos de deck ---
+
+def _deck(decks: DeckSet, cmd: Command) -> None:
+    decks.selected = (decks.selected + int(cmd.value)) % len(decks.decks)
+    decks.engine.status = f"Deck {DECK_NAMES[decks.selected]} ({decks.engine.session.steps} pasos)"
+
+
+def _deck_set(decks: DeckSet, cmd: Command) -> None:
+    i = int(cmd.value)
+    if 0 <= i < len(decks.decks):
+        decks.selected = i
+        decks.engine.status = f"Deck {DECK_NAMES[i]} ({decks.engine.session.steps} pasos)"
+
+
+def _xfade(decks: DeckSet, cmd: Command) -> None:
+    # Hacia el deck seleccionado (value > 0) o desde él: los demás, al revés
+    delta = float(cmd.value)
+    if not math.isfinite(delta):
+        return
+    for i, level in enumerate(decks.levels):
+        decks.set_level(i, level + delta if i == decks.selected else level - delta)
+
+
+def _deck_level(decks: DeckSet, cmd: Command) -> None:
+    level = float(cmd.value)
+    if math.isfinite(level):
+        decks.set_level(decks.selected, level)
+
+
+def _transport(decks: DeckSet, cmd: Command) -> None:
+    # Start/stop del reloj externo: todos los decks a la vez (sin cue)
+    decks.playing = bool(cmd.value)
+
+
+def _deck_play(decks: DeckSet, cmd: Command) -> None:
+    # Pausa en el acto; la vuelta espera al próximo compás del reloj común
+    i = decks.selected
+    deck = decks.decks[i]
+    running = deck.playing or decks.cued[i]
+    start = not running if cmd.value is None else bool(cmd.value)
+    if start and not running:
+        decks.cued[i] = True
+    elif not start:
+        decks.cued[i] = False
+        deck.playing = False
+
+
+DECK_HANDLERS: Dict[str, Callable] = {
+    "deck": _deck,
+    "deck_set": _deck_set,
+    "xfade": _xfade,
+    "deck_level": _deck_level,
+    "play": _deck_play,
+    "transport": _transport,
+}
@@ -0,0 +1,548 @@
+from dataclasses import replace
+from typing import List, Optional
+
+from core.automation import AutomationMap
+from core.clock import Clock
+from core.commands import Command, HANDLERS
+from core.config import BANK_SIZE, SessionConfig
+from core.pattern import TrackPattern, TrackConfig, derive_track_seed, step_offset
+from core.prerender import BarSnapshot
+from core.profiler import PhaseProfiler, active, now_ns, phase_name
+from core.scenes import SceneManager
+from ui.dashboard import TrackState
+
+
+def build_patterns(session: SessionConfig, seed: Optional[int] = None):
+    """
+    Construye TrackConfig, TrackPattern y TrackState a partir de SessionConfig.
+    Inyecta el theme como 'style' para activar pattern packs por estilo.
+    Cada pista recibe su propio seed derivado del seed de sesión.
+    """
+    cfgs = []
+    patterns = []
+    states = []
+
+    style = getattr(session, "theme", "custom")
+
+    for i, t in enumerate(session.tracks):
+        cfg = TrackConfig(
+            name=t.name,
+            role=t.role,
+            root=t.root,
+            scale=t.scale,
+            density=t.density,
+            steps=t.steps,
+            style=style,
+            swing=t.swing,
+            micro=list(t.micro),
+        )
+        cfgs.append(cfg)
+        patterns.append(TrackPattern(cfg, seed=derive_track_seed(seed, i)))
+        states.append(TrackState(cfg.name))
+
+    return cfgs, patterns, states
+
+
+def role_voice(role: str, energy: int):
+    """
+    Velocidad y duración (segundos) de nota por rol, ajustadas por energía.
+    """
+    energy_boost = (energy - 3) * 5  # -10 a +10
+
+    if role == "kick":
+        vel, length = 120 + energy_boost, 0.04
+    elif role == "bass":
+        vel, length = 112 + energy_boost, 0.09
+    elif role in ("hats", "perc"):
+        vel, length = 70 + (energy_boost * 2), 0.02
+    elif role in ("stab", "lead"):
+        vel, length = 90 + energy_boost, 0.11
+    elif role == "pad":
+        vel, length = 80 + energy_boost, 0.25
+    else:
+        vel, length = 90 + energy_boost, 0.08
+
+    return max(1, min(127, vel)), length
+
+
+class Engine:
+    """
+    Estado vivo de una sesión (reloj, energía, pistas, escenas) y la lógica
+    de generación de un step. El bucle principal (main.py) se encarga del
+    teclado, la UI y el timing; aquí solo se decide qué suena en cada step.
+    """
+
+    def __init__(self, session: SessionConfig, synths: List, seed: Optional[int] = None) -> None:
+        self.session = session
+        self.seed = seed
+        self.clock = Clock(bpm=session.bpm)
+        self.track_cfgs, self.track_patterns, self.track_states = build_patterns(session, seed)
+        self.synths = synths
+
+        # Sistema de escenas (restaura las persistidas en el perfil)
+        self.scene_mgr = SceneManager()
+        self.scene_mgr.load_data(session.scenes)
+
+        self.energy = session.energy
+        # Fader de deck (ver core/decks.py): pistas calladas por su grupo y
+        # tope de energía. No tocan el mute ni la energía del usuario.
+        self.fade_muted = [False] * len(self.track_states)
+        self.energy_cap = 5
+        self.playing = True
+        self.current_step = 0
+        # Llamadas a step() desde el arranque (también en pausa): el reloj
+        # del log de control (ver core/control_log.py)
+        self.step_index = 0
+        self.control_log = None  # ControlLog o None
+
+        # Morph de escena en curso (SceneMorph) o None
+        self.morph = None
+
+        # Automatización de tempo/energía en curso (AutomationMap) o None;
+        # automation_pos = steps recorridos. Con reloj externo (--sync) el
+        # tempo lo marca el maestro: automation_tempo = False.
+        self.automation = None
+        self.automation_pos = 0
+        self.automation_tempo = True
+        self._automation_origin: Optional[float] = None  # instante del step 0
+        if session.automation:
+            self.set_automation(AutomationMap(session.automation, session.steps, self.clock.steps_per_beat))
+
+        # Cambio de escena en cola (SceneBlock) y su cuantización en steps.
+        # _staged: bloque cuyos valores por pista ya se escribieron al final
+        # del step anterior al límite (ver step)
+        self.pending_block = None
+        self._staged = None
+        self.quantize = "bar"  # "bar" o "beat"
+
+        # Pre-render del próximo compás por escena (ScenePrerenderer) o None.
+        # bar_index cuenta compases; param_version cambia con cada edición
+        # de parámetros e invalida los buffers pre-generados.
+        self.prerenderer = None
+        self.bar_index = 0
+        self.param_version = 0
+        self._buffer = None  # PrerenderedBar en reproducción
+
+        # Estado de control (lo modifican los comandos, ver core/commands.py)
+        self.selected_track = 0
+        self.scene_mode = False  # True: números cargan escenas; False: seleccionan pistas
+        self.morph_bars = 0  # Compases de morph al cargar escena (0 = instantáneo)
+        self.status: Optional[str] = None  # último mensaje para la UI
+        self.last_export: Optional[str] = None
+        self.quit_requested = False
+        self.last_command: Optional[Command] = None
+        self.exporter = None  # MidiExporter, creado al primer export
+
+        # Adelanto máximo por micro negativos: (param_version, fracción de step)
+        self._early = (-1, 0.0)
+
+        # Perfil por fases (desactivado por defecto; ver core/profiler.py)
+        self.profiler = PhaseProfiler()
+        self._gen_phases = [phase_name(c.role, c.name) for c in self.track_cfgs]
+
+    def apply(self, cmd: Command) -> None:
+        """
+        Aplica un comando de control. Los comandos desconocidos se ignoran.
+        """
+        handler = HANDLERS.get(cmd.name)
+        if handler is None:
+            return
+        handler(self, cmd)
+        self.last_command = cmd
+        if self.control_log is not None:
+            self.control_log.write(self.step_index, cmd)
+
+    def get_exporter(self):
+        if self.exporter is None:
+            from core.midi_export import MidiExporter
+
+            self.exporter = MidiExporter()
+        return self.exporter
+
+    def step(self, at: Optional[float] = None) -> None:
+        """
+        Genera y envía las notas del step actual y avanza al siguiente.
+        En pausa solo procesa los note_off pendientes.
+
+        `at` es el instante nominal (monotonic) del step. Si se indica, cada
+        nota se programa en `at` + su desplazamiento (swing/micro, ver
+        step_offset) y el synth la envía a esa hora; sin `at`, las notas
+        salen en el acto y sin microtiming.
+        """
+        if not self.playing:
+            # Pausa: solo mantenemos limpieza de notas
+            self.process_pending()
+            self.step_index += 1
+            return
+
+        # Cambio de escena en cola: se aplica en el límite de compás/beat.
+        # En el step del límite solo se intercambian los globales (BPM,
+        # energía, automatización). Los valores por pista del bloque se
+        # escriben al final del step anterior, con sus notas ya enviadas.
+        # Solo si el bloque llega después (encolado justo antes del límite)
+        # se copian aquí, en el mismo recorrido que genera las notas.
+        block = None
+        late = None
+        pending = self.pending_block
+        bar_start = self.current_step == 0
+        if pending is not None and self.current_step % self._quantum() == 0:
+            self.pending_block = None
+            # La escena sustituye a la automatización en curso (la suya, si
+            # tiene, empieza aquí o al acabar el morph)
+            self.set_automation(pending.automation)
+            if pending.morph is not None:
+                # Parte del estado de este step, no del de la tecla
+                pending.morph.rebase(self.clock, self.track_cfgs, self.energy)
+                self.morph = pending.morph
+            else:
+                block = pending
+                self.morph = None
+                if (bar_start and self.prerenderer is not None and block.automation is None
+                        and self.energy_cap >= block.energy and not any(self.fade_muted)):
+                    # Compás ya generado en segundo plano para esta escena
+                    # (sin fader de deck a medias: el pre-render no lo conoce)
+                    self._buffer = self.prerenderer.take(block.slot, self.bar_index, self.param_version)
+                self._apply_block_globals(block)
+                if block is not self._staged:
+                    late = block
+            self._staged = None
+            self.touch()
+
+        if self.morph is not None:
+            self._advance_morph()
+            self.touch()
+        elif self.automation is not None:
+            at = self._advance_automation(at)
+
+        # Foto del inicio de compás para el pre-render (estado de patrones
+        # antes de generar el step 0; parámetros tras aplicar el bloque)
+        snapshot_states = None
+        if bar_start and self.prerenderer is not None and self.morph is None:
+            snapshot_states = [p.get_state() for p in self.track_patterns]
+
+        energy = min(self.energy, self.energy_cap)
+        fade_muted = self.fade_muted
+        if block is not None:
+            any_solo = block.any_solo
+        else:
+            any_solo = any(ts.solo for ts in self.track_states)
+        buffer_notes = self._buffer.notes[self.current_step] if self._buffer is not None else None
+        step = self.current_step
+        step_duration = self.clock.get_step_duration()
+        prof = active(self.profiler)
+        if late is not None:
+            block_tracks = late.tracks
+            n_block = len(block_tracks)
+
+        for i, (cfg, pattern, ts, synth) in enumerate(zip(
+                self.track_cfgs, self.track_patterns, self.track_states, self.synths
+        )):
+            if late is not None and i < n_block:
+                ts.muted, ts.solo, ts.locked, density, root, swing, micro = block_tracks[i]
+                if density is not None:
+                    cfg.density = density
+                if root is not None:
+                    cfg.root = root
+                if swing is not None:
+                    cfg.swing = swing
+                if micro is not None:
+                    cfg.micro = list(micro)
+
+            if any_solo and not ts.solo:
+                continue
+            if ts.muted or fade_muted[i]:
+                continue
+
+            if buffer_notes is not None:
+                note = buffer_notes[i]
+            elif prof is None:
+                note = pattern.step_note(step, energy)
+            else:
+                t0 = now_ns()
+                note = pattern.step_note(step, energy)
+                prof.add(self._gen_phases[i], now_ns() - t0)
+            if note is not None:
+                vel, length = role_voice(cfg.role, energy)
+                if prof is not None:
+                    t0 = now_ns()
+                if at is None:
+                    synth.schedule_note(note=note, velocity=vel, length=length)
+                else:
+                    when = at + step_offset(cfg, step) * step_duration
+                    synth.schedule_note(note=note, velocity=vel, length=length, at=when)
+                if prof is not None:
+                    prof.add("send", now_ns() - t0)
+
+        if snapshot_states is not None:
+            self.prerenderer.request(self._bar_snapshot(snapshot_states))
+
+        # Procesar note_off pendientes
+        self.process_pending()
+
+        # Avanzar step
+        self.current_step = (self.current_step + 1) % self.session.steps
+        self.step_index += 1
+
+        # El próximo step es el límite de un bloque en cola: sus valores por
+        # pista se escriben ya, fuera del step del cambio (sin touch(): el
+        # pre-render lo compara con la versión de este compás)
+        pending = self.pending_block
+        if (pending is not None and pending.morph is None and pending is not self._staged
+                and self.current_step % self._quantum() == 0):
+            self._apply_block_tracks(pending)
+            self._staged = pending
+
+        # Si hemos completado ciclo, avisar a patrones (para fills, etc.)
+        if self.current_step == 0:
+            self.bar_index += 1
+            if self._buffer is not None:
+                # El compás vino del buffer: los patrones saltan al estado
+                # en que lo dejó el pre-render (equivale a haberlo generado)
+                for p, state in zip(self.track_patterns, self._buffer.states):
+                    p.set_state(state)
+                self._buffer = None
+            else:
+                for p in self.track_patterns:
+                    p.advance_bar()
+
+    def max_early(self) -> float:
+        """
+        Cuánto se adelanta como mucho una nota a su step (fracción de step,
+        por los micro negativos). El bucle debe generar cada step al menos
+        ese tiempo antes de su instante. Se recalcula solo tras touch().
+        """
+        version, early = self._early
+        if version != self.param_version:
+            early = max((-min(cfg.micro) for cfg in self.track_cfgs if cfg.micro), default=0.0)
+            early = max(0.0, early)
+            self._early = (self.param_version, early)
+        return early
+
+    def locate(self, step: int) -> None:
+        """
+        Reposiciona el step actual (start/songpos de un reloj externo).
+        Descarta el compás pre-generado en curso, que ya no está alineado.
+        """
+        self.current_step = step % self.session.steps
+        self._buffer = None
+        self.touch()
+        if self.control_log is not None:
+            self.control_log.write(self.step_index, Command("locate", value=step))
+
+    def touch(self) -> None:
+        """
+        Marca un cambio de parámetros (densidad, root, energía, mute...).
+        Invalida los compases pre-generados.
+        """
+        self.param_version += 1
+
+    def state_version(self) -> tuple:
+        """
+        Cambia con todo lo que guarda live_session (parámetros vía touch(),
+        tempo de escenas, automatización o reloj externo). Lo sondea el
+        AutoSaver desde su hilo: solo lee dos atributos.
+        """
+        return self.param_version, self.clock.bpm
+
+    def _bar_snapshot(self, states: List[tuple]) -> BarSnapshot:
+        return BarSnapshot(
+            bar_index=self.bar_index,
+            version=self.param_version,
+            steps=self.session.steps,
+            energy=min(self.energy, self.energy_cap),
+            cfgs=[replace(c) for c in self.track_cfgs],
+            states=states,
+            muted=[ts.muted or f for ts, f in zip(self.track_states, self.fade_muted)],
+            solo=[ts.solo for ts in self.track_states],
+        )
+
+    # --- Escenas ---
+
+    def _quantum(self) -> int:
+        if self.quantize == "beat":
+            return self.clock.steps_per_beat
+        return self.session.steps
+
+    def queue_scene(self, slot: int, morph_bars: int = 0) -> bool:
+        """
+        Pone en cola un cambio de escena para el próximo límite de compás
+        (o beat, según self.quantize). El bloque de parámetros, y el morph si
+        morph_bars > 0, se preparan aquí y no en el step del cambio.
+        Si el transporte está parado, el cambio es inmediato.
+        """
+        morph = None
+        if morph_bars > 0:
+            morph = self.scene_mgr.start_morph(
+                slot, self.clock, self.track_states, self.track_cfgs, self.energy,
+                steps_per_bar=self.session.steps, bars=morph_bars,
+            )
+        block = self.scene_mgr.build_block(slot, self.track_states, morph=morph, steps_per_bar=self.session.steps)
+        if block is None:
+            return False
+
+        if not self.playing:
+            self.pending_block = None
+            self._staged = None
+            self.touch()
+            self.set_automation(block.automation)
+            if morph is not None:
+                self.morph = morph
+            else:
+                self.morph = None
+                self._apply_block_globals(block)
+                self._apply_block_tracks(block)
+            return True
+
+        self.pending_block = block
+        return True
+
+    def load_scene(self, slot: int) -> bool:
+        """Carga una escena al instante (sin cuantizar ni morph)."""
+        self.touch()
+        self.morph = None
+        self.pending_block = None
+        self._staged = None
+        if not self.scene_mgr.load_scene(slot, self.clock, self.track_states, self.track_cfgs, None):
+            return False
+        scene = self.scene_mgr.scenes[slot]
+        self.energy = scene.energy
+        self.set_automation(
+            AutomationMap(scene.automation, self.session.steps, self.clock.steps_per_beat) if scene.automation else None
+        )
+        return True
+
+    def _apply_block_globals(self, block) -> None:
+        if block.bpm is not None and block.bpm != self.clock.bpm:
+            self.clock.set_bpm(block.bpm)
+        self.energy = block.energy
+        self.scene_mgr.current_scene = block.slot
+
+    def _apply_block_tracks(self, block) -> None:
+        for (muted, solo, locked, density, root, swing, micro), ts, cfg in zip(
+                block.tracks, self.track_states, self.track_cfgs
+        ):
+            ts.muted, ts.solo, ts.locked = muted, solo, locked
+            if density is not None:
+                cfg.density = density
+            if root is not None:
+                cfg.root = root
+            if swing is not None:
+                cfg.swing = swing
+            if micro is not None:
+                cfg.micro = list(micro)
+
+    @property
+    def bank(self) -> int:
+        """Banco de pistas visible: el de la pista seleccionada."""
+        return self.selected_track // BANK_SIZE
+
+    @property
+    def bank_count(self) -> int:
+        return (len(self.track_states) + BANK_SIZE - 1) // BANK_SIZE
+
+    @property
+    def pending_scene(self) -> Optional[int]:
+        block = self.pending_block
+        return block.slot if block is not None else None
+
+    def cancel_morph(self) -> bool:
+        """Detiene el morph en curso dejando los valores intermedios actuales."""
+        if self.morph is None:
+            return False
+        self.morph = None
+        self.touch()
+        return True
+
+    def morph_label(self) -> Optional[str]:
+        morph = self.morph
+        if morph is None:
+            return None
+        return f"→{morph.slot} {morph.bar}/{morph.bars}"
+
+    def set_automation(self, automation: Optional[AutomationMap]) -> None:
+        """Arranca una automatización desde su step 0 (None = parar la actual)."""
+        self.automation = automation
+        self.automation_pos = 0
+        self._automation_origin = None
+
+    def _advance_automation(self, at: Optional[float]) -> Optional[float]:
+        """
+        Aplica el step actual de la automatización (tempo y energía de sus
+        tablas) y devuelve el instante del step. Con rampa de tempo, el
+        instante sale de la suma prefija de la tabla (origen + times[k]) y
+        no de ir sumando duraciones, así que no acumula error. Si el bucle
+        se reengancha (bloqueo largo, reloj maestro), se recoloca el origen.
+        """
+        auto = self.automation
+        pos = self.automation_pos
+        k = auto.index(pos)
+        if k is None:
+            # Acabada (sin loop): se queda en los valores finales
+            if auto.final_bpm is not None and self.automation_tempo:
+                self.clock.set_tempo(auto.final_bpm)
+            if auto.final_energy is not None and auto.final_energy != self.energy:
+                self.energy = auto.final_energy
+                self.touch()
+            self.automation = None
+            return at
+        self.automation_pos = pos + 1
+
+        if auto.energy is not None and auto.energy[k] != self.energy:
+            self.energy = auto.energy[k]
+            self.touch()
+        if auto.durations is None or not self.automation_tempo:
+            return at
+        self.clock.set_tempo(auto.bpm[k], auto.durations[k])
+        if at is None:
+            return None
+        offset = (pos // auto.length) * auto.times[-1] + auto.times[k]
+        origin = self._automation_origin
+        if origin is None or abs(at - (origin + offset)) > 0.001:
+            self._automation_origin = at - offset
+            return at
+        return origin + offset
+
+    def _advance_morph(self) -> None:
+        morph = self.morph
+        self.energy = morph.apply_step(self.clock, self.track_states, self.track_cfgs)
+        if morph.done:
+            self.morph = None
+            self.scene_mgr.current_scene = morph.slot
+
+    def all_notes_off(self) -> None:
+        """Panic en todas las pistas (al salir, con la cola de notas parada)."""
+        for s in self.synths:
+            s.panic()
+
+    def process_pending(self) -> None:
+        prof = active(self.profiler)
+        if prof is not None:
+            t0 = now_ns()
+        for s in self.synths:
+            s.process_pending()
+        if prof is not None:
+            prof.add("note_off", now_ns() - t0)
+
+    def live_session(self) -> SessionConfig:
+        """
+        Snapshot del estado vivo como SessionConfig: BPM, energía, densidad
+        y root actuales (no los del perfil original) y todas las escenas.
+        Solo lee atributos, así que se puede llamar desde otro hilo.
+        """
+        tracks = [
+            replace(
+                setup, root=cfg.root, density=round(cfg.density, 3),
+                swing=round(cfg.swing, 3), micro=list(cfg.micro),
+            )
+            for setup, cfg in zip(self.session.tracks, self.track_cfgs)
+        ]
+        return SessionConfig(
+            bpm=self.clock.bpm,
+            steps=self.session.steps,
+            energy=self.energy,
+            tracks=tracks,
+            theme=getattr(self.session, "theme", "custom"),
+            scenes=self.scene_mgr.to_data(),
+            clock_out=list(self.session.clock_out),
+            automation=self.session.automation,
+        )
@@ -0,0 +1,249 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import mido
+import numpy as np
+
+from core.midi_export import MidiExporter
+from core.pattern import TrackConfig, TrackPattern
+from core.pattern_packs import get_pattern
+
+# Candidatos por tarea del pool. Fijo: el resultado no depende del número
+# de procesos, solo de (seed, n).
+CHUNK = 4096
+NO_NOTE = -1
+
+METRICS = ("density", "syncopation", "range", "repetition", "kick")
+
+# Peso de cada métrica (0..1) en la puntuación por rol. "kick" es la
+# fracción de golpes que caen encima del kick: negativo = evitar choques.
+ROLE_WEIGHTS: Dict[str, Dict[str, float]] = {
+    "kick": {"density": 1.0, "syncopation": -0.5, "range": 0.0, "repetition": 1.0, "kick": 0.0},
+    "bass": {"density": 1.0, "syncopation": 0.5, "range": 0.5, "repetition": 0.5, "kick": -1.0},
+    "hats": {"density": 1.0, "syncopation": 1.0, "range": 0.0, "repetition": 0.5, "kick": -1.0},
+    "perc": {"density": 1.0, "syncopation": 1.0, "range": 0.0, "repetition": 0.5, "kick": -1.0},
+    "stab": {"density": 1.0, "syncopation": 1.0, "range": 0.5, "repetition": 0.5, "kick": -0.5},
+    "lead": {"density": 1.0, "syncopation": 1.0, "range": 1.0, "repetition": 0.5, "kick": -0.5},
+    "pad": {"density": 0.5, "syncopation": 0.0, "range": 0.0, "repetition": 1.0, "kick": 0.0},
+    "fx": {"density": 1.0, "syncopation": 0.5, "range": 1.0, "repetition": 0.0, "kick": -0.5},
+    "raw": {"density": 1.0, "syncopation": 0.5, "range": 0.5, "repetition": 0.5, "kick": -0.5},
+}
+
+
+@dataclass
+class GrooveSpec:
+    """Qué se busca: un compás de `role` en `style` y cómo se puntúa."""
+    role: str
+    style: str = "makina_180"
+    steps: int = 16
+    energy: int = 5
+    root: int = 36
+    scale: str = "darktech"
+    target_density: float = 0.5  # densidad de golpes buscada (0..1)
+    mutate: float = 0.1  # probabilidad de invertir cada step del esqueleto del pack
+
+
+@dataclass
+class Candidate:
+    """Un compás candidato ya puntuado."""
+    index: int  # nº de candidato (mismo seed y n -> mismo candidato)
+    score: float
+    notes: List[Optional[int]]  # nota por step (None = silencio)
+    density: float  # densidad del TrackConfig que lo generó
+    metrics: Dict[str, float]
+
+    def skeleton(self) -> List[int]:
+        """El compás como entrada de pattern pack (1 = golpe)."""
+        return [0 if n is None else 1 for n in self.notes]
+
+
+def kick_reference(style: str, steps: int) -> np.ndarray:
+    """Golpes del kick del estilo (4x4 si el pack no tiene kick)."""
+    kick = get_pattern(style, "kick", steps)
+    if kick is None:
+        kick = [1 if i % 4 == 0 else 0 for i in range(steps)]
+    return np.array(kick, dtype=bool)
+
+
+def generate(spec: GrooveSpec, start: int, count: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Genera los candidatos [start, start + count) como (notas, densidades):
+    notas es int16 (count, steps) con NO_NOTE en los silencios.
+
+    Los esqueletos (pack del estilo con cada step invertido con probabilidad
+    `mutate`), densidades y seeds se sortean de golpe con NumPy; las notas
+    salen de TrackPattern.step_note, las mismas reglas que suenan en vivo.
+    """
+    rng = np.random.default_rng([seed, start])
+    densities = rng.uniform(0.05, 1.0, count)
+    seeds = rng.integers(0, 2 ** 32, count)
+
+    cfg = TrackConfig(
+        name=spec.role.upper(), role=spec.role, root=spec.root, scale=spec.scale,
+        density=0.5, steps=spec.steps, style=spec.style,
+    )
+    pattern = TrackPattern(cfg)
+    initial = pattern.get_state()
+    skeletons = None
+    if pattern.base_pattern:
+        base = np.array(pattern.base_pattern, dtype=bool)
+        skeletons = (base ^ (rng.random((count, spec.steps)) < spec.mutate)).tolist()
+
+    step_note = pattern.step_note
+    steps = range(spec.steps)
+    energy = spec.energy
+    rows = []
+    for i in range(count):
+        pattern.set_state(initial)
+        pattern.rng.seed(int(seeds[i]))
+        cfg.density = float(densities[i])
+        if skeletons is not None:
+            pattern.base_pattern = skeletons[i]
+        pattern.randomize_mode()
+        rows.append([NO_NOTE if n is None else n for n in (step_note(s, energy) for s in steps)])
+    return np.array(rows, dtype=np.int16).reshape(count, spec.steps), densities
+
+
+def score(notes: np.ndarray, spec: GrooveSpec, kick: np.ndarray) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Puntúa todos los compases de `notes` (n, steps) a la vez.
+    Métricas en 0..1: ajuste a la densidad buscada, síncopa (golpes fuera
+    de las negras), rango de notas (en dos octavas), repetición entre las
+    dos mitades del compás y choques con el kick. Un compás vacío puntúa
+    -inf.
+    """
+    hits = notes != NO_NOTE
+    n_hits = hits.sum(axis=1)
+    safe = np.maximum(n_hits, 1)
+    steps = notes.shape[1]
+
+    pos = np.arange(steps) % 4
+    offbeat = np.where(pos == 0, 0.0, np.where(pos == 2, 0.5, 1.0))
+    hi = np.where(hits, notes, -1).max(axis=1)
+    lo = np.where(hits, notes, 128).min(axis=1)
+    half = steps // 2
+
+    metrics = {
+        "density": 1.0 - np.abs(n_hits / steps - spec.target_density),
+        "syncopation": (hits * offbeat).sum(axis=1) / safe,
+        "range": np.where(n_hits > 0, np.minimum((hi - lo) / 24.0, 1.0), 0.0),
+        "repetition": (notes[:, :half] == notes[:, half:2 * half]).mean(axis=1) if half else np.zeros(len(notes)),
+        "kick": (hits & kick).sum(axis=1) / safe,
+    }
+    weights = ROLE_WEIGHTS.get(spec.role, ROLE_WEIGHTS["raw"])
+    total = sum(weights[m] * metrics[m] for m in METRICS)
+    return np.where(n_hits > 0, total, -np.inf), metrics
+
+
+def _top(scores: np.ndarray, indices: np.ndarray, k: int) -> np.ndarray:
+    """Posiciones de las k mejores puntuaciones (empates: menor índice primero)."""
+    return np.lexsort((indices, -scores))[:k]
+
+
+def _search_chunk(args) -> List[Candidate]:
+    """Tarea del pool: genera y puntúa un bloque y devuelve sus `top` mejores (sin repetidos)."""
+    spec, start, count, seed, top = args
+    notes, densities = generate(spec, start, count, seed)
+    scores, metrics = score(notes, spec, kick_reference(spec.style, spec.steps))
+    # Mismo esqueleto (aunque cambien las notas): solo cuenta el mejor
+    hits = notes != NO_NOTE
+    first = np.lexsort((np.arange(count), -scores))
+    _, keep = np.unique(hits[first], axis=0, return_index=True)
+    first = first[keep]
+    order = first[_top(scores[first], first, top)]
+    return [
+        Candidate(
+            index=start + int(i),
+            score=float(scores[i]),
+            notes=[None if n == NO_NOTE else int(n) for n in notes[i]],
+            density=float(densities[i]),
+            metrics={m: float(metrics[m][i]) for m in METRICS},
+        )
+        for i in order
+        if np.isfinite(scores[i])
+    ]
+
+
+def search(
+        spec: GrooveSpec,
+        n: int = 100_000,
+        top: int = 8,
+        seed: int = 0,
+        workers: Optional[int] = None,
+) -> List[Candidate]:
+    """
+    Genera `n` compases candidatos, los puntúa y devuelve los `top` mejores
+    con esqueletos distintos (el de mejor puntuación de cada esqueleto), de
+    mejor a peor. Los bloques de CHUNK candidatos se reparten en un pool de
+    procesos (workers=1: todo en este proceso); cada proceso devuelve solo
+    sus mejores, así que apenas se copian datos.
+    """
+    tasks = [(spec, start, min(CHUNK, n - start), seed, top) for start in range(0, n, CHUNK)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        chunks = [_search_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_search_chunk, tasks))
+
+    best: List[Candidate] = []
+    seen = set()
+    for cand in sorted((c for chunk in chunks for c in chunk), key=lambda c: (-c.score, c.index)):
+        key = tuple(cand.skeleton())
+        if key in seen:
+            continue
+        seen.add(key)
+        best.append(cand)
+        if len(best) == top:
+            break
+    return best
+
+
+def pack_literal(candidates: List[Candidate], role: str) -> str:
+    """Líneas listas para pegar en PATTERN_PACKS (una por candidato)."""
+    return "\n".join(
+        f'"{role}": {c.skeleton()},  # #{c.index} score {c.score:.3f}' for c in candidates
+    )
+
+
+def export_candidates(candidates: List[Candidate], spec: GrooveSpec, bpm: int, path: str) -> str:
+    """Los candidatos a un .mid, un compás detrás de otro (del mejor al peor)."""
+    tps = MidiExporter.TICKS_PER_BEAT // 4
+    length = tps * 4 if spec.role == "pad" else tps
+    track = mido.MidiTrack()
+    track.append(mido.MetaMessage("track_name", name=f"{spec.style} {spec.role}", time=0))
+    track.append(mido.MetaMessage("set_tempo", tempo=mido.bpm2tempo(bpm), time=0))
+
+    events = []  # (tick, es_on, nota)
+    for bar, cand in enumerate(candidates):
+        bar_start = bar * spec.steps * tps
+        events.append((bar_start, 0, -1, f"#{cand.index} {cand.score:.3f}"))
+        for step, note in enumerate(cand.notes):
+            if note is not None:
+                start = bar_start + step * tps
+                events.append((start, 2, note, None))
+                events.append((start + length, 1, note, None))
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    current = 0
+    for tick, kind, note, text in events:
+        delta = tick - current
+        current = tick
+        if kind == 0:
+            track.append(mido.MetaMessage("marker", text=text, time=delta))
+        else:
+            track.append(mido.Message(
+                "note_on" if kind == 2 else "note_off", note=note, velocity=100 if kind == 2 else 0, time=delta
+            ))
+    track.append(mido.MetaMessage("end_of_track", time=0))
+
+    mid = mido.MidiFile(ticks_per_beat=MidiExporter.TICKS_PER_BEAT)
+    mid.tracks.append(track)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    mid.save(path)
+    return str(Path(path).resolve())
@@ -0,0 +1,450 @@
+import threading
+import time
+from collections import deque
+from typing import Iterable, List, Optional, Tuple
+
+from core.commands import Command
+
+PPQN = 24  # ticks de MIDI clock por negra
+
+# Tempo válido para el seguidor (más ancho que el de Clock para no perder
+# el enganche en rampas o en arranques muy lentos)
+MIN_BPM = 20.0
+MAX_BPM = 300.0
+_MIN_PERIOD = 60.0 / (MAX_BPM * PPQN)
+_MAX_PERIOD = 60.0 / (MIN_BPM * PPQN)
+
+# Mensajes de tiempo real que interesan (tipos de mido)
+CLOCK_TYPES = ("clock", "start", "stop", "continue", "songpos")
+
+
+class TickGrid:
+    """
+    Rejilla de ticks de MIDI clock compartida con el bucle de steps.
+
+    Se publica como una tupla (t_ref, n_ref, periodo) que se reemplaza
+    entera (sin locks): el tick crudo n_ref ocurre en t_ref y los siguientes
+    cada `periodo` segundos. `ticks` es la posición de canción (solo avanza
+    en marcha) y `epoch` cambia con start/songpos para que el motor se
+    recoloque. El bucle de steps solo usa step_deadline().
+    """
+
+    def __init__(self, clock) -> None:
+        self.clock = clock
+        self.ticks_per_step = max(1, PPQN // clock.steps_per_beat)
+
+        self.running = False
+        self.ticks = 0  # posición de canción en ticks (avanza solo en marcha)
+        self.epoch = 0  # cambia con start/songpos (el motor reposiciona)
+        self.epoch_tick = 0
+
+        self._raw = 0  # índice del próximo tick crudo (cuenta siempre)
+        self._pos_offset = 0  # _raw - ticks mientras está en marcha
+        self._grid: Optional[Tuple[float, int, float]] = None  # (t_ref, n_ref, periodo)
+
+    @property
+    def locked(self) -> bool:
+        return self._grid is not None
+
+    def tick_time(self, tick: int) -> Optional[float]:
+        """
+        Instante (monotonic) del tick de canción `tick`, o None si aún no
+        hay rejilla.
+        """
+        grid = self._grid
+        if grid is None:
+            return None
+        t_ref, n_ref, period = grid
+        return t_ref + (tick + self._pos_offset - n_ref) * period
+
+    def step_deadline(self, tick: int) -> Optional[float]:
+        """
+        Cuándo debe sonar el step que empieza en `tick`, o None si aún no
+        toca (parado, o los ticks no han llegado hasta el step anterior: no
+        se adelanta más de un step a la rejilla real).
+        """
+        if not self.running or self.ticks < tick - self.ticks_per_step:
+            return None
+        when = self.tick_time(tick)
+        if when is None:
+            # Sin rejilla: se dispara con el tick real
+            return time.monotonic() if self.ticks > tick else None
+        return when
+
+
+class MidiClockFollower(TickGrid):
+    """
+    Sigue un MIDI clock externo (24 ppqn + start/stop/continue/songpos).
+
+    El tempo se estima con un PLL de segundo orden: cada tick se compara con
+    la predicción; la fase se corrige con `alpha` y el periodo con
+    `beta = alpha² / 4` (amortiguamiento crítico). El resultado es una
+    rejilla de ticks suavizada: el jitter de llegada de cada tick no pasa a
+    los steps, que se programan sobre la predicción (tick_time).
+
+    feed() se llama desde el hilo del puerto de entrada (callback de mido) o
+    desde un replay; el bucle principal solo lee.
+    Con `inbox`, start/stop/continue llegan al motor como comandos
+    "transport" (todo el motor; con decks, todos los decks).
+    """
+
+    def __init__(self, clock, inbox=None, alpha: float = 0.08, window: int = PPQN) -> None:
+        super().__init__(clock)
+        self.inbox = inbox
+        self.alpha = alpha
+        self.beta = alpha * alpha / 4
+
+        self._last_t: Optional[float] = None
+        self._intervals = deque(maxlen=window)  # intervalos crudos (media móvil)
+
+        self.bpm: Optional[float] = None
+        self.relocks = 0
+        self.phase_error_ms = 0.0  # media del |error| de fase (EMA)
+
+    # --- Entrada ---
+
+    def feed_message(self, msg, t: Optional[float] = None) -> None:
+        if msg.type in CLOCK_TYPES:
+            self.feed(msg.type, time.monotonic() if t is None else t, getattr(msg, "pos", None))
+
+    def feed(self, kind: str, t: float, pos: Optional[int] = None) -> None:
+        if kind == "clock":
+            self._tick(t)
+        elif kind == "start":
+            # El siguiente tick es el primero del compás 1
+            self.ticks = 0
+            self._pos_offset = self._raw
+            self.epoch_tick = 0
+            self.epoch += 1
+            self.running = True
+            self._push("transport", 1, t)
+        elif kind == "continue":
+            self._pos_offset = self._raw - self.ticks
+            self.running = True
+            self._push("transport", 1, t)
+        elif kind == "stop":
+            self.running = False
+            self._push("transport", 0, t)
+        elif kind == "songpos" and pos is not None:
+            # Song Position Pointer cuenta semicorcheas = 6 ticks
+            self.ticks = int(pos) * (PPQN // 4)
+            self._pos_offset = self._raw - self.ticks
+            self.epoch_tick = self.ticks
+            self.epoch += 1
+
+    def _push(self, name: str, value, t: float) -> None:
+        if self.inbox is not None:
+            self.inbox.push(Command(name, value=value, ts=t))
+
+    def _tick(self, t: float) -> None:
+        n = self._raw
+        self._raw += 1
+        if self.running:
+            self.ticks += 1
+
+        last = self._last_t
+        self._last_t = t
+        if last is not None:
+            dt = t - last
+            # Huecos (clock parado, puerto caído) no cuentan como intervalo
+            if 0 < dt < 2 * _MAX_PERIOD:
+                self._intervals.append(dt)
+
+        grid = self._grid
+        if grid is None:
+            if len(self._intervals) >= 2:
+                self._relock(t, n)
+            return
+
+        t_ref, n_ref, period = grid
+        predicted = t_ref + (n - n_ref) * period
+        err = t - predicted
+        if abs(err) > 2 * period:
+            # Salto de tempo o hueco en el stream: reenganchar
+            self._relock(t, n)
+            return
+
+        period = _clamp_period(period + self.beta * err)
+        self._grid = (predicted + self.alpha * err, n, period)
+        self.phase_error_ms += 0.05 * (abs(err) * 1000 - self.phase_error_ms)
+        self._publish_bpm(period)
+
+    def _relock(self, t: float, n: int) -> None:
+        recent = list(self._intervals)[-6:]
+        period = _clamp_period(sum(recent) / len(recent))
+        self._grid = (t, n, period)
+        self.relocks += 1
+        self._publish_bpm(period)
+
+    def _publish_bpm(self, period: float) -> None:
+        self.bpm = 60.0 / (period * PPQN)
+        bpm = int(round(self.bpm))
+        if bpm != self.clock.bpm:
+            self.clock.set_bpm(bpm)
+
+    # --- Métricas ---
+
+    def raw_jitter_ms(self) -> float:
+        """Desviación típica de los intervalos crudos recientes (ms)."""
+        iv = list(self._intervals)
+        if len(iv) < 2:
+            return 0.0
+        mean = sum(iv) / len(iv)
+        return (sum((x - mean) ** 2 for x in iv) / len(iv)) ** 0.5 * 1000
+
+    def stats(self) -> str:
+        if self.bpm is None:
+            return "SYNC: esperando clock"
+        state = "RUN" if self.running else "STOP"
+        return (
+            f"SYNC: {state} {self.bpm:.2f} bpm | jitter in {self.raw_jitter_ms():.2f} ms | "
+            f"fase {self.phase_error_ms:.2f} ms"
+        )
+
+
+def _clamp_period(period: float) -> float:
+    return max(_MIN_PERIOD, min(_MAX_PERIOD, period))
+
+
+class MidiClockSender(TickGrid):
+    """
+    Maestro de MIDI clock: envía 24 ppqn + start/stop/continue a uno o
+    varios puertos desde su propio hilo.
+
+    Cada tick tiene un deadline absoluto (deadline anterior + periodo
+    actual), así que el error de un tick no se acumula en los siguientes.
+    El hilo duerme hasta `spin` segundos antes y hace espera activa el
+    resto. El periodo se lee de Clock en cada tick: los cambios de BPM
+    (teclas, escenas, morph) entran en el tick siguiente sin saltos de fase.
+
+    La rejilla que publica es la base de tiempo del bucle de steps (igual
+    que con MidiClockFollower), así que las notas caen sobre los ticks.
+    """
+
+    def __init__(self, clock, port_names: List[str], port_mgr=None, spin: float = 0.001,
+                 history: int = 4096) -> None:
+        super().__init__(clock)
+        from core.ports import get_port_manager
+
+        self.port_names = list(port_names)
+        self.port_mgr = port_mgr or get_port_manager()
+        self.spin = spin
+        self.playing = False  # transporte pedido (el hilo lo aplica en el próximo tick)
+
+        self._transport = deque()  # "start"/"stop"/"continue" pendientes
+        self._lateness = deque(maxlen=history)  # retraso de cada tick (ms)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="clock-out", daemon=True)
+
+        self.sent = 0
+        self.dropped = 0
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Para el hilo; antes de salir envía stop a los esclavos."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+
+    def close(self) -> None:
+        self.stop()
+
+    def play(self) -> None:
+        # Desde el principio (start) o desde donde se paró (continue)
+        self._transport.append("start" if self.ticks == 0 else "continue")
+        self.playing = True
+
+    def pause(self) -> None:
+        self._transport.append("stop")
+        self.playing = False
+
+    # --- Hilo ---
+
+    def _send(self, msg) -> None:
+        for name in self.port_names:
+            port = self.port_mgr.open(name)
+            if port is None:
+                self.dropped += 1
+                continue
+            try:
+                port.send(msg)
+                self.sent += 1
+            except Exception:
+                self.dropped += 1
+                self.port_mgr.report_failure(name)
+
+    def _sleep_until(self, deadline: float) -> None:
+        remaining = deadline - time.monotonic()
+        if remaining > self.spin:
+            self._stop.wait(remaining - self.spin)
+        while time.monotonic() < deadline:
+            time.sleep(0)  # cede el GIL mientras espera
+
+    def _run(self) -> None:
+        import mido
+
+        msgs = {kind: mido.Message(kind) for kind in ("clock", "start", "stop", "continue")}
+        next_t = time.monotonic()
+        while not self._stop.is_set():
+            self._sleep_until(next_t)
+            n = self._raw
+
+            # Transporte antes del tick: el tick que sigue a start es el 0
+            while self._transport:
+                kind = self._transport.popleft()
+                self._send(msgs[kind])
+                if kind == "start":
+                    self.ticks = 0
+                    self._pos_offset = n
+                    self.epoch_tick = 0
+                    self.epoch += 1
+                    self.running = True
+                elif kind == "continue":
+                    self._pos_offset = n - self.ticks
+                    self.running = True
+                else:
+                    self.running = False
+
+            # Desde la duración del step: sigue también las rampas de tempo
+            period = self.clock.get_step_duration() * self.clock.steps_per_beat / PPQN
+            self._grid = (next_t, n, period)
+            self._lateness.append((time.monotonic() - next_t) * 1000)
+            self._send(msgs["clock"])
+            self._raw = n + 1
+            if self.running:
+                self.ticks += 1
+
+            next_t += period
+            if time.monotonic() - next_t > 4 * period:
+                # Bloqueo largo (suspensión, depurador): reengancha sin ráfaga
+                next_t = time.monotonic()
+
+        self._send(msgs["stop"])
+
+    # --- Métricas ---
+
+    def jitter(self) -> Tuple[float, float, float]:
+        """(media, p99, máximo) del retraso de envío de los ticks, en ms."""
+        lat = sorted(self._lateness)
+        if not lat:
+            return 0.0, 0.0, 0.0
+        return sum(lat) / len(lat), lat[min(len(lat) - 1, int(len(lat) * 0.99))], lat[-1]
+
+    def stats(self) -> str:
+        mean, p99, worst = self.jitter()
+        state = "RUN" if self.running else "STOP"
+        return (
+            f"CLK OUT: {state} {len(self.port_names)} puerto(s) | jitter {mean:.3f} ms "
+            f"(p99 {p99:.3f}, máx {worst:.3f})"
+        )
+
+
+# --- Puertos y ficheros ---
+
+def open_clock_input(name: str, follower: MidiClockFollower, virtual: bool = False):
+    """
+    Abre el puerto de entrada `name` (o lo crea como puerto virtual) y
+    conecta sus mensajes de reloj al seguidor. Devuelve el puerto abierto.
+    """
+    import mido
+
+    def _on_message(msg) -> None:
+        follower.feed_message(msg, time.monotonic())
+
+    return mido.open_input(name, virtual=virtual, callback=_on_message)
+
+
+def load_clock_stream(path: str) -> List[Tuple[float, str, Optional[int]]]:
+    """
+    Lee un stream de reloj grabado: una línea por evento,
+    "<segundos> <tipo> [songpos]". Líneas vacías y # se ignoran.
+    """
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split()
+            pos = int(parts[2]) if len(parts) > 2 else None
+            events.append((float(parts[0]), parts[1], pos))
+    return events
+
+
+def save_clock_stream(path: str, events: Iterable[Tuple[float, str, Optional[int]]]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# Dark Makina clock stream: segundos tipo [songpos]\n")
+        for t, kind, pos in events:
+            f.write(f"{t:.6f} {kind}" + (f" {pos}" if pos is not None else "") + "\n")
+
+
+def record_clock(name: str, path: str, seconds: float) -> int:
+    """Graba `seconds` segundos de reloj del puerto `name` a `path`."""
+    import mido
+
+    events = []
+    t0 = time.monotonic()
+    with mido.open_input(name) as port:
+        while time.monotonic() - t0 < seconds:
+            for msg in port.iter_pending():
+                if msg.type in CLOCK_TYPES:
+                    events.append((time.monotonic() - t0, msg.type, getattr(msg, "pos", None)))
+            time.sleep(0.0005)
+    save_clock_stream(path, events)
+    return len(events)
+
+
+class ClockReplayer:
+    """
+    Reproduce en tiempo real un stream grabado contra un seguidor, desde su
+    propio hilo (sustituye a un puerto de entrada para probar sin DAW).
+    """
+
+    def __init__(self, events, follower: MidiClockFollower) -> None:
+        self.events = list(events)
+        self.follower = follower
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="clock-replay", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def close(self) -> None:
+        """Igual que stop(); misma interfaz que un puerto de entrada."""
+        self.stop()
+
+    def _run(self) -> None:
+        t0 = time.monotonic()
+        for t, kind, pos in self.events:
+            delay = t0 + t - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                return
+            self.follower.feed(kind, t0 + t, pos)
+
+
+def synthetic_clock_stream(
+        bpm: float,
+        seconds: float,
+        jitter_ms: float = 0.0,
+        seed: int = 0,
+) -> List[Tuple[float, str, Optional[int]]]:
+    """
+    Stream de reloj sintético (start + ticks) con jitter gaussiano en la
+    llegada de cada tick. Útil para medir el suavizado sin hardware.
+    """
+    import random
+
+    rng = random.Random(seed)
+    period = 60.0 / (bpm * PPQN)
+    events: List[Tuple[float, str, Optional[int]]] = [(0.0, "start", None)]
+    n = int(seconds / period)
+    for i in range(n):
+        t = (i + 1) * period + rng.gauss(0.0, jitter_ms / 1000.0)
+        events.append((max(0.0, t), "clock", None))
+    events.sort(key=lambda e: e[0])
+    return events
@@ -1,9 +1,22 @@
+import time
 import mido
 from pathlib import Path
 from datetime import datetime
-from typing import List, Optional
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
-from core.pattern import TrackPattern
+from core.pattern import TrackPattern, step_offset
+
+
+@dataclass
+class StemResult:
+    """
+    Resultado del export de un stem (una pista -> un .mid).
+    """
+    name: str
+    path: str
+    seconds: float
 
 
 class MidiExporter:
@@ -13,10 +26,123 @@ class MidiExporter:
     que luego puedes arrastrar al DAW.
     """
 
+    TICKS_PER_BEAT = 480
+
     def __init__(self, output_dir: str = "out") -> None:
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
 
+    def render_notes(
+            self,
+            pattern: TrackPattern,
+            bars: int,
+            steps_per_bar: int,
+            energy: int,
+            energies: Optional[List[int]] = None,
+    ) -> List[Tuple[int, int, int, int]]:
+        """
+        Genera las notas de un único patrón como (start_tick, duration_ticks, note, velocity).
+        Es la misma fuente de eventos que usan el .mid y el preview de audio.
+        El swing/micro de la pista se aplica como desplazamiento en ticks
+        (mismo step_offset que el motor en vivo; 1 tick = 1/120 de step).
+        Solo toca el estado del propio patrón (y su RNG), así que se puede
+        llamar en paralelo para pistas distintas.
+        `energies` (opcional): energía de cada step (automatización); si no,
+        `energy` para todos.
+        """
+        total_steps = bars * steps_per_bar
+        # Usamos semicorcheas como unidad base (4 por negra -> 16 por compás clásico)
+        # En tu engine, steps_per_bar ya representa el ciclo completo; aquí se respeta.
+        ticks_per_step = self.TICKS_PER_BEAT // 4
+
+        notes = []
+
+        # Reinicio de estado de compases para export (opcional; se asume ya viene preparado)
+        # pattern.bar_count se usa tal cual venga del clon.
+
+        for step in range(total_steps):
+            local_step = step % steps_per_bar
+            note = pattern.step_note(local_step, energy if energies is None else energies[step])
+
+            if note is not None:
+                offset = round(step_offset(pattern.cfg, local_step) * ticks_per_step)
+                start_time = max(0, step * ticks_per_step + offset)
+                duration = ticks_per_step
+
+                role = pattern.cfg.role
+                if role == "kick":
+                    vel = 120
+                elif role == "bass":
+                    vel = 112
+                elif role in ("hats", "perc"):
+                    vel = 70
+                elif role in ("stab", "lead"):
+                    vel = 90
+                elif role == "pad":
+                    vel = 80
+                    duration = ticks_per_step * 4
+                else:
+                    vel = 90
+
+                notes.append((start_time, duration, note, vel))
+
+            # Cuando termina un "bar" lógico, avanzamos contador interno del patrón
+            if (step + 1) % steps_per_bar == 0:
+                pattern.advance_bar()
+
+        return notes
+
+    def _build_track(
+            self,
+            pattern: TrackPattern,
+            name: str,
+            bars: int,
+            steps_per_bar: int,
+            bpm: int,
+            energy: int,
+            energies: Optional[List[int]] = None,
+            tempo_map: Optional[List[Tuple[int, int]]] = None,
+    ) -> mido.MidiTrack:
+        """
+        Genera la MidiTrack de un único patrón.
+        `tempo_map` (opcional): [(tick, µs por negra)] de una rampa de tempo;
+        se escribe como set_tempo en cada cambio (el primero en el tick 0).
+        """
+        track = mido.MidiTrack()
+        if not tempo_map:
+            tempo_map = [(0, mido.bpm2tempo(bpm))]
+
+        # Nombre de pista y tempo
+        track.append(mido.MetaMessage("track_name", name=name, time=0))
+        track.append(mido.MetaMessage("set_tempo", tempo=tempo_map[0][1], time=0))
+
+        note_events = []  # (time_ticks, note, velocity, is_on); note None = set_tempo
+        for start_time, duration, note, vel in self.render_notes(
+                pattern, bars, steps_per_bar, energy, energies
+        ):
+            note_events.append((start_time, note, vel, True))
+            note_events.append((start_time + duration, note, 0, False))
+
+        # Ordenar eventos: primero por tiempo, y en el mismo tiempo primero note_off luego note_on
+        note_events.sort(key=lambda x: (x[0], not x[3]))
+        if len(tempo_map) > 1:
+            # Los cambios de tempo van antes que las notas de su mismo tick
+            tempo_events = [(tick, None, tempo, True) for tick, tempo in tempo_map[1:]]
+            note_events = sorted(tempo_events + note_events, key=lambda x: (x[0], x[1] is not None))
+
+        current_time = 0
+        for event_time, note, vel, is_on in note_events:
+            delta = event_time - current_time
+            if note is None:
+                track.append(mido.MetaMessage("set_tempo", tempo=vel, time=delta))
+            else:
+                msg_type = "note_on" if is_on else "note_off"
+                track.append(mido.Message(msg_type, note=note, velocity=vel, time=delta))
+            current_time = event_time
+
+        track.append(mido.MetaMessage("end_of_track", time=0))
+        return track
+
     def render_loop(
             self,
             patterns: List[TrackPattern],
@@ -26,6 +152,8 @@ class MidiExporter:
             bpm: int,
             energy: int,
             filename: Optional[str] = None,
+            energies: Optional[List[int]] = None,
+            tempo_map: Optional[List[Tuple[int, int]]] = None,
     ) -> str:
         """
         Renderiza N compases de los patrones actuales a un archivo MIDI.
@@ -44,6 +172,9 @@ class MidiExporter:
             Nivel de energía que se usará al llamar a step_note.
         filename:
             Nombre base opcional (sin extensión). Si None, se genera con timestamp.
+        energies / tempo_map:
+            Opcionales, de una automatización (AutomationMap.energies y
+            AutomationMap.tempo_map): energía por step y cambios de tempo.
 
         Devuelve:
             Ruta absoluta del archivo MIDI creado (str).
@@ -52,72 +183,72 @@ class MidiExporter:
             raise ValueError("patterns y track_names deben tener la misma longitud y no estar vacíos.")
 
         if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"loop_{timestamp}"
-
-        mid = mido.MidiFile(ticks_per_beat=480)
-        tempo = mido.bpm2tempo(bpm)
-
-        total_steps = bars * steps_per_bar
-        # Usamos semicorcheas como unidad base (4 por negra -> 16 por compás clásico)
-        # En tu engine, steps_per_bar ya representa el ciclo completo; aquí se respeta.
-        ticks_per_step = mid.ticks_per_beat // 4
+            filename = self._default_filename()
 
+        mid = mido.MidiFile(ticks_per_beat=self.TICKS_PER_BEAT)
         for pattern, name in zip(patterns, track_names):
-            track = mido.MidiTrack()
-            mid.tracks.append(track)
-
-            # Nombre de pista y tempo
-            track.append(mido.MetaMessage("track_name", name=name, time=0))
-            track.append(mido.MetaMessage("set_tempo", tempo=tempo, time=0))
-
-            note_events = []  # (time_ticks, note, velocity, is_on)
-
-            # Reinicio de estado de compases para export (opcional; se asume ya viene preparado)
-            # pattern.bar_count se usa tal cual venga del clon.
-
-            for step in range(total_steps):
-                local_step = step % steps_per_bar
-                note = pattern.step_note(local_step, energy)
-
-                if note is not None:
-                    start_time = step * ticks_per_step
-                    duration = ticks_per_step
-
-                    role = pattern.cfg.role
-                    if role == "kick":
-                        vel = 120
-                    elif role == "bass":
-                        vel = 112
-                    elif role in ("hats", "perc"):
-                        vel = 70
-                    elif role in ("stab", "lead"):
-                        vel = 90
-                    elif role == "pad":
-                        vel = 80
-                        duration = ticks_per_step * 4
-                    else:
-                        vel = 90
-
-                    note_events.append((start_time, note, vel, True))
-                    note_events.append((start_time + duration, note, 0, False))
-
-                # Cuando termina un "bar" lógico, avanzamos contador interno del patrón
-                if (step + 1) % steps_per_bar == 0:
-                    pattern.advance_bar()
-
-            # Ordenar eventos: primero por tiempo, y en el mismo tiempo primero note_off luego note_on
-            note_events.sort(key=lambda x: (x[0], not x[3]))
-
-            current_time = 0
-            for event_time, note, vel, is_on in note_events:
-                delta = event_time - current_time
-                msg_type = "note_on" if is_on else "note_off"
-                track.append(mido.Message(msg_type, note=note, velocity=vel, time=delta))
-                current_time = event_time
-
-            track.append(mido.MetaMessage("end_of_track", time=0))
+            mid.tracks.append(
+                self._build_track(pattern, name, bars, steps_per_bar, bpm, energy, energies, tempo_map)
+            )
 
         filepath = (self.output_dir / f"{filename}.mid").resolve()
         mid.save(filepath)
         return str(filepath)
+
+    def render_stems(
+            self,
+            patterns: List[TrackPattern],
+            track_names: List[str],
+            bars: int,
+            steps_per_bar: int,
+            bpm: int,
+            energy: int,
+            filename: Optional[str] = None,
+            max_workers: Optional[int] = None,
+            energies: Optional[List[int]] = None,
+            tempo_map: Optional[List[Tuple[int, int]]] = None,
+    ) -> List[StemResult]:
+        """
+        Modo stems: un .mid por pista (`<loop>_<NN>_<TRACK>.mid`, NN = posición
+        en `patterns`: dos pistas con el mismo nombre no se pisan), pensado
+        para importar en el DAW pista a pista.
+
+        Cada patrón se renderiza y se escribe en su propio hilo. Como cada
+        TrackPattern usa su propio RNG, el resultado no depende del orden
+        en que terminen los hilos.
+
+        Devuelve una lista de StemResult (nombre, ruta, segundos) en el mismo
+        orden que `patterns`.
+        """
+        if not patterns or not track_names or len(patterns) != len(track_names):
+            raise ValueError("patterns y track_names deben tener la misma longitud y no estar vacíos.")
+
+        if filename is None:
+            filename = self._default_filename()
+
+        def _render_one(i: int, pattern: TrackPattern, name: str) -> StemResult:
+            t0 = time.perf_counter()
+            mid = mido.MidiFile(ticks_per_beat=self.TICKS_PER_BEAT)
+            mid.tracks.append(
+                self._build_track(pattern, name, bars, steps_per_bar, bpm, energy, energies, tempo_map)
+            )
+            filepath = (self.output_dir / f"{filename}_{i:02d}_{_safe_name(name)}.mid").resolve()
+            mid.save(filepath)
+            return StemResult(name=name, path=str(filepath), seconds=time.perf_counter() - t0)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(_render_one, i, pattern, name)
+                for i, (pattern, name) in enumerate(zip(patterns, track_names))
+            ]
+            return [f.result() for f in futures]
+
+    @staticmethod
+    def _default_filename() -> str:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return f"loop_{timestamp}"
+
+
+def _safe_name(name: str) -> str:
+    """Nombre de pista apto para usar en un nombre de archivo."""
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in name) or "TRACK"
@@ -0,0 +1,130 @@
+import heapq
+import threading
+import time
+from collections import deque
+from typing import List, Tuple
+
+from core.profiler import active, now_ns
+
+
+class NoteQueue:
+    """
+    Cola de eventos MIDI con deadline absoluto, enviada desde un hilo propio.
+
+    El bucle de steps genera cada step por adelantado (lookahead) y deja
+    aquí sus mensajes con su instante exacto: el del step más el
+    desplazamiento de swing/micro de la pista (note_on) y ese instante más
+    la duración de la nota (note_off). El hilo duerme hasta `spin` segundos
+    antes del próximo evento y hace espera activa el resto, así que el
+    microtiming no depende de la rejilla de steps ni del jitter del bucle
+    (UI, comandos, guardados).
+
+    push() solo hace append a una deque (sin locks); el hilo pasa lo nuevo
+    a su heap. Solo se le despierta si el evento nuevo va antes que el que
+    está esperando.
+    """
+
+    def __init__(self, spin: float = 0.001, history: int = 4096, profiler=None, late_ms: float = 2.0) -> None:
+        self.spin = spin
+        self.profiler = profiler  # PhaseProfiler: fase "midi_out" (envío real al puerto)
+        self._incoming = deque()
+        self._heap: List[tuple] = []
+        self._seq = 0
+        # Instante hasta el que duerme el hilo (inf mientras está despierto:
+        # cualquier push lo avisa)
+        self._next_wake = float("inf")
+        self._wakeup = threading.Event()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="note-queue", daemon=True)
+
+        self._lateness = deque(maxlen=history)  # retraso de cada envío (ms)
+        self.sent = 0
+        # Acumulados de toda la sesión (el historial solo guarda los últimos)
+        self.late_ms = late_ms
+        self.late = 0  # envíos con más de late_ms de retraso
+        self.worst_ms = 0.0
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Para el hilo; antes de salir envía los note_off pendientes."""
+        self._stop = True
+        self._wakeup.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+
+    def push(self, when: float, synth, msg, token: int = 0) -> None:
+        """
+        Programa `msg` para enviarlo por `synth` en el instante `when`
+        (monotonic). `token` identifica la voz (ver VoiceTable).
+        """
+        self._incoming.append((when, synth, msg, token))
+        if when < self._next_wake and not self._wakeup.is_set():
+            self._wakeup.set()
+
+    # --- Hilo ---
+
+    def _run(self) -> None:
+        heap = self._heap
+        incoming = self._incoming
+        while True:
+            self._next_wake = float("inf")
+            self._wakeup.clear()
+            while incoming:
+                when, synth, msg, token = incoming.popleft()
+                heapq.heappush(heap, (when, self._seq, synth, msg, token))
+                self._seq += 1
+            if self._stop:
+                break
+
+            now = time.monotonic()
+            while heap and heap[0][0] <= now:
+                when, _, synth, msg, token = heapq.heappop(heap)
+                late = (now - when) * 1000
+                self._lateness.append(late)
+                if late > self.worst_ms:
+                    self.worst_ms = late
+                if late > self.late_ms:
+                    self.late += 1
+                prof = active(self.profiler)
+                if prof is None:
+                    synth._deliver(msg, token)
+                else:
+                    t0 = now_ns()
+                    synth._deliver(msg, token)
+                    prof.add("midi_out", now_ns() - t0)
+                self.sent += 1
+                now = time.monotonic()
+
+            if not heap:
+                self._wakeup.wait()
+                continue
+            wake = heap[0][0]
+            self._next_wake = wake
+            if incoming:
+                continue
+            remaining = wake - time.monotonic()
+            if remaining > self.spin and self._wakeup.wait(remaining - self.spin):
+                continue
+            while time.monotonic() < wake and not incoming:
+                time.sleep(0)  # cede el GIL mientras espera
+
+        # Parada: ningún note_on nuevo, pero sí los note_off pendientes
+        for _, _, synth, msg, token in sorted(heap, key=lambda e: e[:2]):
+            if msg.type == "note_off":
+                synth._deliver(msg, token)
+        heap.clear()
+
+    # --- Métricas ---
+
+    def jitter(self) -> Tuple[float, float, float]:
+        """(media, p99, máximo) del retraso de envío respecto al deadline, en ms."""
+        lat = sorted(self._lateness)
+        if not lat:
+            return 0.0, 0.0, 0.0
+        return sum(lat) / len(lat), lat[min(len(lat) - 1, int(len(lat) * 0.99))], lat[-1]
+
+    def stats(self) -> str:
+        mean, p99, worst = self.jitter()
+        return f"NOTES: {self.sent} ev | retraso {mean:.3f} ms (p99 {p99:.3f}, máx {worst:.3f})"
@@ -0,0 +1,277 @@
+import asyncio
+import math
+import struct
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from core.commands import Command
+from core.config import MAX_MORPH_BARS, OSC_HOST, OSC_PORT
+
+DEFAULT_HOST = OSC_HOST
+DEFAULT_PORT = OSC_PORT
+
+
+# --- Decodificación OSC 1.0 (mensajes y bundles) ---
+
+def _read_string(data: bytes, offset: int) -> Tuple[str, int]:
+    end = data.index(b"\0", offset)
+    text = data[offset:end].decode("utf-8", "replace")
+    # Cadena terminada en \0 y rellenada a múltiplo de 4
+    return text, (end + 4) & ~3
+
+
+def _read_message(data: bytes) -> Tuple[str, List]:
+    address, offset = _read_string(data, 0)
+    if offset >= len(data):
+        return address, []
+    tags, offset = _read_string(data, offset)
+    args: List = []
+    for tag in tags[1:]:
+        if tag == "i":
+            args.append(struct.unpack_from(">i", data, offset)[0])
+            offset += 4
+        elif tag == "f":
+            args.append(struct.unpack_from(">f", data, offset)[0])
+            offset += 4
+        elif tag == "h":
+            args.append(struct.unpack_from(">q", data, offset)[0])
+            offset += 8
+        elif tag == "d":
+            args.append(struct.unpack_from(">d", data, offset)[0])
+            offset += 8
+        elif tag == "s":
+            text, offset = _read_string(data, offset)
+            args.append(text)
+        elif tag == "T":
+            args.append(True)
+        elif tag == "F":
+            args.append(False)
+        elif tag == "N":
+            args.append(None)
+        else:
+            raise ValueError(f"tipo OSC no soportado: {tag}")
+    return address, args
+
+
+def decode_packet(data: bytes) -> List[Tuple[str, List]]:
+    """Devuelve [(dirección, args)] de un paquete OSC (mensaje o bundle)."""
+    if data.startswith(b"#bundle\0"):
+        messages = []
+        offset = 16  # "#bundle\0" + timetag (se ignora: se aplica al llegar)
+        while offset + 4 <= len(data):
+            size = struct.unpack_from(">i", data, offset)[0]
+            offset += 4
+            messages.extend(decode_packet(data[offset:offset + size]))
+            offset += size
+        return messages
+    return [_read_message(data)]
+
+
+def encode_message(address: str, *args) -> bytes:
+    """Codifica un mensaje OSC (int, float, str, bool). Útil para pruebas y benchmarks."""
+
+    def _pad(raw: bytes) -> bytes:
+        raw += b"\0"
+        return raw + b"\0" * (-len(raw) % 4)
+
+    tags = ","
+    payload = b""
+    for arg in args:
+        if isinstance(arg, bool):
+            tags += "T" if arg else "F"
+        elif isinstance(arg, int):
+            tags += "i"
+            payload += struct.pack(">i", arg)
+        elif isinstance(arg, float):
+            tags += "f"
+            payload += struct.pack(">f", arg)
+        else:
+            tags += "s"
+            payload += _pad(str(arg).encode("utf-8"))
+    return _pad(address.encode("utf-8")) + _pad(tags.encode("ascii")) + payload
+
+
+# --- Dirección OSC -> comando ---
+
+def _finite(value) -> float:
+    """float de un argumento OSC; NaN/inf no son un valor válido."""
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"valor no finito: {value}")
+    return value
+
+
+def _morph_bars(value) -> int:
+    """Compases de morph de un argumento OSC (0..MAX_MORPH_BARS)."""
+    bars = int(value)
+    if not 0 <= bars <= MAX_MORPH_BARS:
+        raise ValueError(f"morph fuera de rango: {bars}")
+    return bars
+
+
+# Comandos globales: dirección -> (comando, tipo del argumento)
+GLOBAL_ADDRESSES = {
+    "/play": ("play", int),
+    "/bpm": ("bpm_set", _finite),
+    "/bpm/delta": ("bpm", int),
+    "/energy": ("energy_set", int),
+    "/energy/delta": ("energy", int),
+    "/scene": ("scene", int),
+    "/scene/save": ("scene_save", int),
+    "/fill": ("fill", None),
+    "/export": ("export", int),
+    "/morph/bars": ("morph_bars", _morph_bars),
+    "/morph/cancel": ("morph_cancel", None),
+    "/profile": ("profile", int),
+    "/deck/level": ("deck_level", _finite),
+    "/xfade": ("xfade", _finite),
+}
+
+# Comandos por pista: /track/<n>/<acción> (n empieza en 1, como las teclas)
+TRACK_ACTIONS = {
+    "mute": ("mute", int),
+    "solo": ("solo", int),
+    "lock": ("lock", int),
+    "density": ("density_set", _finite),
+    "density/delta": ("density", _finite),
+    "root": ("root_set", int),
+    "root/delta": ("root", int),
+    "swing": ("swing_set", _finite),
+    "swing/delta": ("swing", _finite),
+    "randomize": ("randomize", None),
+}
+
+# Comandos que admiten ir sin argumento (alternan o usan su valor por defecto)
+_OPTIONAL_VALUE = {"play", "mute", "solo", "lock", "export", "morph_bars", "profile"}
+
+
+def osc_to_command(address: str, args: List, ts: float) -> Optional[Command]:
+    """
+    Traduce un mensaje OSC al mismo Command que aplicaría el teclado.
+    Sin argumento, play/mute/solo/lock alternan; con argumento, fijan.
+    None si la dirección no existe o falta un argumento obligatorio;
+    ValueError/TypeError si el argumento no vale (p. ej. NaN o inf).
+    """
+    track = -1
+    if address.startswith("/track/"):
+        index, _, action = address[7:].partition("/")
+        entry = TRACK_ACTIONS.get(action)
+        if entry is None or not index.isdigit():
+            return None
+        track = int(index) - 1
+    elif address == "/select":
+        # /select n: número absoluto de pista (1-64), sin bancos
+        return Command("select", track=int(args[0]) - 1, ts=ts) if args else None
+    elif address == "/deck":
+        # /deck n: deck 1 = A (con --deck)
+        return Command("deck_set", value=int(args[0]) - 1, ts=ts) if args else None
+    else:
+        entry = GLOBAL_ADDRESSES.get(address)
+        if entry is None:
+            return None
+
+    name, conv = entry
+    value = None
+    if conv is not None:
+        if args:
+            value = conv(args[0])
+        elif name not in _OPTIONAL_VALUE:
+            return None
+    if name == "export" and value is None:
+        value = 0
+    return Command(name, track=track, value=value, ts=ts)
+
+
+class _OscProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server: "OscServer") -> None:
+        self.server = server
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.server.handle_packet(data)
+
+
+class OscServer:
+    """
+    Servidor OSC/UDP (por defecto solo localhost) con un bucle asyncio en
+    su propio hilo.
+
+    Cada mensaje se traduce a Command y se deja en la bandeja del motor
+    (append a una deque, sin locks); el bucle de steps los aplica entre
+    steps igual que las teclas. Las ráfagas no bloquean el audio: el hilo
+    solo decodifica y encola, y los comandos de tipo "fijar valor" de una
+    misma ráfaga se funden en la bandeja (CommandInbox.drain).
+    """
+
+    def __init__(self, inbox, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        self.inbox = inbox
+        self.host = host
+        self.port = port
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="osc", daemon=True)
+        self.error: Optional[Exception] = None
+
+        self.received = 0
+        self.unknown = 0
+        self.malformed = 0
+
+    def start(self, timeout: float = 2.0) -> bool:
+        """Arranca el hilo y espera a que el socket esté abierto. False si falla."""
+        self._thread.start()
+        self._ready.wait(timeout)
+        return self.error is None and self._loop is not None
+
+    def stop(self) -> None:
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+
+    def handle_packet(self, data: bytes) -> None:
+        ts = time.monotonic()
+        try:
+            messages = decode_packet(data)
+        except Exception:
+            self.malformed += 1
+            return
+        for address, args in messages:
+            self.received += 1
+            try:
+                cmd = osc_to_command(address, args, ts)
+            except (TypeError, ValueError, OverflowError):
+                # Argumento inválido (NaN, inf, texto...): no llega al motor
+                self.malformed += 1
+                continue
+            if cmd is None:
+                self.unknown += 1
+                continue
+            self.inbox.push(cmd)
+
+    def stats(self) -> str:
+        return f"OSC: {self.host}:{self.port} | {self.received} msgs | {self.unknown} ignorados"
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            transport, _ = loop.run_until_complete(
+                loop.create_datagram_endpoint(
+                    lambda: _OscProtocol(self), local_addr=(self.host, self.port)
+                )
+            )
+        except Exception as e:
+            self.error = e
+            self._ready.set()
+            loop.close()
+            return
+
+        # Puerto real (si se pidió el 0 = cualquiera libre)
+        self.port = transport.get_extra_info("sockname")[1]
+        self._loop = loop
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            transport.close()
+            loop.close()
+
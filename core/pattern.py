@@ -1,5 +1,6 @@
+import hashlib
 import random
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, List
 
 from core.pattern_packs import get_pattern
@@ -20,6 +21,55 @@ class TrackConfig:
     steps: int = 16
     # Estilo/tema global (dark_174, makina_180, industrial_172, custom...)
     style: str = "custom"
+    # Microtiming en fracciones de step: swing retrasa los steps impares;
+    # micro[i] desplaza el step i (se repite si es más corto que el ciclo)
+    swing: float = 0.0
+    micro: List[float] = field(default_factory=list)
+
+
+def step_offset(cfg: TrackConfig, step: int) -> float:
+    """
+    Desplazamiento de un step respecto a la rejilla, en fracciones de step
+    (0.25 = un cuarto de step tarde). Lo usan igual el motor en vivo y el
+    export, así que el .mid suena como el directo.
+    """
+    offset = cfg.swing if step % 2 else 0.0
+    micro = cfg.micro
+    if micro:
+        offset += micro[step % len(micro)]
+    return offset
+
+
+def derive_track_seed(session_seed: Optional[int], index: int) -> Optional[int]:
+    """
+    Seed propio de cada pista a partir del seed de sesión.
+    Cada pista tiene su RNG independiente: el resultado de una pista no
+    depende del orden ni del número de pistas que se generen a la vez.
+    """
+    if session_seed is None:
+        return None
+    return (session_seed * 1_000_003 + index * 7_919) & 0xFFFFFFFF
+
+
+def seed_from_text(text: str) -> int:
+    """
+    Seed de sesión a partir de un texto ("dark", "gig-berlin"...).
+    Estable entre ejecuciones y máquinas (hash() de str no lo es: cambia
+    en cada proceso con PYTHONHASHSEED).
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") & 0x7FFFFFFF
+
+
+def parse_seed(text: str) -> Optional[int]:
+    """Seed escrito por el usuario: entero tal cual, texto hasheado, vacío = None."""
+    text = text.strip()
+    if not text:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        return seed_from_text(text)
 
 
 class TrackPattern:
@@ -27,10 +77,17 @@ class TrackPattern:
     Generador de notas por pista basado en rol + estilo.
     Si hay un pattern pack para (style, role), se usa como esqueleto y
     se le añaden variaciones según densidad y energía.
+
+    Toda la aleatoriedad sale de `self.rng` (no del `random` global), así que
+    cada pista (y cada clon) se puede renderizar de forma independiente.
+
+    Con `state` (de get_state()) el patrón parte de ese estado, RNG incluido,
+    y no se siembra un RNG nuevo (sin seed, random.Random() leería urandom).
     """
 
-    def __init__(self, cfg: TrackConfig) -> None:
+    def __init__(self, cfg: TrackConfig, seed: Optional[int] = None, state: Optional[tuple] = None) -> None:
         self.cfg = cfg
+        self.rng = random.Random(seed) if state is None else random.Random.__new__(random.Random)
         self.scale = DARK_SCALES.get(cfg.scale, DARK_SCALES["darktech"])
 
         # Modo (bass base/gallop, etc.)
@@ -50,6 +107,9 @@ class TrackPattern:
             self.style, self.cfg.role, self.cfg.steps
         )
 
+        if state is not None:
+            self.set_state(state)
+
     # Utilidades
 
     def set_mode(self, mode: str) -> None:
@@ -67,14 +127,14 @@ class TrackPattern:
             if self.base_pattern[step]:
                 return self.cfg.root
             # Ghosts suaves en huecos cuando hay energía
-            if energy >= 4 and step % 4 in (2, 6, 10, 14) and random.random() < 0.2:
+            if energy >= 4 and step % 4 in (2, 6, 10, 14) and self.rng.random() < 0.2:
                 return self.cfg.root
             return None
 
         # Fallback genérico
         if step % 4 == 0:
             return self.cfg.root
-        if energy >= 4 and step in (2, 6, 10, 14) and random.random() < 0.3:
+        if energy >= 4 and step in (2, 6, 10, 14) and self.rng.random() < 0.3:
             return self.cfg.root
         return None
 
@@ -84,11 +144,11 @@ class TrackPattern:
                 if self.mode == "gallop":
                     interval = self.next_motif_interval()
                 else:
-                    interval = random.choice(self.scale)
+                    interval = self.rng.choice(self.scale)
                 return self.cfg.root + interval
             # Notas extra suaves
-            if energy >= 3 and random.random() < 0.04:
-                interval = random.choice(self.scale)
+            if energy >= 3 and self.rng.random() < 0.04:
+                interval = self.rng.choice(self.scale)
                 return self.cfg.root + interval
 
         # Fallback genérico
@@ -101,11 +161,11 @@ class TrackPattern:
             if self.mode == "gallop":
                 interval = self.next_motif_interval()
             else:
-                interval = random.choice(self.scale)
+                interval = self.rng.choice(self.scale)
             return self.cfg.root + interval
 
-        if energy >= 3 and random.random() < 0.06:
-            interval = random.choice(self.scale)
+        if energy >= 3 and self.rng.random() < 0.06:
+            interval = self.rng.choice(self.scale)
             return self.cfg.root + interval
 
         return None
@@ -114,16 +174,16 @@ class TrackPattern:
         if self.base_pattern:
             if self.base_pattern[step]:
                 return self.cfg.root
-            if energy >= 3 and random.random() < self.cfg.density * 0.4:
+            if energy >= 3 and self.rng.random() < self.cfg.density * 0.4:
                 return self.cfg.root
             return None
 
         # Fallback genérico
         offbeat = (step % 4 == 2)
-        if offbeat and random.random() < 0.9:
+        if offbeat and self.rng.random() < 0.9:
             return self.cfg.root
-        if energy >= 3 and step % 2 == 1 and random.random() < self.cfg.density:
-            return self.cfg.root + random.choice([0, 1])
+        if energy >= 3 and step % 2 == 1 and self.rng.random() < self.cfg.density:
+            return self.cfg.root + self.rng.choice([0, 1])
         return None
 
     def _stab_lead(self, step: int, energy: int) -> Optional[int]:
@@ -132,14 +192,14 @@ class TrackPattern:
 
         if self.base_pattern and self.base_pattern[step]:
             interval = self.next_motif_interval()
-            return self.cfg.root + interval + random.choice([0, 12])
+            return self.cfg.root + interval + self.rng.choice([0, 12])
 
-        if step in (1, 5, 9, 13) and random.random() < self.cfg.density:
+        if step in (1, 5, 9, 13) and self.rng.random() < self.cfg.density:
             interval = self.next_motif_interval()
-            return self.cfg.root + interval + random.choice([0, 12])
+            return self.cfg.root + interval + self.rng.choice([0, 12])
 
-        if energy >= 4 and random.random() < 0.03:
-            interval = random.choice(self.scale)
+        if energy >= 4 and self.rng.random() < 0.03:
+            interval = self.rng.choice(self.scale)
             return self.cfg.root + interval + 12
 
         return None
@@ -151,27 +211,27 @@ class TrackPattern:
                 return self.cfg.root
             return None
 
-        if step == 0 and random.random() < 0.9:
+        if step == 0 and self.rng.random() < 0.9:
             return self.cfg.root
         return None
 
     def _fx(self, step: int, energy: int) -> Optional[int]:
         if self.base_pattern and self.base_pattern[step]:
-            interval = random.choice(self.scale)
-            return self.cfg.root + interval + random.choice([0, 12, 24])
+            interval = self.rng.choice(self.scale)
+            return self.cfg.root + interval + self.rng.choice([0, 12, 24])
 
-        if energy >= 3 and random.random() < 0.02:
-            interval = random.choice(self.scale)
-            return self.cfg.root + interval + random.choice([0, 12, 24])
+        if energy >= 3 and self.rng.random() < 0.02:
+            interval = self.rng.choice(self.scale)
+            return self.cfg.root + interval + self.rng.choice([0, 12, 24])
         return None
 
     def _raw(self, step: int, energy: int) -> Optional[int]:
         if self.base_pattern and self.base_pattern[step]:
-            interval = random.choice(self.scale)
+            interval = self.rng.choice(self.scale)
             return self.cfg.root + interval
 
-        if random.random() < self.cfg.density * (0.3 + 0.15 * energy):
-            interval = random.choice(self.scale)
+        if self.rng.random() < self.cfg.density * (0.3 + 0.15 * energy):
+            interval = self.rng.choice(self.scale)
             return self.cfg.root + interval
         return None
 
@@ -199,12 +259,12 @@ class TrackPattern:
 
     def randomize_mode(self) -> None:
         if self.cfg.role == "bass":
-            self.mode = random.choice(["base", "gallop"])
+            self.mode = self.rng.choice(["base", "gallop"])
         else:
             self.mode = "base"
 
     def randomize_density_soft(self) -> None:
-        jitter = random.uniform(-0.15, 0.15)
+        jitter = self.rng.uniform(-0.15, 0.15)
         self.cfg.density = max(0.05, min(1.0, self.cfg.density + jitter))
 
     def request_fill(self) -> None:
@@ -216,7 +276,35 @@ class TrackPattern:
             # Aquí se puede meter lógica de fill más adelante.
             self.fill_requested = False
 
-    def clone_for_export(self) -> "TrackPattern":
+    def get_state(self) -> tuple:
+        """
+        Estado interno mutable (modo, motivo, compases, fill y RNG).
+        No incluye la configuración (cfg).
+        """
+        return (
+            self.mode,
+            tuple(self._motif),
+            self._motif_pos,
+            self.bar_count,
+            self.fill_requested,
+            self.rng.getstate(),
+        )
+
+    def set_state(self, state: tuple) -> None:
+        """Restaura un estado obtenido con get_state()."""
+        mode, motif, motif_pos, bar_count, fill_requested, rng_state = state
+        self.mode = mode
+        self._motif = list(motif)
+        self._motif_pos = motif_pos
+        self.bar_count = bar_count
+        self.fill_requested = fill_requested
+        self.rng.setstate(rng_state)
+
+    def clone(self) -> "TrackPattern":
+        """
+        Copia independiente (cfg propio) con el mismo estado, incluido el RNG:
+        el clon genera lo mismo que sonaría en vivo.
+        """
         cfg = self.cfg
         cloned_cfg = TrackConfig(
             name=cfg.name,
@@ -226,11 +314,10 @@ class TrackPattern:
             density=cfg.density,
             steps=cfg.steps,
             style=cfg.style,
+            swing=cfg.swing,
+            micro=list(cfg.micro),
         )
-        cloned = TrackPattern(cloned_cfg)
-        cloned.mode = self.mode
-        cloned._motif = list(self._motif)
-        cloned._motif_pos = self._motif_pos
-        cloned.bar_count = self.bar_count
-        cloned.fill_requested = self.fill_requested
-        return cloned
+        return TrackPattern(cloned_cfg, state=self.get_state())
+
+    def clone_for_export(self) -> "TrackPattern":
+        return self.clone()
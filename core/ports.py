@@ -0,0 +1,143 @@
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# Cache de puertos de salida. Enumerar puertos con rtmidi es lento y se
+# hacía una vez por pista + otra en el setup; ahora se hace una sola vez.
+_output_names: Optional[List[str]] = None
+
+
+def output_names(refresh: bool = False) -> List[str]:
+    """
+    Devuelve los nombres de puertos MIDI de salida.
+    La primera llamada enumera los puertos; las siguientes usan la caché
+    salvo que se pida `refresh=True`.
+    """
+    global _output_names
+    if _output_names is None or refresh:
+        import mido
+
+        _output_names = list(mido.get_output_names())
+    return list(_output_names)
+
+
+def _mido_open(name: str):
+    import mido
+
+    return mido.open_output(name)
+
+
+class PortManager:
+    """
+    Puertos de salida compartidos entre pistas + vigilancia de hot-plug.
+
+    Cada puerto se abre una sola vez aunque lo usen varias pistas. Un hilo
+    vigilante vuelve a enumerar cada `interval` segundos: las pistas cuyo
+    puerto desaparece quedan offline (MidiSynth descarta sus envíos) y se
+    reconectan solas cuando el puerto vuelve. Todo el trabajo lento (listar,
+    abrir, cerrar) ocurre en el hilo vigilante; el bucle de audio solo ve
+    cambiar la referencia `synth.port`.
+    """
+
+    def __init__(
+            self,
+            lister: Optional[Callable[[], List[str]]] = None,
+            opener: Optional[Callable[[str], object]] = None,
+    ) -> None:
+        self._lister = lister or (lambda: output_names(refresh=True))
+        self._opener = opener or _mido_open
+        self.names: List[str] = output_names() if lister is None else list(self._lister())
+        self._ports: Dict[str, object] = {}
+        self._synths: List = []
+        self._failed = set()  # puertos que fallaron al enviar (los marca MidiSynth)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.events = deque(maxlen=50)  # historial de desconexiones/reconexiones
+
+    def open(self, name: str):
+        """Devuelve el puerto compartido `name`, o None si no está disponible."""
+        port = self._ports.get(name)
+        if port is not None:
+            return port
+        if name not in self.names:
+            return None
+        try:
+            port = self._opener(name)
+        except Exception:
+            return None
+        self._ports[name] = port
+        return port
+
+    def register(self, synth) -> None:
+        self._synths.append(synth)
+
+    def report_failure(self, name: str) -> None:
+        """Llamado desde el bucle de audio si un envío falla (solo añade a un set)."""
+        self._failed.add(name)
+
+    def offline(self) -> List[str]:
+        return sorted({s.port_name for s in self._synths if s.port is None})
+
+    # --- Vigilancia ---
+
+    def scan(self) -> None:
+        """Re-enumera puertos y desconecta/reconecta pistas según haga falta."""
+        try:
+            names = list(self._lister())
+        except Exception:
+            return
+        self.names = names
+        available = set(names)
+
+        failed = set(self._failed)
+        self._failed.difference_update(failed)
+
+        # Puertos que han desaparecido o fallado: fuera
+        for name in list(self._ports):
+            if name not in available or name in failed:
+                port = self._ports.pop(name)
+                for synth in self._synths:
+                    if synth.port_name == name:
+                        synth.port_lost()
+                try:
+                    port.close()
+                except Exception:
+                    pass
+                self.events.append(f"offline: {name}")
+
+        # Pistas offline cuyo puerto está (de nuevo) disponible
+        reopened = set()
+        for synth in self._synths:
+            if synth.port is None and synth.port_name in available:
+                port = self.open(synth.port_name)
+                if port is not None:
+                    synth.port_restored(port)
+                    reopened.add(synth.port_name)
+        for name in sorted(reopened):
+            self.events.append(f"online: {name}")
+
+    def start_watcher(self, interval: float = 2.0) -> None:
+        if self._thread is not None:
+            return
+
+        def _run() -> None:
+            while not self._stop.wait(interval):
+                self.scan()
+
+        self._thread = threading.Thread(target=_run, name="port-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+_default_manager: Optional[PortManager] = None
+
+
+def get_port_manager() -> PortManager:
+    """PortManager compartido por todo el proceso."""
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = PortManager()
+    return _default_manager
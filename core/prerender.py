@@ -0,0 +1,186 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Tuple
+
+from core.pattern import TrackPattern, TrackConfig
+
+
+@dataclass
+class BarSnapshot:
+    """
+    Foto del motor al inicio de un compás, tomada en el step 0 desde el
+    bucle de audio. Es todo lo que el hilo de pre-render necesita para
+    simular el compás en curso sin tocar objetos vivos.
+    """
+    bar_index: int
+    version: int
+    steps: int
+    energy: int
+    cfgs: List[TrackConfig]  # copias
+    states: List[tuple]  # TrackPattern.get_state() por pista
+    muted: List[bool]
+    solo: List[bool]
+
+
+@dataclass
+class PrerenderedBar:
+    """
+    Compás siguiente ya generado para una escena.
+    notes[step][pista] es la nota (o None); states es el estado de cada
+    patrón al terminar ese compás.
+    """
+    slot: int
+    bar_index: int
+    version: int
+    notes: List[List[Optional[int]]]
+    states: List[tuple]
+
+
+class ScenePrerenderer:
+    """
+    Mantiene, para cada escena guardada, el próximo compás ya generado con
+    los parámetros de esa escena. Así, al entrar una escena en un límite de
+    compás, el motor reproduce desde un buffer listo en vez de generar.
+
+    Cada compás el motor envía un BarSnapshot (sin bloquear: SimpleQueue).
+    El hilo simula el compás en curso con clones y, para cada escena,
+    aplica sus parámetros y genera el compás siguiente. Un buffer solo es
+    válido si nada cambió desde la foto (`version` del motor): en ese caso
+    su contenido es idéntico a lo que habría generado el motor en vivo.
+
+    Memoria acotada: como mucho 9 escenas × pistas × steps notas (más un
+    estado de patrón por pista y escena).
+    """
+
+    def __init__(self, scene_mgr) -> None:
+        self.scene_mgr = scene_mgr
+        self._requests: "queue.SimpleQueue[Optional[BarSnapshot]]" = queue.SimpleQueue()
+        self._buffers: Dict[int, PrerenderedBar] = {}
+        self._thread = threading.Thread(target=self._run, name="prerender", daemon=True)
+
+        # Métricas del último refresco
+        self.last_cpu_ms = 0.0
+        self.last_wall_ms = 0.0
+        self.last_scenes = 0
+        self.refreshes = 0
+        self.hits = 0
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._requests.put(None)
+
+    def request(self, snapshot: BarSnapshot) -> None:
+        """Llamado desde el bucle de audio al inicio de cada compás."""
+        self._requests.put(snapshot)
+
+    def take(self, slot: int, bar_index: int, version: int) -> Optional[PrerenderedBar]:
+        """
+        Devuelve el buffer de `slot` si corresponde a este compás y el estado
+        no ha cambiado desde la foto; si no, None (el motor genera en vivo).
+        """
+        buf = self._buffers.get(slot)
+        if buf is None or buf.bar_index != bar_index or buf.version != version:
+            return None
+        self.hits += 1
+        return buf
+
+    def stats(self) -> str:
+        return (
+            f"PRE: {self.last_scenes} esc | {self.last_cpu_ms:.1f} ms cpu / "
+            f"{self.last_wall_ms:.1f} ms | hits {self.hits}"
+        )
+
+    # --- Hilo ---
+
+    def _run(self) -> None:
+        while True:
+            snap = self._requests.get()
+            # Si se acumularon fotos, solo interesa la última
+            try:
+                while True:
+                    newer = self._requests.get_nowait()
+                    if newer is None:
+                        return
+                    snap = newer
+            except queue.Empty:
+                pass
+            if snap is None:
+                return
+            self.refresh(snap)
+
+    def refresh(self, snap: BarSnapshot) -> None:
+        """
+        Regenera los buffers de todas las escenas a partir de una foto.
+        Se puede llamar directamente (de forma síncrona) para render offline.
+        """
+        wall0 = time.perf_counter()
+        cpu0 = time.thread_time()
+
+        scenes = list(self.scene_mgr.scenes.items())
+        buffers: Dict[int, PrerenderedBar] = {}
+        for slot, scene in scenes:
+            buffers[slot] = self._render_scene(slot, scene, snap)
+        self._buffers = buffers
+
+        self.last_cpu_ms = (time.thread_time() - cpu0) * 1000
+        self.last_wall_ms = (time.perf_counter() - wall0) * 1000
+        self.last_scenes = len(scenes)
+        self.refreshes += 1
+
+    def _render_scene(self, slot: int, scene, snap: BarSnapshot) -> PrerenderedBar:
+        n = len(snap.cfgs)
+        cfgs = [replace(c) for c in snap.cfgs]
+        # Desde el estado del snapshot (RNG incluido): sin sembrar RNG nuevos
+        patterns = [TrackPattern(cfg, state=state) for cfg, state in zip(cfgs, snap.states)]
+
+        # 1) Compás en curso con los parámetros actuales (igual que Engine.step)
+        muted = list(snap.muted)
+        solo = list(snap.solo)
+        _play_bar(patterns, muted, solo, snap.steps, snap.energy)
+
+        # 2) Parámetros de la escena (igual que un SceneBlock en el límite de compás)
+        for i, st in enumerate(scene.tracks[:n]):
+            muted[i], solo[i] = st.muted, st.solo
+            if st.density is not None:
+                cfgs[i].density = st.density
+            if st.root is not None:
+                cfgs[i].root = st.root
+
+        # 3) Compás siguiente, guardando las notas
+        notes = _play_bar(patterns, muted, solo, snap.steps, scene.energy)
+
+        return PrerenderedBar(
+            slot=slot,
+            bar_index=snap.bar_index + 1,
+            version=snap.version,
+            notes=notes,
+            states=[p.get_state() for p in patterns],
+        )
+
+
+def _play_bar(
+        patterns: List[TrackPattern],
+        muted: List[bool],
+        solo: List[bool],
+        steps: int,
+        energy: int,
+) -> List[List[Optional[int]]]:
+    """Genera un compás completo con la misma lógica de mute/solo que el motor."""
+    any_solo = any(solo)
+    audible: List[Tuple[int, TrackPattern]] = [
+        (i, p) for i, p in enumerate(patterns)
+        if not (any_solo and not solo[i]) and not muted[i]
+    ]
+    notes: List[List[Optional[int]]] = []
+    for step in range(steps):
+        row: List[Optional[int]] = [None] * len(patterns)
+        for i, p in audible:
+            row[i] = p.step_note(step, energy)
+        notes.append(row)
+    for p in patterns:
+        p.advance_bar()
+    return notes
@@ -0,0 +1,154 @@
+import wave
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (start_tick, duration_ticks, note, velocity), igual que MidiExporter.render_notes
+NoteEvent = Tuple[int, int, int, int]
+
+# Cola extra (segundos) que suena cada voz tras su note_off
+ROLE_TAILS: Dict[str, float] = {
+    "kick": 0.30,
+    "bass": 0.05,
+    "hats": 0.05,
+    "perc": 0.12,
+    "stab": 0.15,
+    "lead": 0.10,
+    "pad": 0.30,
+    "fx": 0.20,
+    "raw": 0.08,
+}
+
+
+def _mtof(note: int) -> float:
+    return 440.0 * 2.0 ** ((note - 69) / 12.0)
+
+
+class PreviewRenderer:
+    """
+    Render offline de audio (WAV mono 16 bits) a partir de los mismos eventos
+    que produce MidiExporter, con voces sencillas por rol. Sirve para escuchar
+    un export en máquinas sin sintes conectados.
+
+    Cada voz se sintetiza de golpe con NumPy (un bloque por nota) y se suma
+    en un buffer preasignado. Los bloques se cachean por (rol, nota, vel,
+    duración): en un loop la mayoría de notas se repiten.
+    """
+
+    def __init__(self, sample_rate: int = 44100, seed: int = 0) -> None:
+        self.sample_rate = sample_rate
+        self._noise_rng = np.random.default_rng(seed)
+        self._cache: Dict[Tuple[str, int, int, int], np.ndarray] = {}
+
+    # --- Voces por rol ---
+
+    def _voice(self, role: str, note: int, velocity: int, n_samples: int, gate: int) -> np.ndarray:
+        sr = self.sample_rate
+        t = np.arange(n_samples, dtype=np.float64) / sr
+        gate_s = gate / sr
+        f = _mtof(note)
+        amp = velocity / 127.0
+
+        if role == "kick":
+            # Seno con barrido de pitch hacia la fundamental
+            freq = f + 3.0 * f * np.exp(-t * 35.0)
+            phase = 2.0 * np.pi * np.cumsum(freq) / sr
+            out = np.sin(phase) * np.exp(-t * 9.0)
+        elif role == "bass":
+            saw = 2.0 * ((t * f) % 1.0) - 1.0
+            out = (0.6 * saw + 0.4 * np.sin(2.0 * np.pi * f * t)) * np.exp(-t * 5.0)
+        elif role in ("hats", "perc"):
+            noise = self._noise_rng.uniform(-1.0, 1.0, n_samples)
+            if role == "hats":
+                # Diferencia de primer orden ~ pasa-altos barato
+                out = np.diff(noise, prepend=0.0) * 0.5 * np.exp(-t * 70.0)
+            else:
+                tone = np.sin(2.0 * np.pi * f * t)
+                out = (0.6 * noise + 0.4 * tone) * np.exp(-t * 25.0)
+        elif role == "stab":
+            out = np.sign(np.sin(2.0 * np.pi * f * t)) * 0.5 * np.exp(-t * 8.0)
+        elif role == "lead":
+            saw = 2.0 * ((t * f) % 1.0) - 1.0
+            out = saw * 0.5 * np.exp(-t * 3.0)
+        elif role == "pad":
+            out = np.zeros(n_samples)
+            for detune in (0.995, 1.0, 1.005):
+                out += 2.0 * ((t * f * detune) % 1.0) - 1.0
+            out *= 0.2
+        else:
+            # fx / raw
+            vib = 1.0 + 0.01 * np.sin(2.0 * np.pi * 6.0 * t)
+            out = np.sin(2.0 * np.pi * f * vib * t) * 0.6
+
+        # Envolvente de gate: ataque corto y release tras el note_off
+        attack = np.minimum(t / 0.003, 1.0)
+        release = np.clip(1.0 - (t - gate_s) / max(1e-3, ROLE_TAILS.get(role, 0.1)), 0.0, 1.0)
+        return out * attack * release * amp
+
+    def _block(self, role: str, note: int, velocity: int, gate: int) -> np.ndarray:
+        key = (role, note, velocity, gate)
+        block = self._cache.get(key)
+        if block is None:
+            tail = int(ROLE_TAILS.get(role, 0.1) * self.sample_rate)
+            block = self._voice(role, note, velocity, gate + tail, gate)
+            self._cache[key] = block
+        return block
+
+    # --- API principal ---
+
+    def render(
+            self,
+            tracks: Sequence[Tuple[str, List[NoteEvent]]],
+            bpm: int,
+            ticks_per_beat: int,
+            total_ticks: int,
+            path: str,
+            tempo_map: Optional[List[Tuple[int, int]]] = None,
+    ) -> str:
+        """
+        Renderiza las pistas (rol, eventos) a un WAV en `path`.
+        `tempo_map` (opcional): [(tick, µs por negra)] como el del .mid; los
+        ticks pasan a muestras tramo a tramo.
+        Devuelve la ruta absoluta del archivo creado.
+        """
+        sr = self.sample_rate
+        if tempo_map:
+            # Muestra de cada cambio de tempo (y del final): lineal por tramos
+            knots = [tick for tick, _ in tempo_map] + [max(total_ticks, tempo_map[-1][0]) + ticks_per_beat]
+            marks = [0.0]
+            for (tick, tempo), end in zip(tempo_map, knots[1:]):
+                marks.append(marks[-1] + (end - tick) * tempo / 1e6 / ticks_per_beat * sr)
+
+            def sample(tick: float) -> int:
+                return int(np.interp(tick, knots, marks))
+        else:
+            samples_per_tick = (60.0 / bpm) / ticks_per_beat * sr
+
+            def sample(tick: float) -> int:
+                return int(tick * samples_per_tick)
+
+        length = sample(total_ticks)
+        tail = int(max(ROLE_TAILS.values()) * sr)
+        buf = np.zeros(length + tail, dtype=np.float64)
+
+        for role, events in tracks:
+            for start_tick, dur_ticks, note, vel in events:
+                start = sample(start_tick)
+                gate = max(1, sample(start_tick + dur_ticks) - start)
+                block = self._block(role, note, vel, gate)
+                end = min(start + len(block), len(buf))
+                buf[start:end] += block[:end - start]
+
+        peak = np.max(np.abs(buf)) if len(buf) else 0.0
+        if peak > 0:
+            buf *= 0.9 / peak
+        pcm = (buf * 32767.0).astype("<i2")
+
+        filepath = Path(path).resolve()
+        with wave.open(str(filepath), "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(sr)
+            wf.writeframes(pcm.tobytes())
+        return str(filepath)
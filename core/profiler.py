@@ -0,0 +1,162 @@
+import time
+from typing import Dict, List, Optional
+
+# Cubos log2 en µs: el cubo k cuenta duraciones en [2^(k-1), 2^k) µs
+# (k=0: menos de 1 µs). El último acumula todo lo que pase de ~2 s.
+HIST_BINS = 22
+
+now_ns = time.monotonic_ns
+
+
+def _bin_label(k: int) -> str:
+    if k == 0:
+        return "<1µs"
+    us = 1 << k
+    if us >= 1_000_000:
+        return f"<{us // 1_000_000}s"
+    if us >= 1000:
+        return f"<{us // 1000}ms"
+    return f"<{us}µs"
+
+
+def _fmt_us(ns: float) -> str:
+    us = ns / 1000
+    if us >= 1000:
+        return f"{us / 1000:.2f} ms"
+    return f"{us:.1f} µs"
+
+
+class PhaseStats:
+    """Contadores de una fase: llamadas, suma, máximo e histograma log2."""
+
+    __slots__ = ("count", "total_ns", "max_ns", "hist")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.hist = [0] * HIST_BINS
+
+    def add(self, ns: int) -> None:
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.hist[min(HIST_BINS - 1, (ns // 1000).bit_length())] += 1
+
+    @property
+    def mean_ns(self) -> float:
+        return self.total_ns / self.count if self.count else 0.0
+
+    def percentile_ns(self, q: float) -> int:
+        """Cota superior (borde del cubo) del percentil q (0-1)."""
+        target = self.count * q
+        acc = 0
+        for k, n in enumerate(self.hist):
+            acc += n
+            if n and acc >= target:
+                return (1 << k) * 1000 if k else 1000
+        return self.max_ns
+
+
+class PhaseProfiler:
+    """
+    Perfil por fases del bucle de steps (teclas, UI, generación por pista,
+    envío MIDI, note_off).
+
+    Quien mide comprueba `enabled` antes de leer el reloj: desactivado, el
+    coste es un if por fase. Activado, cada medida son dos monotonic_ns()
+    y un add() (suma, máximo y un cubo de histograma, sin listas que
+    crezcan).
+
+    Las fases de generación se llaman "gen:<rol>:<pista>" para poder
+    agregarlas por rol.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.phases: Dict[str, PhaseStats] = {}
+
+    def add(self, phase: str, ns: int) -> None:
+        st = self.phases.get(phase)
+        if st is None:
+            st = self.phases[phase] = PhaseStats()
+        st.add(ns)
+
+    def reset(self) -> None:
+        self.phases = {}
+
+    @property
+    def steps(self) -> int:
+        st = self.phases.get("step")
+        return st.count if st is not None else 0
+
+    def by_role(self) -> Dict[str, PhaseStats]:
+        """Fases de generación agregadas por rol."""
+        roles: Dict[str, PhaseStats] = {}
+        for name, st in list(self.phases.items()):
+            if not name.startswith("gen:"):
+                continue
+            role = name.split(":")[1]
+            agg = roles.get(role)
+            if agg is None:
+                agg = roles[role] = PhaseStats()
+            agg.count += st.count
+            agg.total_ns += st.total_ns
+            agg.max_ns = max(agg.max_ns, st.max_ns)
+            agg.hist = [a + b for a, b in zip(agg.hist, st.hist)]
+        return roles
+
+    def _row(self, name: str, st: PhaseStats, budget_ns: float, steps: int) -> str:
+        # Cuota del presupuesto: tiempo total de la fase / (steps × duración del step)
+        share = st.total_ns / (steps * budget_ns) * 100 if steps and budget_ns else 0.0
+        return (
+            f"{name[:24]:<24} {st.count:>7} {_fmt_us(st.mean_ns):>10} "
+            f"{'≤' + _fmt_us(st.percentile_ns(0.99)):>10} {_fmt_us(st.max_ns):>10} {share:>6.2f}%"
+        )
+
+    def overlay(self, budget_ns: float, top: int = 10) -> List[str]:
+        """
+        Líneas para el overlay del dashboard: fases ordenadas por tiempo
+        total, con media, p99, máximo y % del presupuesto del step.
+        """
+        steps = self.steps
+        header = f"{'fase':<24} {'n':>7} {'media':>10} {'p99':>10} {'máx':>10} {'%step':>7}"
+        # list(): el hilo de NoteQueue puede añadir fases mientras tanto
+        items = sorted(list(self.phases.items()), key=lambda kv: kv[1].total_ns, reverse=True)
+        lines = [header] + [self._row(name, st, budget_ns, steps) for name, st in items[:top]]
+        roles = sorted(self.by_role().items(), key=lambda kv: kv[1].total_ns, reverse=True)
+        if roles:
+            lines.append("")
+            lines += [self._row(f"rol:{role}", st, budget_ns, steps) for role, st in roles]
+        return lines
+
+    def dump(self, budget_ns: float, width: int = 40) -> str:
+        """Histograma por fase (texto), para imprimir al salir."""
+        steps = self.steps
+        out = [f"=== Perfil por fase: {steps} steps, presupuesto {_fmt_us(budget_ns)} por step ==="]
+        for name, st in sorted(list(self.phases.items())):
+            out.append(self._row(name, st, budget_ns, steps))
+            used = [k for k, n in enumerate(st.hist) if n]
+            if not used:
+                continue
+            peak = max(st.hist)
+            for k in range(used[0], used[-1] + 1):
+                n = st.hist[k]
+                bar = "█" * max(1 if n else 0, round(n / peak * width))
+                out.append(f"    {_bin_label(k):>7} | {bar} {n if n else ''}")
+        return "\n".join(out)
+
+    def has_data(self) -> bool:
+        return bool(self.phases)
+
+
+def phase_name(role: str, name: str) -> str:
+    return f"gen:{role}:{name}"
+
+
+def active(profiler: Optional[PhaseProfiler]):
+    """Profiler si está activo, o None (para comprobar una sola vez por step)."""
+    if profiler is not None and profiler.enabled:
+        return profiler
+    return None
@@ -1,85 +1,220 @@
-import yaml
+import copy
+import json
+import os
 from pathlib import Path
-from typing import Optional
-from dataclasses import asdict
+from typing import Dict, List, Optional
+from dataclasses import asdict, fields
 
-from core.config import SessionConfig, TrackSetup
+from core.config import SessionConfig, TrackSetup, validate_session
+
+# Caché de perfiles ya validados: {ruta: [mtime_ns, size, session_to_data()]}
+# en JSON. Solo datos planos: el directorio lo edita el usuario y cargar la
+# caché no debe poder ejecutar código.
+CACHE_FILE = ".profile_cache.json"
+# La versión sale de los campos de las dataclasses: si cambia el esquema, la
+# caché vieja deja de valer sola
+CACHE_VERSION = "|".join(
+    ",".join(f.name for f in fields(cls)) for cls in (SessionConfig, TrackSetup)
+)
+
+
+def _yaml_loader():
+    """
+    Devuelve (módulo yaml, Loader). Usa el loader en C de libyaml si está
+    disponible; si no, el SafeLoader en Python puro.
+    yaml solo se importa cuando hace falta parsear o escribir un perfil.
+    """
+    import yaml
+
+    return yaml, getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def _track_data(track: TrackSetup) -> Dict:
+    """Pista como dict para YAML; el microtiming solo se escribe si se usa."""
+    data = asdict(track)
+    if not track.swing:
+        del data["swing"]
+    if not track.micro:
+        del data["micro"]
+    return data
+
+
+def session_to_data(session: SessionConfig) -> Dict:
+    """Sesión como datos planos (lo que se escribe en el .yml)."""
+    data = {
+        "bpm": session.bpm,
+        "steps": session.steps,
+        "energy": session.energy,
+        "theme": getattr(session, "theme", "custom"),
+        "tracks": [_track_data(t) for t in session.tracks],
+    }
+    if session.clock_out:
+        data["clock_out"] = list(session.clock_out)
+    if session.scenes:
+        data["scenes"] = session.scenes
+    if session.automation:
+        data["automation"] = session.automation
+    return data
+
+
+def session_from_data(data: Dict) -> SessionConfig:
+    """Inverso de session_to_data (sin validar)."""
+    tracks = [
+        TrackSetup(
+            name=t["name"],
+            role=t["role"],
+            port_name=t["port_name"],
+            root=t["root"],
+            scale=t["scale"],
+            density=t["density"],
+            steps=t.get("steps", data["steps"]),
+            swing=float(t.get("swing", 0.0)),
+            micro=[float(m) for m in t.get("micro") or []],
+        )
+        for t in data["tracks"]
+    ]
+    return SessionConfig(
+        bpm=data["bpm"],
+        steps=data["steps"],
+        energy=data.get("energy", 3),
+        tracks=tracks,
+        theme=data.get("theme", "custom"),
+        # int(): en JSON (caché) las claves de los slots llegan como texto
+        scenes={int(slot): scene for slot, scene in (data.get("scenes") or {}).items()},
+        clock_out=list(data.get("clock_out") or []),
+        automation=data.get("automation") or {},
+    )
 
 
 class ProfileManager:
     """
     Gestiona perfiles de configuración guardados en YAML.
+
+    Los perfiles cargados y validados se guardan como datos planos en una
+    caché JSON dentro del directorio de perfiles, indexada por ruta + mtime +
+    tamaño del .yml. Mientras el archivo no cambie, cargarlo no requiere
+    ni parsear YAML ni importar yaml.
     """
 
     def __init__(self, profiles_dir: str = "profiles"):
         self.profiles_dir = Path(profiles_dir)
         self.profiles_dir.mkdir(exist_ok=True)
+        self.cache_path = self.profiles_dir / CACHE_FILE
+        self._cache: Optional[Dict[str, List]] = None
+
+    # --- Caché compilada ---
+
+    def _read_cache(self) -> Dict[str, List]:
+        if self._cache is None:
+            try:
+                with open(self.cache_path, "r") as f:
+                    data = json.load(f)
+                if data.get("version") != CACHE_VERSION:
+                    raise ValueError("versión de caché distinta")
+                self._cache = data["entries"]
+            except Exception:
+                # Caché ausente, corrupta o de otra versión: se reconstruye
+                self._cache = {}
+        return self._cache
+
+    def _write_cache(self) -> None:
+        tmp_path = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"version": CACHE_VERSION, "entries": self._read_cache()}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Aviso: no se pudo escribir la caché de perfiles: {e}")
+
+    def _parse_profile(self, profile_path: Path) -> SessionConfig:
+        """
+        Parsea y valida un .yml. Lanza ValueError si el perfil no es válido.
+        """
+        yaml, loader = _yaml_loader()
+        with open(profile_path, "r") as f:
+            data = yaml.load(f, Loader=loader)
+
+        session = session_from_data(data)
+        errors = validate_session(session)
+        if errors:
+            raise ValueError("; ".join(errors))
+        return session
+
+    def _load_compiled(self, profile_path: Path, write_cache: bool = True) -> SessionConfig:
+        st = profile_path.stat()
+        key = str(profile_path.resolve())
+        cache = self._read_cache()
+
+        entry = cache.get(key)
+        if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            # Copia: nadie comparte escenas/automatización con la caché
+            return session_from_data(copy.deepcopy(entry[2]))
+
+        session = self._parse_profile(profile_path)
+        cache[key] = [st.st_mtime_ns, st.st_size, copy.deepcopy(session_to_data(session))]
+        if write_cache:
+            self._write_cache()
+        return session
+
+    # --- API ---
 
     def load_profile(self, profile_name: str) -> Optional[SessionConfig]:
         """
-        Carga un perfil desde archivo YAML.
+        Carga un perfil desde archivo YAML (o desde la caché compilada).
         """
         profile_path = self.profiles_dir / f"{profile_name}.yml"
         if not profile_path.exists():
             return None
 
         try:
-            with open(profile_path, "r") as f:
-                data = yaml.safe_load(f)
-
-            tracks = [
-                TrackSetup(
-                    name=t["name"],
-                    role=t["role"],
-                    port_name=t["port_name"],
-                    root=t["root"],
-                    scale=t["scale"],
-                    density=t["density"],
-                    steps=t.get("steps", data["steps"]),
-                )
-                for t in data["tracks"]
-            ]
-
-            theme = data.get("theme", "custom")
-
-            return SessionConfig(
-                bpm=data["bpm"],
-                steps=data["steps"],
-                energy=data.get("energy", 3),
-                tracks=tracks,
-                theme=theme,
-            )
+            return self._load_compiled(profile_path)
         except Exception as e:
             print(f"Error cargando perfil '{profile_name}': {e}")
             return None
 
+    def compile_all(self) -> Dict[str, List[str]]:
+        """
+        Valida y compila todos los perfiles del directorio en la caché.
+        Devuelve {perfil: errores}; la lista está vacía si el perfil es válido.
+        """
+        results: Dict[str, List[str]] = {}
+        for name in self.list_profiles():
+            try:
+                self._load_compiled(self.profiles_dir / f"{name}.yml", write_cache=False)
+                results[name] = []
+            except Exception as e:
+                results[name] = [str(e)]
+        self._write_cache()
+        return results
+
     def save_profile(self, profile_name: str, session: SessionConfig) -> bool:
         """
         Guarda una sesión como perfil.
+        La escritura es atómica (archivo temporal + rename): un corte a mitad
+        de guardado nunca deja un perfil a medias.
         """
         profile_path = self.profiles_dir / f"{profile_name}.yml"
+        tmp_path = profile_path.with_name(profile_path.name + ".tmp")
         try:
-            data = {
-                "bpm": session.bpm,
-                "steps": session.steps,
-                "energy": session.energy,
-                "theme": getattr(session, "theme", "custom"),
-                "tracks": [asdict(t) for t in session.tracks],
-            }
-            with open(profile_path, "w") as f:
+            yaml, _ = _yaml_loader()
+            data = session_to_data(session)
+            with open(tmp_path, "w") as f:
                 yaml.dump(
                     data,
                     f,
                     default_flow_style=False,
                     sort_keys=False,
                 )
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, profile_path)
             return True
         except Exception as e:
             print(f"Error guardando perfil '{profile_name}': {e}")
             return False
 
     def list_profiles(self) -> list[str]:
-        return [p.stem for p in self.profiles_dir.glob("*.yml")]
+        return sorted(p.stem for p in self.profiles_dir.glob("*.yml"))
 
     def delete_profile(self, profile_name: str) -> bool:
         profile_path = self.profiles_dir / f"{profile_name}.yml"
@@ -0,0 +1,169 @@
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import mido
+
+from core.commands import Command
+from core.control_log import END, LOCATE, read_log
+from core.engine import Engine
+from core.midi_export import MidiExporter
+from core.profiles import session_from_data
+
+# Comandos del log que no cambian la música: en el replay se ignoran
+# (export escribiría archivos; quit y profile solo tocan el programa en vivo)
+SKIPPED = {"export", "profile", "quit", END}
+
+# Nota capturada: (track, instante s, duración s, nota, velocidad)
+_Captured = Tuple[int, float, float, int, int]
+
+
+@dataclass
+class ReplayResult:
+    """Resultado de reproducir un log de control a .mid."""
+    path: str
+    steps: int
+    notes: int
+    seconds: float  # duración del set
+    elapsed: float  # tiempo de render
+
+
+class _CaptureSynth:
+    """Synth offline: guarda las notas del step en curso para pasarlas a ticks."""
+
+    def __init__(self, track: int, captured: List[_Captured]) -> None:
+        self.track = track
+        self.captured = captured
+        self.online = True
+
+    def schedule_note(self, note: int, velocity: int, length: float, at: Optional[float] = None) -> None:
+        self.captured.append((self.track, at, length, note, velocity))
+
+    def process_pending(self) -> None:
+        pass
+
+    def panic(self) -> None:
+        pass
+
+
+def _group_by_step(records: List[Tuple[int, Command]]) -> Dict[int, List[Command]]:
+    by_step: Dict[int, List[Command]] = {}
+    for step, cmd in records:
+        by_step.setdefault(step, []).append(cmd)
+    return by_step
+
+
+def _end_step(records: List[Tuple[int, Command]], steps_per_bar: int) -> int:
+    """Step del cierre; si el log no se cerró (corte), un compás tras el último registro."""
+    for step, cmd in reversed(records):
+        if cmd.name == END:
+            return step
+    return (records[-1][0] if records else 0) + steps_per_bar
+
+
+def _note_track(name: str, notes: List[Tuple[int, int, int, int]]) -> mido.MidiTrack:
+    """
+    MidiTrack de una pista a partir de (inicio, fin, nota, velocidad) en ticks.
+    Misma regla que las tablas de voces en vivo: si una nota se vuelve a
+    disparar mientras suena, la anterior se corta en ese instante.
+    """
+    notes.sort()
+    sounding: Dict[int, int] = {}  # nota -> índice de la última vez que sonó
+    for i, (start, end, note, vel) in enumerate(notes):
+        prev = sounding.get(note)
+        if prev is not None and notes[prev][1] > start:
+            p_start, _, _, p_vel = notes[prev]
+            notes[prev] = (p_start, start, note, p_vel)
+        sounding[note] = i
+
+    events = []  # (tick, es_on, nota, velocidad)
+    for start, end, note, vel in notes:
+        events.append((start, True, note, vel))
+        events.append((max(end, start), False, note, 0))
+    # En el mismo tick, primero note_off y luego note_on
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    track = mido.MidiTrack()
+    track.append(mido.MetaMessage("track_name", name=name, time=0))
+    current = 0
+    for tick, is_on, note, vel in events:
+        track.append(mido.Message("note_on" if is_on else "note_off", note=note, velocity=vel, time=tick - current))
+        current = tick
+    track.append(mido.MetaMessage("end_of_track", time=0))
+    return track
+
+
+def replay_log(log_path: str, out_path: Optional[str] = None) -> ReplayResult:
+    """
+    Reconstruye un set a partir de su log de control y lo renderiza a .mid.
+
+    La sesión de partida y el seed salen de la cabecera del log; cada
+    comando se aplica antes del step en que se aplicó en vivo y el motor
+    genera los steps sin esperar al reloj (mucho más rápido que tiempo
+    real). Las notas se pasan a ticks con su swing/micro (120 ticks por
+    step, como MidiExporter) y cada cambio de tempo (BPM o rampa de la
+    automatización) va como set_tempo en la pista de tempo. Mismo log ->
+    mismo .mid.
+    """
+    t0 = time.perf_counter()
+    header, records = read_log(log_path)
+    session = session_from_data(header["session"])
+    by_step = _group_by_step(records)
+    end = _end_step(records, session.steps)
+
+    captured: List[_Captured] = []
+    synths = [_CaptureSynth(i, captured) for i in range(len(session.tracks))]
+    engine = Engine(session, synths, seed=header.get("seed"))
+
+    tpb = MidiExporter.TICKS_PER_BEAT
+    tps = tpb // 4
+    notes: List[List[Tuple[int, int, int, int]]] = [[] for _ in session.tracks]
+    tempo = mido.MidiTrack()
+    tempo.append(mido.MetaMessage("track_name", name="tempo", time=0))
+    tempo_tick = 0
+    last_tempo = None
+    t = 0.0
+    for k in range(end):
+        for cmd in by_step.get(k, ()):
+            if cmd.name == LOCATE:
+                engine.locate(int(cmd.value))
+            elif cmd.name not in SKIPPED:
+                engine.apply(cmd)
+
+        engine.step(at=t)
+        # Como en el bucle en vivo: el step dura lo que marca el reloj tras generarlo
+        dur = engine.clock.get_step_duration()
+        tick = k * tps
+        # µs por negra de la duración real del step (en una rampa no sale del BPM entero)
+        us = round(dur * engine.clock.steps_per_beat * 1e6)
+        if us != last_tempo:
+            last_tempo = us
+            tempo.append(mido.MetaMessage("set_tempo", tempo=us, time=tick - tempo_tick))
+            tempo_tick = tick
+
+        for track, at, length, note, vel in captured:
+            start = max(0, tick + round(((t if at is None else at) - t) / dur * tps))
+            notes[track].append((start, start + round(length / dur * tps), note, vel))
+        captured.clear()
+        t += dur
+    engine.process_pending()
+    tempo.append(mido.MetaMessage("end_of_track", time=0))
+
+    mid = mido.MidiFile(ticks_per_beat=tpb)
+    mid.tracks.append(tempo)
+    for setup, track_notes in zip(session.tracks, notes):
+        mid.tracks.append(_note_track(setup.name, track_notes))
+
+    if out_path is None:
+        out_dir = Path("out")
+        out_dir.mkdir(exist_ok=True)
+        out_path = str(out_dir / f"{Path(log_path).stem}.mid")
+    mid.save(out_path)
+    return ReplayResult(
+        path=str(Path(out_path).resolve()),
+        steps=end,
+        notes=sum(len(n) for n in notes),
+        seconds=t,
+        elapsed=time.perf_counter() - t0,
+    )
@@ -1,7 +1,8 @@
 import random
-from dataclasses import dataclass
-from typing import Dict, Optional
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
 
+from core.automation import AutomationMap
 from core.config import SessionConfig
 
 
@@ -16,6 +17,8 @@ class SceneTrack:
     locked: bool = False
     density: Optional[float] = None  # None = usar el valor actual
     root: Optional[int] = None  # None = usar el valor actual
+    swing: Optional[float] = None  # None = usar el valor actual
+    micro: Optional[List[float]] = None  # None = usar el valor actual
 
 
 @dataclass
@@ -27,12 +30,165 @@ class Scene:
     bpm: Optional[int] = None
     energy: int = 3
     tracks: list[SceneTrack] = None
+    # Automatización que arranca al entrar la escena (solo desde el perfil,
+    # ver core/automation.py); None = ninguna
+    automation: Optional[Dict] = None
     
     def __post_init__(self):
         if self.tracks is None:
             self.tracks = []
 
 
+class SceneMorph:
+    """
+    Transición de la sesión actual a una escena a lo largo de N compases.
+
+    Los parámetros continuos (BPM, energía, densidad, swing) se interpolan
+    linealmente; los discretos (mute/solo/lock, micro y root) cambian de
+    golpe en el compás indicado (`switch_bar`, `root_bar`). Al crear el
+    morph se precalculan la fracción de interpolación de cada step y los
+    cambios discretos (no dependen del estado de partida); apply_step()
+    combina la fracción del step con los valores de partida en O(pistas).
+
+    Cancelar = dejar de llamar a apply_step (se queda el valor intermedio).
+    Redirigir = crear otro morph: parte del estado actual, sea cual sea.
+    Un morph en cola se prepara al pulsar la tecla; rebase() toma como
+    partida el estado del step en que entra de verdad (también O(pistas)).
+    """
+
+    def __init__(
+            self,
+            slot: int,
+            scene: Scene,
+            clock,
+            track_states,
+            track_cfgs,
+            energy: int,
+            steps_per_bar: int,
+            bars: int,
+            switch_bar: Optional[int] = None,
+            root_bar: Optional[int] = None,
+    ) -> None:
+        bars = max(1, bars)
+        total = bars * steps_per_bar
+        last_bar = bars - 1
+        switch_bar = last_bar if switch_bar is None else max(0, min(last_bar, switch_bar))
+        root_bar = switch_bar if root_bar is None else max(0, min(last_bar, root_bar))
+
+        self.slot = slot
+        self.bars = bars
+        self.total_steps = total
+        self.pos = 0
+
+        n_tracks = min(len(scene.tracks), len(track_states), len(track_cfgs))
+        self.n_tracks = n_tracks
+        self.target_bpm = scene.bpm
+        self.target_energy = scene.energy
+        self.target_density = tuple(scene.tracks[i].density for i in range(n_tracks))
+        self.target_swing = tuple(scene.tracks[i].swing for i in range(n_tracks))
+
+        # Fracción de interpolación de cada step (el último llega al destino)
+        self.fractions: List[float] = [(k + 1) / total for k in range(total)]
+
+        # Cambios discretos: no dependen del estado de partida
+        self.flags = tuple(
+            (i, scene.tracks[i].muted, scene.tracks[i].solo, scene.tracks[i].locked)
+            for i in range(n_tracks)
+        )
+        self.roots = tuple(
+            (i, scene.tracks[i].root)
+            for i in range(n_tracks)
+            if scene.tracks[i].root is not None
+        )
+        self.micros = tuple(
+            (i, list(scene.tracks[i].micro))
+            for i in range(n_tracks)
+            if scene.tracks[i].micro is not None
+        )
+        self.flags_step = switch_bar * steps_per_bar
+        self.roots_step = root_bar * steps_per_bar
+
+        self.rebase(clock, track_cfgs, energy)
+
+    def rebase(self, clock, track_cfgs, energy: int) -> None:
+        """
+        Toma el estado actual como partida de la interpolación. Se llama al
+        crear el morph y en el step en que entra (otro morph en curso,
+        teclas...): solo recorre las pistas, sin recalcular tablas.
+        """
+        n = self.n_tracks
+        self.start_bpm = clock.bpm
+        self.start_energy = energy
+        # (pista, partida, diferencia) de lo que se interpola
+        self._densities = tuple(
+            (i, track_cfgs[i].density, self.target_density[i] - track_cfgs[i].density)
+            for i in range(n) if self.target_density[i] is not None
+        )
+        self._swings = tuple(
+            (i, track_cfgs[i].swing, self.target_swing[i] - track_cfgs[i].swing)
+            for i in range(n) if self.target_swing[i] is not None
+        )
+
+    @property
+    def done(self) -> bool:
+        return self.pos >= self.total_steps
+
+    @property
+    def bar(self) -> int:
+        """Compás actual del morph (1..bars)."""
+        steps_per_bar = self.total_steps // self.bars
+        return min(self.bars, self.pos // steps_per_bar + 1)
+
+    def apply_step(self, clock, track_states, track_cfgs) -> int:
+        """
+        Aplica los valores del step actual y avanza. Devuelve la energía del step.
+        """
+        k = self.pos
+        t = self.fractions[k]
+        self.pos += 1
+
+        start_bpm = self.start_bpm
+        target_bpm = start_bpm if self.target_bpm is None else self.target_bpm
+        bpm = round(start_bpm + (target_bpm - start_bpm) * t)
+        if bpm != clock.bpm:
+            clock.set_bpm(bpm)
+        for i, start, delta in self._densities:
+            track_cfgs[i].density = start + delta * t
+        for i, start, delta in self._swings:
+            track_cfgs[i].swing = start + delta * t
+        if k == self.flags_step:
+            for i, muted, solo, locked in self.flags:
+                ts = track_states[i]
+                ts.muted, ts.solo, ts.locked = muted, solo, locked
+            for i, micro in self.micros:
+                track_cfgs[i].micro = micro
+        if k == self.roots_step:
+            for i, root in self.roots:
+                track_cfgs[i].root = root
+        return round(self.start_energy + (self.target_energy - self.start_energy) * t)
+
+
+@dataclass
+class SceneBlock:
+    """
+    Bloque de parámetros de una escena, preparado de antemano para que el
+    cambio en el límite de compás/beat sea un simple intercambio de puntero.
+    """
+    slot: int
+    bpm: Optional[int]
+    energy: int
+    # Por pista: (muted, solo, locked, density, root, swing, micro).
+    # Solo las pistas que cubre la escena; None = no cambia.
+    tracks: Tuple[Tuple[bool, bool, bool, Optional[float], Optional[int],
+                        Optional[float], Optional[List[float]]], ...]
+    # ¿Habrá alguna pista en solo tras aplicar el bloque?
+    any_solo: bool
+    # Morph precalculado si la escena entra con transición
+    morph: Optional[SceneMorph] = None
+    # Automatización de la escena ya compilada (AutomationMap) o None
+    automation: Optional[AutomationMap] = None
+
+
 class SceneManager:
     """
     Gestiona hasta 9 escenas numeradas (1-9).
@@ -63,10 +219,16 @@ class SceneManager:
                 solo=track_state.solo,
                 locked=track_state.locked,
                 density=track_cfg.density,
-                root=track_cfg.root
+                root=track_cfg.root,
+                swing=track_cfg.swing,
+                micro=list(track_cfg.micro),
             )
             scene.tracks.append(track_scene)
         
+        # La automatización viene del perfil: guardar encima la conserva
+        previous = self.scenes.get(slot)
+        if previous is not None:
+            scene.automation = previous.automation
         self.scenes[slot] = scene
         return True
     
@@ -105,9 +267,77 @@ class SceneManager:
                     track_cfgs[i].density = track_scene.density
                 if track_scene.root is not None:
                     track_cfgs[i].root = track_scene.root
+                if track_scene.swing is not None:
+                    track_cfgs[i].swing = track_scene.swing
+                if track_scene.micro is not None:
+                    track_cfgs[i].micro = list(track_scene.micro)
         
         return True
     
+    def start_morph(self, slot: int, clock, track_states, track_cfgs, energy: int,
+                    steps_per_bar: int, bars: int,
+                    switch_bar: Optional[int] = None,
+                    root_bar: Optional[int] = None) -> Optional[SceneMorph]:
+        """
+        Prepara un morph hacia la escena `slot` (ver SceneMorph).
+        Devuelve None si la escena no existe.
+        """
+        if not 1 <= slot <= 9 or slot not in self.scenes:
+            return None
+        return SceneMorph(
+            slot, self.scenes[slot], clock, track_states, track_cfgs, energy,
+            steps_per_bar, bars, switch_bar=switch_bar, root_bar=root_bar,
+        )
+
+    def build_block(self, slot: int, track_states, morph: Optional[SceneMorph] = None,
+                    steps_per_bar: int = 16) -> Optional[SceneBlock]:
+        """
+        Prepara el SceneBlock de una escena (fuera del step crítico), con su
+        automatización ya compilada. Devuelve None si la escena no existe.
+        """
+        if not 1 <= slot <= 9 or slot not in self.scenes:
+            return None
+
+        scene = self.scenes[slot]
+        tracks = tuple(
+            (t.muted, t.solo, t.locked, t.density, t.root, t.swing,
+             None if t.micro is None else list(t.micro))
+            for t in scene.tracks[:len(track_states)]
+        )
+        covered = len(tracks)
+        any_solo = any(t[1] for t in tracks) or any(ts.solo for ts in track_states[covered:])
+        return SceneBlock(
+            slot=slot,
+            bpm=scene.bpm,
+            energy=scene.energy,
+            tracks=tracks,
+            any_solo=any_solo,
+            morph=morph,
+            automation=AutomationMap(scene.automation, steps_per_bar) if scene.automation else None,
+        )
+
+    def to_data(self) -> Dict[int, Dict]:
+        """
+        Serializa todas las escenas a datos planos (para YAML).
+        """
+        # items() se copia de golpe: se puede llamar desde otro hilo
+        return {slot: _scene_data(scene) for slot, scene in list(self.scenes.items())}
+
+    def load_data(self, data: Dict[int, Dict]) -> None:
+        """
+        Restaura escenas desde datos planos (inverso de to_data).
+        """
+        for slot, raw in (data or {}).items():
+            slot = int(slot)
+            if not 1 <= slot <= 9:
+                continue
+            self.scenes[slot] = Scene(
+                bpm=raw.get("bpm"),
+                energy=raw.get("energy", 3),
+                tracks=[SceneTrack(**t) for t in raw.get("tracks", [])],
+                automation=raw.get("automation") or None,
+            )
+
     def has_scene(self, slot: int) -> bool:
         """Verifica si existe una escena en el slot."""
         return slot in self.scenes
@@ -147,3 +377,10 @@ class SceneManager:
             parts.append(f"L:{locked_count}")
         
         return " | ".join(parts)
+
+
+def _scene_data(scene: Scene) -> Dict:
+    data = asdict(scene)
+    if data["automation"] is None:
+        del data["automation"]  # los .yml sin automatización no cambian
+    return data
@@ -0,0 +1,353 @@
+import heapq
+import multiprocessing
+import signal
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import List, Optional
+
+from core.voices import VoiceTable, ring_token
+
+# --- Disposición del bloque compartido ---
+# [0]    índice de escritura (u64, solo lo escribe el proceso de generación)
+# [64]   índice de lectura   (u64, solo lo escribe el proceso de salida)
+# [128]  métricas del proceso de salida: enviados, suma ms, máx ms
+# [160]  listo (u64, el proceso de salida lo pone a 1 al entrar en su bucle)
+# [168]  stop  (u64, solo lo escribe el proceso de generación)
+# [192]  histograma de retraso: HIST_BINS × u32, cubos de HIST_RES ms
+# [DATA] registros de RECORD.size bytes
+_WRITE = 0
+_READ = 64
+_STATS = 128
+_STATS_FMT = struct.Struct("<Qdd")  # enviados, suma retraso ms, máx ms
+_READY = 160
+_STOP = 168
+_HIST = 192
+HIST_BINS = 256
+HIST_RES = 0.1  # ms por cubo (el último acumula todo lo que pase de 25.5 ms)
+_HIST_FMT = struct.Struct(f"<{HIST_BINS}I")
+_DATA = _HIST + _HIST_FMT.size
+
+# Registro de evento (16 bytes): deadline (monotonic), puerto, tipo, nota,
+# velocidad y token de voz (16 bits, ver VoiceTable)
+RECORD = struct.Struct("<dHBBBxH")
+_U64 = struct.Struct("<Q")
+
+NOTE_OFF = 0
+NOTE_ON = 1
+
+DEFAULT_CAPACITY = 4096  # registros (potencia de 2)
+
+
+class EventRing:
+    """
+    Ring buffer de registros de tamaño fijo en memoria compartida, con un
+    solo productor (generación) y un solo consumidor (salida).
+
+    Cada lado escribe únicamente su índice: el productor escribe el
+    registro y después publica el índice de escritura; el consumidor lee
+    hasta ese índice y publica el de lectura. Los registros se escriben y
+    leen con struct.pack_into/unpack_from directamente sobre el bloque
+    compartido: ningún evento pasa por pickle.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, name: Optional[str] = None) -> None:
+        if capacity & (capacity - 1):
+            raise ValueError("capacity debe ser potencia de 2")
+        self.capacity = capacity
+        self._mask = capacity - 1
+        size = _DATA + capacity * RECORD.size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.shm.buf[:_DATA] = bytes(_DATA)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.buf = self.shm.buf
+        self.dropped = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    # --- Productor ---
+
+    def push(self, deadline: float, port: int, kind: int, note: int, velocity: int, token: int = 0) -> bool:
+        w = _U64.unpack_from(self.buf, _WRITE)[0]
+        r = _U64.unpack_from(self.buf, _READ)[0]
+        if w - r >= self.capacity:
+            # Lleno: la salida va muy por detrás; se descarta (nunca bloquea)
+            self.dropped += 1
+            return False
+        RECORD.pack_into(self.buf, _DATA + (w & self._mask) * RECORD.size, deadline, port, kind, note, velocity, token)
+        _U64.pack_into(self.buf, _WRITE, w + 1)
+        return True
+
+    # --- Consumidor ---
+
+    def pop_all(self) -> List[tuple]:
+        w = _U64.unpack_from(self.buf, _WRITE)[0]
+        r = _U64.unpack_from(self.buf, _READ)[0]
+        out = []
+        while r < w:
+            out.append(RECORD.unpack_from(self.buf, _DATA + (r & self._mask) * RECORD.size))
+            r += 1
+        _U64.pack_into(self.buf, _READ, r)
+        return out
+
+    # --- Métricas y parada ---
+
+    def read_stats(self):
+        """(enviados, retraso medio ms, p99 ms, máx ms) según el proceso de salida."""
+        sent, total, worst = _STATS_FMT.unpack_from(self.buf, _STATS)
+        hist = _HIST_FMT.unpack_from(self.buf, _HIST)
+        p99 = 0.0
+        if sent:
+            target = sent * 0.99
+            acc = 0
+            for i, n in enumerate(hist):
+                acc += n
+                if acc >= target:
+                    p99 = (i + 1) * HIST_RES
+                    break
+        return sent, (total / sent if sent else 0.0), p99, worst
+
+    def late_count(self, threshold_ms: float) -> int:
+        """Envíos con más de `threshold_ms` de retraso (resolución HIST_RES)."""
+        hist = _HIST_FMT.unpack_from(self.buf, _HIST)
+        first = min(HIST_BINS - 1, int(threshold_ms / HIST_RES))
+        return sum(hist[first:])
+
+    @property
+    def ready(self) -> bool:
+        return _U64.unpack_from(self.buf, _READY)[0] == 1
+
+    def request_stop(self) -> None:
+        # Palabra propia: el proceso de salida solo la lee, así que sus
+        # escrituras de métricas no pueden pisar la parada
+        _U64.pack_into(self.buf, _STOP, 1)
+
+    @property
+    def stop_requested(self) -> bool:
+        return _U64.unpack_from(self.buf, _STOP)[0] == 1
+
+    def close(self) -> None:
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class RingSynth:
+    """
+    Sustituto de MidiSynth en modo multiproceso: schedule_note solo escribe
+    dos registros (note_on y note_off con sus deadlines) en el ring.
+
+    El deadline del note_on es el instante de la nota (`at`: step +
+    swing/micro) o, sin él, el instante nominal del step (`out.base_time`,
+    lo fija el bucle antes de cada step). El bucle genera cada step
+    `out.lookahead` segundos antes y el proceso de salida lo envía en el
+    instante exacto, así que el jitter del bucle de steps (UI, guardados,
+    exports) no llega al MIDI mientras sea menor que el lookahead.
+    """
+
+    def __init__(self, out: "OutputProcess", port_name: str) -> None:
+        self.out = out
+        self.port_name = port_name
+        self.port_index = out.port_index(port_name)
+
+    @property
+    def online(self) -> bool:
+        return self.out.alive
+
+    def schedule_note(self, note: int, velocity: int, length: float, at: Optional[float] = None) -> None:
+        if note < 0 or note > 127:
+            return
+        out = self.out
+        on_time = out.base_time if at is None else at
+        ring = out.ring
+        token = out.next_token(self.port_index)
+        if ring.push(on_time, self.port_index, NOTE_ON, note, velocity, token):
+            ring.push(on_time + max(0.01, length), self.port_index, NOTE_OFF, note, 0, token)
+
+    def process_pending(self) -> None:
+        # Los note_off ya están en el ring con su deadline
+        pass
+
+    def panic(self) -> None:
+        # El proceso de salida apaga sus voces al parar (ver output_main)
+        pass
+
+
+class OutputProcess:
+    """
+    Proceso de salida MIDI: lee el ring y envía cada evento en su deadline.
+    No importa nada de la UI ni de la generación.
+    """
+
+    def __init__(self, port_names: List[str], lookahead: float = 0.02, capacity: int = DEFAULT_CAPACITY,
+                 null: bool = False) -> None:
+        self.port_names: List[str] = []
+        for name in port_names:
+            if name not in self.port_names:
+                self.port_names.append(name)
+        self.lookahead = lookahead
+        self.base_time = time.monotonic()
+        self.ring = EventRing(capacity)
+        # Último token de voz por puerto (las pistas que comparten puerto comparten voces)
+        self._tokens = [0] * len(self.port_names)
+        ctx = multiprocessing.get_context("spawn")
+        self._proc = ctx.Process(
+            target=output_main,
+            args=(self.ring.name, self.ring.capacity, self.port_names, null),
+            name="midi-output",
+            daemon=True,
+        )
+
+    def port_index(self, name: str) -> int:
+        # La lista viaja al proceso hijo al arrancar: solo puertos conocidos
+        return self.port_names.index(name)
+
+    def next_token(self, port_index: int) -> int:
+        token = self._tokens[port_index] = ring_token(self._tokens[port_index])
+        return token
+
+    def start(self, timeout: float = 5.0) -> bool:
+        """Arranca el proceso y espera a que tenga los puertos abiertos."""
+        self._proc.start()
+        end = time.monotonic() + timeout
+        while not self.ring.ready and self._proc.is_alive() and time.monotonic() < end:
+            time.sleep(0.005)
+        return self.ring.ready
+
+    @property
+    def alive(self) -> bool:
+        return self._proc.is_alive()
+
+    def stats(self) -> str:
+        sent, mean, p99, worst = self.ring.read_stats()
+        return (
+            f"OUT PROC: {sent} ev | retraso {mean:.3f} ms (p99 {p99:.1f}, máx {worst:.3f})"
+            + (f" | {self.ring.dropped} descartados" if self.ring.dropped else "")
+        )
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Pide parar (el proceso envía los note_off pendientes) y libera el ring."""
+        self.ring.request_stop()
+        self._proc.join(timeout)
+        if self._proc.is_alive():
+            self._proc.terminate()
+        self.ring.close()
+
+
+# --- Proceso de salida ---
+
+def output_main(shm_name: str, capacity: int, port_names: List[str], null: bool = False,
+                spin: float = 0.0005, poll: float = 0.002) -> None:
+    """
+    Bucle del proceso de salida: vuelca el ring en un heap por deadline y
+    envía cada evento a su hora (duerme hasta `spin` antes y espera activa
+    el resto). Revisa el ring al menos cada `poll` segundos.
+    """
+    # Ctrl+C lo gestiona el proceso principal, que pide parar por el ring
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import mido
+
+    from core.ports import PortManager
+    from core.synth import NullPort
+
+    ring = EventRing(capacity, name=shm_name)
+    if null:
+        port_mgr = PortManager(lister=lambda: list(port_names), opener=lambda name: NullPort())
+    else:
+        port_mgr = PortManager()
+        port_mgr.start_watcher()
+
+    for name in port_names:
+        port_mgr.open(name)
+    _U64.pack_into(ring.buf, _READY, 1)
+
+    heap: List[tuple] = []
+    seq = 0
+    sent = 0
+    total = 0.0
+    worst = 0.0
+    hist = [0] * HIST_BINS
+
+    # Voces por puerto: retrigger y note_off viejos como en MidiSynth
+    voices = [VoiceTable() for _ in port_names]
+
+    def send_msg(port_index: int, msg) -> None:
+        name = port_names[port_index] if port_index < len(port_names) else None
+        if name is None:
+            return
+        port = port_mgr.open(name)
+        if port is None:
+            return
+        try:
+            port.send(msg)
+        except Exception:
+            port_mgr.report_failure(name)
+
+    def send(port_index: int, kind: int, note: int, velocity: int, token: int) -> bool:
+        """Envía el evento pasando por la tabla de voces; False si era un note_off viejo."""
+        if port_index >= len(voices):
+            return False
+        table = voices[port_index]
+        if kind == NOTE_ON:
+            if table.note_on(note, token):
+                send_msg(port_index, mido.Message("note_off", note=note, velocity=0))
+            send_msg(port_index, mido.Message("note_on", note=note, velocity=velocity))
+            return True
+        if not table.note_off(note, token):
+            return False
+        send_msg(port_index, mido.Message("note_off", note=note, velocity=0))
+        return True
+
+    stop = False
+    while not stop:
+        for deadline, port_index, kind, note, velocity, token in ring.pop_all():
+            heapq.heappush(heap, (deadline, seq, port_index, kind, note, velocity, token))
+            seq += 1
+
+        now = time.monotonic()
+        dirty = False
+        while heap and heap[0][0] <= now:
+            deadline, _, port_index, kind, note, velocity, token = heapq.heappop(heap)
+            if not send(port_index, kind, note, velocity, token):
+                continue
+            late_ms = (time.monotonic() - deadline) * 1000
+            sent += 1
+            total += late_ms
+            worst = max(worst, late_ms)
+            hist[min(HIST_BINS - 1, int(late_ms / HIST_RES))] += 1
+            now = time.monotonic()
+            dirty = True
+
+        stop = ring.stop_requested
+        if dirty:
+            _STATS_FMT.pack_into(ring.buf, _STATS, sent, total, worst)
+            _HIST_FMT.pack_into(ring.buf, _HIST, *hist)
+        if stop:
+            break
+
+        wake = min(heap[0][0], now + poll) if heap else now + poll
+        remaining = wake - time.monotonic()
+        if remaining > spin:
+            time.sleep(remaining - spin)
+        while time.monotonic() < wake:
+            pass
+
+    # Parada: ningún note_on nuevo, pero sí los note_off pendientes; después
+    # panic (lo que siga sonando y CC 123) en cada puerto
+    for _, _, port_index, kind, note, velocity, token in sorted(heap):
+        if kind == NOTE_OFF:
+            send(port_index, kind, note, velocity, token)
+    for port_index, table in enumerate(voices):
+        for channel, note in table.sounding():
+            send_msg(port_index, mido.Message("note_off", channel=channel, note=note, velocity=0))
+        send_msg(port_index, mido.Message("control_change", control=123, value=0))
+    ring.buf = None
+    ring.shm.close()
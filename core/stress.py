@@ -0,0 +1,124 @@
+import os
+import time
+from typing import List, Optional
+
+from core.config import MAX_TRACKS, ROLES, SessionConfig, TrackSetup
+
+# Sesión de peor caso para --stress
+STRESS_BPM = 260
+STRESS_STEPS = 64
+STRESS_ENERGY = 5
+STRESS_SWING = 0.25
+STRESS_MICRO = [0.0, -0.1, 0.1, 0.0]
+
+
+def stress_session(port_name: str = "null", n_tracks: int = MAX_TRACKS) -> SessionConfig:
+    """
+    Sesión sintética de peor caso: el máximo de pistas con todos los roles
+    repartidos, 64 pasos, 260 BPM, energía 5 y densidad 1.0. Lleva swing y
+    micro para que la cola de notas trabaje también con desplazamientos.
+    """
+    tracks = [
+        TrackSetup(
+            name=f"{ROLES[i % len(ROLES)].upper()}{i // len(ROLES) + 1}",
+            role=ROLES[i % len(ROLES)],
+            port_name=port_name,
+            root=36 + (i * 5) % 48,
+            scale="darktech",
+            density=1.0,
+            steps=STRESS_STEPS,
+            swing=STRESS_SWING,
+            micro=list(STRESS_MICRO),
+        )
+        for i in range(n_tracks)
+    ]
+    return SessionConfig(
+        bpm=STRESS_BPM, steps=STRESS_STEPS, energy=STRESS_ENERGY, tracks=tracks, theme="makina_180"
+    )
+
+
+def children_cpu() -> Optional[float]:
+    """Segundos de CPU de los procesos hijo ya terminados (proceso de salida de --mp)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class DeadlineMonitor:
+    """
+    Mide el bucle de steps real durante --stress.
+
+    Por cada step apunta cuándo empezó a generarse respecto a su marca
+    (step_time - lead), cuánto tardó y cuándo terminó respecto al instante
+    del step. Un step que termina después de su instante es un fallo de
+    deadline: sus notas ya no pueden salir a su hora.
+    """
+
+    def __init__(self) -> None:
+        self.wake_late: List[float] = []  # s de retraso al empezar a generar
+        self.gen: List[float] = []  # s de generación
+        self.finish: List[float] = []  # s entre el fin de la generación y el step (>0 = tarde)
+        self.misses = 0
+        self._wall0 = time.monotonic()
+        self._cpu0 = time.process_time()
+
+    def add(self, step_time: float, lead: float, started: float, finished: float) -> None:
+        self.wake_late.append(max(0.0, started - (step_time - lead)))
+        self.gen.append(finished - started)
+        late = finished - step_time
+        self.finish.append(late)
+        if late > 0:
+            self.misses += 1
+
+    def report(
+            self,
+            session: SessionConfig,
+            step_duration: float,
+            notes: Optional[tuple] = None,
+            tolerance_ms: float = 2.0,
+            child_cpu: Optional[float] = None,
+    ) -> List[str]:
+        """
+        Líneas del informe. `notes` es (enviadas, tarde, peor ms) de la
+        cola de notas o del proceso de salida; `child_cpu`, segundos de CPU
+        del proceso de salida (--mp).
+        """
+        wall = time.monotonic() - self._wall0
+        cpu = time.process_time() - self._cpu0
+        steps = len(self.gen)
+        ms = 1000
+        lines = [
+            f"=== Stress: {len(session.tracks)} pistas, {session.steps} pasos, {session.bpm} BPM, "
+            f"energía {session.energy}, {wall:.1f} s (CPUs: {os.cpu_count()}) ===",
+            f"Steps: {steps} | fallos de deadline: {self.misses} | "
+            f"peor fin respecto al step: {max(self.finish, default=0.0) * ms:+.2f} ms",
+            f"Generación por step: media {sum(self.gen) / steps * ms if steps else 0.0:.2f} ms, "
+            f"p99 {_pct(self.gen, 0.99) * ms:.2f} ms, máx {max(self.gen, default=0.0) * ms:.2f} ms "
+            f"(step de {step_duration * ms:.1f} ms)",
+            f"Despertar del bucle: p99 {_pct(self.wake_late, 0.99) * ms:.2f} ms, "
+            f"máx {max(self.wake_late, default=0.0) * ms:.2f} ms tarde",
+        ]
+        note_misses = 0
+        if notes is not None:
+            sent, note_misses, worst = notes
+            lines.append(f"Notas: {sent} enviadas | >{tolerance_ms:g} ms tarde: {note_misses} | peor {worst:.2f} ms")
+        cpu_line = f"CPU: {cpu / wall * 100 if wall else 0.0:.1f} % de un núcleo (proceso principal)"
+        if child_cpu is not None:
+            cpu_line += f", {child_cpu / wall * 100 if wall else 0.0:.1f} % (proceso de salida)"
+        lines.append(cpu_line)
+        ok = self.misses == 0 and note_misses == 0
+        lines.append("Resultado: OK" if ok else "Resultado: FALLOS (ver arriba)")
+        return lines
+
+    def failed(self, note_misses: int = 0) -> bool:
+        return self.misses > 0 or note_misses > 0
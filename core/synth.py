@@ -1,34 +1,164 @@
+import heapq
 import mido
 import time
-from typing import List
-from collections import deque
+from typing import List, Optional
+
+from core.ports import get_port_manager
+from core.voices import VoiceTable
+
+
+class NullPort:
+    """
+    Puerto de salida que descarta los mensajes (solo los cuenta).
+    Permite usar MidiSynth sin hardware: benchmarks, tests de arranque, etc.
+    """
+
+    def __init__(self) -> None:
+        self.sent = 0
+
+    def send(self, msg) -> None:
+        self.sent += 1
+
+    def close(self) -> None:
+        pass
 
 
 class MidiSynth:
     """
     Envoltorio para enviar notas a un puerto MIDI concreto.
+    Si se pasa `port`, se usa tal cual (p.ej. NullPort) sin enumerar puertos.
+
+    Sin `port`, el puerto se pide al PortManager (compartido entre pistas).
+    Si no existe, la pista arranca offline en vez de abortar: sus envíos se
+    descartan hasta que el vigilante de puertos la reconecte.
+
+    Con `note_queue` (NoteQueue), las notas con instante (`at`) se envían
+    desde el hilo de la cola a su hora exacta, note_off incluido.
+
+    Las voces se siguen en una VoiceTable (`voices`, compartible entre
+    pistas del mismo puerto): un retrigger corta la voz anterior y los
+    note_off viejos se descartan. Los note_off del envío inmediato esperan
+    en un heap por instante, así que una nota larga no retiene a las cortas
+    que vencen antes.
     """
 
-    def __init__(self, port_name: str) -> None:
-        ports: List[str] = mido.get_output_names()
-        if port_name not in ports:
-            raise SystemExit(
-                f"Puerto MIDI '{port_name}' no disponible.\n"
-                f"Puertos detectados: {ports}"
-            )
+    def __init__(self, port_name: str, port=None, port_mgr=None, note_queue=None, voices=None) -> None:
         self.port_name = port_name
-        self.port = mido.open_output(port_name)
-        self.pending = deque()
+        self.port_mgr = None
+        if port is None:
+            self.port_mgr = port_mgr or get_port_manager()
+            port = self.port_mgr.open(port_name)
+            self.port_mgr.register(self)
+        self.port = port
+        self.note_queue = note_queue
+        self.voices = voices if voices is not None else VoiceTable()
+        self.pending: List[tuple] = []  # heap (off_time, token, nota)
+        # Notas cuyo note_off no se pudo enviar (puerto caído): se apagan al volver
+        self.hung = set()
+        self.dropped = 0
+
+    @property
+    def online(self) -> bool:
+        return self.port is not None
+
+    def _send(self, msg) -> bool:
+        port = self.port
+        if port is None:
+            self.dropped += 1
+            return False
+        try:
+            port.send(msg)
+            return True
+        except Exception:
+            # El puerto ha desaparecido a mitad de envío: offline hasta que vuelva
+            self.port = None
+            self.dropped += 1
+            if self.port_mgr is not None:
+                self.port_mgr.report_failure(self.port_name)
+            return False
 
-    def schedule_note(self, note: int, velocity: int, length: float) -> None:
+    def port_lost(self) -> None:
+        """
+        El puerto ya no existe. Los note_off pendientes siguen su curso (se
+        liberan sus voces, no se toca el heap desde otro hilo) y las notas
+        que se quedan sin note_off van a `hung`.
+        """
+        self.port = None
+
+    def port_restored(self, port) -> None:
+        """
+        El puerto ha vuelto: antes de enviar nada nuevo, note_off de las
+        notas que quedaron colgadas y All Notes Off (CC 123).
+        """
+        hung, self.hung = self.hung, set()
+        try:
+            for note in sorted(hung):
+                port.send(mido.Message("note_off", note=note, velocity=0))
+            port.send(mido.Message("control_change", control=123, value=0))
+        except Exception:
+            self.hung |= hung
+            return
+        self.port = port
+
+    def panic(self) -> None:
+        """
+        All notes off: note_off de cada voz que suena y CC 123. Se llama al
+        salir, con la cola de notas ya parada.
+        """
+        for channel, note in self.voices.sounding():
+            self._send(mido.Message("note_off", channel=channel, note=note, velocity=0))
+        self._send(mido.Message("control_change", control=123, value=0))
+        self.voices.clear()
+        self.pending.clear()
+
+    def _note_on(self, note: int, token: int, msg) -> bool:
+        if self.voices.note_on(note, token):
+            # Retrigger: la voz anterior se corta antes de volver a disparar
+            self._send(mido.Message("note_off", note=note, velocity=0))
+        if self._send(msg):
+            return True
+        self.voices.note_off(note, token)
+        return False
+
+    def _note_off(self, note: int, token: int, msg=None) -> None:
+        # El mensaje solo se construye si el note_off sigue vigente
+        if not self.voices.note_off(note, token):
+            return
+        if msg is None:
+            msg = mido.Message("note_off", note=note, velocity=0)
+        if not self._send(msg):
+            self.hung.add(note)
+
+    def _deliver(self, msg, token: int) -> None:
+        """Envío desde NoteQueue (en su hilo), pasando por la tabla de voces."""
+        if msg.type == "note_on":
+            self._note_on(msg.note, token, msg)
+        else:
+            self._note_off(msg.note, token, msg)
+
+    def schedule_note(self, note: int, velocity: int, length: float, at: Optional[float] = None) -> None:
         if note < 0 or note > 127:
             return
-        self.port.send(mido.Message("note_on", note=note, velocity=velocity))
+        if self.port is None:
+            # Offline: descartar sin construir mensajes
+            self.dropped += 1
+            return
+        token = self.voices.token()
+        queue = self.note_queue
+        if at is not None and queue is not None:
+            queue.push(at, self, mido.Message("note_on", note=note, velocity=velocity), token)
+            queue.push(at + max(0.01, length), self, mido.Message("note_off", note=note, velocity=0), token)
+            return
+        if not self._note_on(note, token, mido.Message("note_on", note=note, velocity=velocity)):
+            return
         off_time = time.monotonic() + max(0.01, length)
-        self.pending.append((off_time, note))
+        heapq.heappush(self.pending, (off_time, token, note))
 
     def process_pending(self) -> None:
+        pending = self.pending
+        if not pending:
+            return
         now = time.monotonic()
-        while self.pending and self.pending[0][0] <= now:
-            _, note = self.pending.popleft()
-            self.port.send(mido.Message("note_off", note=note, velocity=0))
+        while pending and pending[0][0] <= now:
+            _, token, note = heapq.heappop(pending)
+            self._note_off(note, token)
@@ -0,0 +1,70 @@
+import itertools
+from typing import List, Tuple
+
+CHANNELS = 16
+TOKEN_MASK = 0xFFFF  # tokens del ring de --mp: 16 bits (nunca 0)
+
+
+class VoiceTable:
+    """
+    Voces que suenan en un puerto: un hueco por (canal, nota), 16 × 128.
+
+    Cada nota programada recibe un token. El note_on guarda su token en el
+    hueco y el note_off solo se envía si el hueco sigue teniendo ese token:
+    si la misma nota se volvió a disparar antes de su note_off (retrigger),
+    note_on() avisa para cortar la voz anterior y el note_off viejo se
+    descarta, así que nunca se solapan dos pares on/off de la misma nota ni
+    un note_off viejo corta la nota nueva. Todo O(1).
+
+    La tabla es por puerto (compartida por las pistas que van al mismo
+    puerto y canal: para el sinte son la misma voz). La usa un solo hilo a
+    la vez: el bucle de steps (envío inmediato) o el hilo de NoteQueue.
+    """
+
+    __slots__ = ("slots", "active", "_tokens")
+
+    def __init__(self) -> None:
+        self.slots = [0] * (CHANNELS * 128)
+        self.active = 0
+        self._tokens = itertools.count(1)
+
+    def token(self) -> int:
+        """Token nuevo para una nota (nunca 0, que marca hueco libre)."""
+        return next(self._tokens)
+
+    def note_on(self, note: int, token: int, channel: int = 0) -> bool:
+        """Ocupa el hueco. True si la nota ya sonaba (hay que mandar su note_off antes)."""
+        i = channel << 7 | note
+        previous = self.slots[i]
+        self.slots[i] = token
+        if previous:
+            return True
+        self.active += 1
+        return False
+
+    def note_off(self, note: int, token: int, channel: int = 0) -> bool:
+        """
+        Libera el hueco si `token` es la nota que suena y devuelve True (hay
+        que mandar el note_off). False: note_off de una nota ya cortada.
+        """
+        i = channel << 7 | note
+        if self.slots[i] != token:
+            return False
+        self.slots[i] = 0
+        self.active -= 1
+        return True
+
+    def sounding(self) -> List[Tuple[int, int]]:
+        """(canal, nota) de las voces que suenan."""
+        if not self.active:
+            return []
+        return [(i >> 7, i & 127) for i, token in enumerate(self.slots) if token]
+
+    def clear(self) -> None:
+        self.slots = [0] * (CHANNELS * 128)
+        self.active = 0
+
+
+def ring_token(previous: int) -> int:
+    """Siguiente token de 16 bits (1..65535) para los registros del ring."""
+    return previous % TOKEN_MASK + 1
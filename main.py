@@ -1,44 +1,63 @@
 import sys
 import threading
-import queue
 import argparse
 import random
 import time
 from pathlib import Path
 from time import monotonic as now
+from typing import Optional
 
-import readchar
-
-from core.clock import Clock
-from core.config import SessionConfig
+from core.config import OSC_HOST, OSC_PORT, ROLES, SessionConfig
 from core.config import initial_setup
-from core.pattern import TrackPattern, TrackConfig
-from core.synth import MidiSynth
+from core.synth import MidiSynth, NullPort
+from core.note_queue import NoteQueue
+from core.voices import VoiceTable
+from core.profiler import active, now_ns
+from core.ports import PortManager, get_port_manager
 from core.profiles import ProfileManager
 from core.midi_export import MidiExporter
-from core.scenes import SceneManager
-from ui.dashboard import LiveDashboard, TrackState
-
-KEY_QUEUE: "queue.Queue[str]" = queue.Queue()
+from core.engine import Engine, build_patterns
+from core.pattern import parse_seed
+from core.autosave import AutoSaver
+from core.stress import STRESS_BPM, DeadlineMonitor, children_cpu, stress_session
+from core.prerender import ScenePrerenderer
+from core.commands import CommandInbox
+from core.control_log import ControlLog, default_log_path
+from core.decks import DeckSet, deck_seed
+from core.midi_clock import (
+    MidiClockFollower,
+    MidiClockSender,
+    ClockReplayer,
+    load_clock_stream,
+    open_clock_input,
+)
+from ui.dashboard import LiveDashboard
+
+# Bandeja de comandos del motor (teclado y otras fuentes de control)
+INBOX = CommandInbox()
 LAST_SESSION_FILE = Path("profiles/last_session.yml")
 
 
 def input_worker() -> None:
     """
     Hilo dedicado a lectura no bloqueante de teclado.
-    Envía las teclas a KEY_QUEUE.
+    Envía las teclas a INBOX con la marca de tiempo de la pulsación.
     """
+    # Import perezoso: solo el modo en vivo necesita teclado
+    import readchar
+
     while True:
         try:
             key = readchar.readkey()
         except Exception:
             continue
+        ts = now()
 
         # Detectar si se mantiene pulsada tecla Shift
         if len(key) == 1 and key.isupper():
-            KEY_QUEUE.put("SHIFT+" + key.lower())
+            INBOX.push_key("SHIFT+" + key.lower(), ts)
         else:
-            KEY_QUEUE.put(key)
+            INBOX.push_key(key, ts)
 
         if key == "\x1b":  # ESC
             break
@@ -85,40 +104,121 @@ def get_session_config(args) -> SessionConfig:
     return initial_setup()
 
 
-def save_last_session(session: SessionConfig) -> None:
+def run_preview(session: SessionConfig, seed: Optional[int], bars: int) -> None:
     """
-    Guarda la configuración actual como última sesión.
+    Render offline (sin puertos MIDI): exporta el loop a .mid y a un .wav de
+    preview con voces internas por rol, ambos con los mismos eventos.
+    La automatización de la sesión (si hay) va desde su compás 0.
     """
-    profile_mgr = ProfileManager()
-    profile_mgr.save_profile("last_session", session)
+    from core.automation import AutomationMap
+    from core.preview import PreviewRenderer
+
+    _, patterns, _ = build_patterns(session, seed)
+    names = [t.name for t in session.tracks]
+    exporter = MidiExporter()
+    ticks_per_step = exporter.TICKS_PER_BEAT // 4
+    total_steps = bars * session.steps
+    energies = tempo_map = None
+    duration = total_steps * 60.0 / session.bpm / 4
+    if session.automation:
+        auto = AutomationMap(session.automation, session.steps)
+        energies = auto.energies(0, total_steps, session.energy)
+        tempo_map = auto.tempo_map(0, total_steps, ticks_per_step) or None
+        if tempo_map:
+            ends = [tick for tick, _ in tempo_map[1:]] + [total_steps * ticks_per_step]
+            duration = sum((end - tick) * tempo for (tick, tempo), end in zip(tempo_map, ends))
+            duration /= exporter.TICKS_PER_BEAT * 1e6
+
+    t0 = time.perf_counter()
+    mid_path = exporter.render_loop(
+        patterns=[p.clone_for_export() for p in patterns],
+        track_names=names,
+        bars=bars,
+        steps_per_bar=session.steps,
+        bpm=session.bpm,
+        energy=session.energy,
+        filename=None,
+        energies=energies,
+        tempo_map=tempo_map,
+    )
+
+    tracks = [
+        (p.cfg.role, exporter.render_notes(p.clone_for_export(), bars, session.steps, session.energy, energies))
+        for p in patterns
+    ]
+    wav_path = PreviewRenderer().render(
+        tracks,
+        bpm=session.bpm,
+        ticks_per_beat=exporter.TICKS_PER_BEAT,
+        total_ticks=total_steps * ticks_per_step,
+        path=str(Path(mid_path).with_suffix(".wav")),
+        tempo_map=tempo_map,
+    )
+    elapsed = time.perf_counter() - t0
 
+    print(f"✓ MIDI: {mid_path}")
+    print(f"✓ WAV:  {wav_path}")
+    print(f"Render: {elapsed * 1000:.0f} ms para {duration:.1f} s de audio "
+          f"({duration / max(elapsed, 1e-9):.0f}x tiempo real)")
 
-def build_patterns(session: SessionConfig):
+
+def run_replay(log_path: str, out_path: Optional[str]) -> None:
+    """Render offline de un set grabado con --control-log (ver core/replay.py)."""
+    from core.replay import replay_log
+
+    try:
+        result = replay_log(log_path, out_path)
+    except Exception as e:
+        print(f"✗ No se pudo reproducir {log_path}: {e}")
+        sys.exit(1)
+    print(f"✓ MIDI: {result.path}")
+    print(f"Replay: {result.steps} steps, {result.notes} notas, {result.seconds:.1f} s de set en "
+          f"{result.elapsed * 1000:.0f} ms ({result.seconds / max(result.elapsed, 1e-9):.0f}x tiempo real)")
+
+
+def run_grooves(args) -> None:
     """
-    Construye TrackConfig, TrackPattern y TrackState a partir de SessionConfig.
-    Inyecta el theme como 'style' para activar pattern packs por estilo.
+    Búsqueda de grooves (ver core/grooves.py): genera y puntúa compases
+    candidatos de un rol, imprime los mejores como entradas de pattern pack
+    y los exporta a out/grooves_<estilo>_<rol>.mid.
     """
-    cfgs = []
-    patterns = []
-    states = []
-
-    style = getattr(session, "theme", "custom")
-
-    for t in session.tracks:
-        cfg = TrackConfig(
-            name=t.name,
-            role=t.role,
-            root=t.root,
-            scale=t.scale,
-            density=t.density,
-            steps=t.steps,
-            style=style,
-        )
-        cfgs.append(cfg)
-        patterns.append(TrackPattern(cfg))
-        states.append(TrackState(cfg.name))
-
-    return cfgs, patterns, states
+    from core.grooves import GrooveSpec, METRICS, export_candidates, pack_literal, search
+
+    spec = GrooveSpec(role=args.grooves, style=args.groove_style, target_density=args.groove_density)
+    seed = parse_seed(args.seed or "") or 0
+    t0 = time.perf_counter()
+    best = search(spec, n=args.candidates, top=args.top, seed=seed)
+    elapsed = time.perf_counter() - t0
+
+    print(f"{args.candidates} candidatos de {spec.role} ({spec.style}) en {elapsed:.2f} s, seed {seed}")
+    for rank, cand in enumerate(best, 1):
+        metrics = " ".join(f"{m} {cand.metrics[m]:.2f}" for m in METRICS)
+        print(f"{rank:2d}. #{cand.index:<7d} score {cand.score:.3f} | {metrics}")
+    print()
+    print(pack_literal(best, spec.role))
+    if best:
+        path = export_candidates(best, spec, bpm=180, path=f"out/grooves_{spec.style}_{spec.role}.mid")
+        print(f"\n✓ MIDI: {path}")
+
+
+def compile_profiles(profiles_dir: str) -> int:
+    """
+    Valida y compila en caché todos los perfiles de un directorio.
+    Devuelve el código de salida (1 si algún perfil no es válido).
+    """
+    t0 = time.perf_counter()
+    results = ProfileManager(profiles_dir).compile_all()
+    elapsed = time.perf_counter() - t0
+
+    failed = 0
+    for name, errors in results.items():
+        if errors:
+            failed += 1
+            print(f"✗ {name}: {'; '.join(errors)}")
+        else:
+            print(f"✓ {name}")
+    print(f"{len(results)} perfiles, {failed} con errores ({elapsed * 1000:.1f} ms)")
+    return 1 if failed else 0
 
 
 def main() -> None:
@@ -131,294 +231,576 @@ def main() -> None:
         type=str,
         help="Cargar perfil de configuración (ej: studio_home, live_berlin)",
     )
+    parser.add_argument(
+        "--seed",
+        type=str,
+        help="Seed de la sesión (si no se indica, se pregunta al arrancar)",
+    )
+    parser.add_argument(
+        "--preview",
+        action="store_true",
+        help="Render offline a .mid + .wav (voces internas) y salir, sin puertos MIDI",
+    )
+    parser.add_argument(
+        "--bars",
+        type=int,
+        default=4,
+        help="Compases a renderizar con --preview (por defecto 4)",
+    )
+    parser.add_argument(
+        "--compile-profiles",
+        nargs="?",
+        const="profiles",
+        metavar="DIR",
+        help="Validar y compilar en caché todos los perfiles de DIR (por defecto profiles/) y salir",
+    )
+    parser.add_argument(
+        "--sync",
+        metavar="PORT",
+        help="Seguir el MIDI clock (24 ppqn + start/stop/continue) de un puerto de entrada",
+    )
+    parser.add_argument(
+        "--sync-virtual",
+        action="store_true",
+        help="Con --sync, crear PORT como puerto virtual en vez de abrir uno existente",
+    )
+    parser.add_argument(
+        "--sync-replay",
+        metavar="FILE",
+        help="Seguir un stream de reloj grabado (ver bench/clock_sync.py) en vez de un puerto",
+    )
+    parser.add_argument(
+        "--clock-out",
+        nargs="+",
+        metavar="PORT",
+        help="Enviar MIDI clock (24 ppqn + start/stop) a estos puertos (sustituye clock_out del perfil)",
+    )
+    parser.add_argument(
+        "--osc",
+        nargs="?",
+        type=int,
+        const=OSC_PORT,
+        metavar="PORT",
+        help=f"Servidor de control OSC/UDP (por defecto en el puerto {OSC_PORT})",
+    )
+    parser.add_argument(
+        "--osc-host",
+        default=OSC_HOST,
+        help=f"Dirección en la que escucha el servidor OSC (por defecto {OSC_HOST})",
+    )
+    parser.add_argument(
+        "--mp",
+        action="store_true",
+        help="Salida MIDI en un proceso aparte (memoria compartida): la UI no afecta al timing",
+    )
+    parser.add_argument(
+        "--lookahead",
+        type=float,
+        default=20.0,
+        metavar="MS",
+        help="Cuánto se adelanta la generación de cada step a su salida (ms, por defecto 20)",
+    )
+    parser.add_argument(
+        "--prof",
+        action="store_true",
+        help="Perfil por fases activo desde el arranque (overlay con T, histograma al salir)",
+    )
+    parser.add_argument(
+        "--stress",
+        nargs="?",
+        type=float,
+        const=30.0,
+        metavar="SEG",
+        help=f"Prueba de carga: sesión de peor caso (64 pistas, 64 pasos, {STRESS_BPM} BPM, energía 5, "
+             "densidad 1.0) contra puertos nulos durante SEG segundos (por defecto 30) e informe de deadlines",
+    )
+    parser.add_argument(
+        "--stress-tol",
+        type=float,
+        default=2.0,
+        metavar="MS",
+        help="Con --stress, retraso máximo tolerado por nota (ms, por defecto 2)",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Sin TUI ni teclado (Ctrl+C para salir); pensado para --stress",
+    )
+    parser.add_argument(
+        "--control-log",
+        nargs="?",
+        const="",
+        metavar="FILE",
+        help="Grabar las acciones de control del set en un log binario (por defecto logs/set_<fecha>.dmlog)",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="LOG",
+        help="Reconstruir un set desde su log de control y renderizarlo a .mid (sin puertos MIDI) y salir",
+    )
+    parser.add_argument(
+        "--replay-out",
+        metavar="FILE",
+        help="Con --replay, ruta del .mid (por defecto out/<log>.mid)",
+    )
+    parser.add_argument(
+        "--grooves",
+        choices=ROLES,
+        metavar="ROL",
+        help="Buscar grooves: generar y puntuar compases candidatos de un rol, mostrar los mejores y salir",
+    )
+    parser.add_argument(
+        "--groove-style",
+        default="makina_180",
+        metavar="ESTILO",
+        help="Con --grooves, estilo cuyo pattern pack se usa de esqueleto (por defecto makina_180)",
+    )
+    parser.add_argument(
+        "--groove-density",
+        type=float,
+        default=0.5,
+        metavar="D",
+        help="Con --grooves, densidad de golpes buscada 0..1 (por defecto 0.5)",
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=100_000,
+        metavar="N",
+        help="Con --grooves, número de compases candidatos (por defecto 100000)",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=8,
+        metavar="K",
+        help="Con --grooves, cuántos mejores se muestran y exportan (por defecto 8)",
+    )
+    parser.add_argument(
+        "--deck",
+        action="append",
+        metavar="PERFIL",
+        help="Deck extra con este perfil, en el mismo reloj que el principal (repetible; D cambia de deck, C/V cruzan)",
+    )
     args = parser.parse_args()
+    stress = args.stress is not None
+
+    if args.compile_profiles:
+        sys.exit(compile_profiles(args.compile_profiles))
+
+    if args.grooves:
+        run_grooves(args)
+        return
+
+    if args.replay:
+        # Sesión y seed salen de la cabecera del log
+        run_replay(args.replay, args.replay_out)
+        return
 
     # Seed opcional (visual, sin flags)
     seed_value = None
-    seed_input = input("Seed (Enter = aleatorio): ").strip()
+    if args.seed is not None:
+        seed_input = args.seed.strip()
+    elif args.preview:
+        seed_input = ""
+    elif stress:
+        seed_input = "1"  # carga reproducible entre máquinas
+    else:
+        seed_input = input("Seed (Enter = aleatorio): ").strip()
     if seed_input:
-        try:
-            seed_value = int(seed_input)
-        except ValueError:
-            # Permitir seeds de texto: las hashamos
-            seed_value = abs(hash(seed_input)) % (2**31)
+        # Seeds de texto: hash estable (el mismo texto da el mismo seed siempre)
+        seed_value = parse_seed(seed_input)
         random.seed(seed_value)
         print(f"Usando seed: {seed_value}\n")
+    elif args.control_log is not None:
+        # Sin seed el set no se podría reconstruir: sorteamos uno y va al log
+        seed_value = random.getrandbits(32)
+        print(f"Usando seed: {seed_value} (aleatorio, guardado en el log)\n")
+
+    # --stress no toca perfiles: sesión sintética y sin autoguardado
+    session = stress_session() if stress else get_session_config(args)
+
+    if args.preview:
+        run_preview(session, seed_value, max(1, args.bars))
+        return
+
+    # Decks extra: cada uno con su perfil; el tempo lo marca el primero
+    sessions = [session]
+    for name in args.deck or []:
+        deck_session = ProfileManager().load_profile(name)
+        if deck_session is None:
+            print(f"✗ Perfil '{name}' no encontrado (deck).")
+            sys.exit(1)
+        sessions.append(deck_session)
+    all_tracks = [t for s in sessions for t in s.tracks]
 
-    session = get_session_config(args)
-
-    clock = Clock(bpm=session.bpm)
     dash = LiveDashboard(steps=session.steps)
-    exporter = MidiExporter()  # export rápido (dir por defecto)
 
-    # Sistema de escenas
-    scene_mgr = SceneManager()
+    # Puertos: enumerados una vez y compartidos; el vigilante reconecta
+    # pistas cuyo puerto desaparece y vuelve (IAC/loopback caído, etc.)
+    if stress:
+        # Puertos nulos: sin enumerar ni abrir MIDI real
+        port_mgr = PortManager(lister=lambda: ["null"], opener=lambda name: NullPort())
+    else:
+        port_mgr = get_port_manager()
+    out_proc = None
+    note_queue = None
+    if args.mp:
+        # Salida MIDI en otro proceso: aquí solo se generan eventos con
+        # deadline y se escriben en memoria compartida. Import perezoso:
+        # multiprocessing y shared_memory solo hacen falta con --mp
+        from core.shm_output import OutputProcess, RingSynth
+
+        out_proc = OutputProcess(
+            [t.port_name for t in all_tracks], lookahead=args.lookahead / 1000, null=stress
+        )
+        synths = [RingSynth(out_proc, t.port_name) for t in all_tracks]
+        if not out_proc.start():
+            print("Aviso: el proceso de salida MIDI no ha arrancado a tiempo.")
+    else:
+        # Las notas (con su swing/micro) salen a su hora desde el hilo de la cola
+        note_queue = NoteQueue(late_ms=args.stress_tol)
+        note_queue.start()
+        # Una tabla de voces por puerto: las pistas que comparten puerto (y
+        # canal) comparten voces en el sinte
+        voices = {}
+        synths = [
+            MidiSynth(t.port_name, port_mgr=port_mgr, note_queue=note_queue,
+                      voices=voices.setdefault(t.port_name, VoiceTable()))
+            for t in all_tracks
+        ]
+        offline = port_mgr.offline()
+        if offline:
+            print(f"Aviso: puertos no disponibles (pistas offline hasta que aparezcan): {', '.join(offline)}")
+    port_mgr.start_watcher()
+    engines = []
+    first = 0
+    for d, deck_session in enumerate(sessions):
+        n = len(deck_session.tracks)
+        deck = Engine(deck_session, synths[first:first + n], seed=deck_seed(seed_value, d))
+        deck.exporter = MidiExporter()  # export rápido (dir por defecto)
+        engines.append(deck)
+        first += n
+    # Con varios decks el bucle maneja un DeckSet (se usa como un Engine)
+    engine = DeckSet(engines, bar_steps=engines[0].session.steps) if len(engines) > 1 else engines[0]
+
+    # Log de control: cada comando aplicado, con su step (replay con --replay)
+    control_log = None
+    if args.control_log is not None and len(engines) > 1:
+        print("Aviso: el log de control solo admite un deck; no se graba.")
+    elif args.control_log is not None:
+        try:
+            control_log = ControlLog(args.control_log or default_log_path(), session, seed_value)
+            engine.control_log = control_log
+            print(f"✓ Log de control: {control_log.path}")
+        except Exception as e:
+            print(f"✗ No se pudo crear el log de control: {e}")
+    clock = engine.clock
+
+    # Perfil por fases: teclas, UI, step, generación por pista, envío, note_off
+    profiler = engine.profiler
+    profiler.enabled = args.prof
+    if note_queue is not None:
+        note_queue.profiler = profiler
+
+    # Guardado automático (debounce + escritura atómica) de la sesión viva.
+    # Con varios decks se guarda el deck A (ver DeckSet.live_session)
+    autosaver = None
+    if not stress:
+        autosaver = AutoSaver(engine.live_session, version_fn=engine.state_version)
+        autosaver.start()
+
+    # Pre-render en segundo plano del próximo compás de cada escena
+    for deck in engines:
+        deck.prerenderer = ScenePrerenderer(deck.scene_mgr)
+        deck.prerenderer.start()
+
+    # Reloj externo: el tempo y el transporte los marca otro equipo (DAW)
+    sync = None
+    sync_source = None
+    if args.sync or args.sync_replay:
+        sync = MidiClockFollower(clock, inbox=INBOX)
+        engine.playing = False  # hasta que llegue start/continue
+        for deck in engines:
+            deck.automation_tempo = False  # las rampas de BPM las hace el maestro
+        try:
+            if args.sync_replay:
+                sync_source = ClockReplayer(load_clock_stream(args.sync_replay), sync)
+                sync_source.start()
+            else:
+                sync_source = open_clock_input(args.sync, sync, virtual=args.sync_virtual)
+        except Exception as e:
+            print(f"✗ No se pudo abrir el reloj externo: {e}")
+            sys.exit(1)
 
-    track_cfgs, track_patterns, track_states = build_patterns(session)
-    synths = [MidiSynth(t.port_name) for t in session.tracks]
+    # Reloj maestro: enviamos clock desde un hilo propio y su rejilla
+    # marca los steps (las notas caen sobre los ticks que ven los esclavos)
+    clock_out = None
+    clock_out_ports = args.clock_out if args.clock_out is not None else session.clock_out
+    if clock_out_ports and sync is not None:
+        print("Aviso: con --sync no se envía MIDI clock (el maestro es el reloj externo).")
+    elif clock_out_ports:
+        # Intervalo de cambio de hilo más corto: el hilo del reloj recupera
+        # el GIL antes cuando el bucle principal está dibujando la UI
+        sys.setswitchinterval(min(sys.getswitchinterval(), 0.0005))
+        clock_out = MidiClockSender(clock, clock_out_ports, port_mgr=port_mgr)
+        clock_out.start()
+
+    # Control remoto OSC: mismos comandos que el teclado, a la misma bandeja
+    osc = None
+    if args.osc is not None:
+        # Import perezoso: asyncio solo hace falta con --osc
+        from core.osc import OscServer
+
+        osc = OscServer(INBOX, host=args.osc_host, port=args.osc)
+        if osc.start():
+            print(f"✓ OSC escuchando en {osc.host}:{osc.port}")
+        else:
+            print(f"✗ No se pudo abrir OSC en {args.osc_host}:{args.osc}: {osc.error}")
+            osc = None
 
-    selected_track = 0
-    playing = True
-    current_step = 0
-    energy = session.energy
-    last_export: str | None = None
-    scene_mode = False  # Si está True, números cargan escenas; si está False, números seleccionan pistas
+    # Base de tiempo de los steps: reloj externo, reloj maestro o interna
+    grid = sync or clock_out
+    grid_epoch = 0
+    grid_tick = 0  # tick de canción del próximo step
 
     ui_update_counter = 0  # Contador para dibujar UI solo cada N iteraciones
     UI_UPDATE_INTERVAL = 4  # Actualizar UI cada 4 steps
 
     # Hilo para lectura de teclado
-    t = threading.Thread(target=input_worker, daemon=True)
-    t.start()
-
+    if not args.headless:
+        t = threading.Thread(target=input_worker, daemon=True)
+        t.start()
+
+    # --stress: mide cada step del bucle real y para a los SEG segundos
+    monitor = DeadlineMonitor() if stress else None
+    stress_failed = False
+    stress_end = now() + args.stress if stress else None
+
+    def apply_commands() -> None:
+        # Aplica TODOS los comandos pendientes (no uno por step)
+        prof = active(profiler)
+        if prof is not None:
+            t0 = now_ns()
+        if INBOX.drain(engine) and autosaver is not None:
+            autosaver.notify()
+        if prof is not None:
+            prof.add("input", now_ns() - t0)
+        if engine.quit_requested:
+            raise KeyboardInterrupt
+        if clock_out is not None and engine.playing != clock_out.playing:
+            # Play/pausa del transporte -> start/continue/stop a los esclavos
+            if engine.playing:
+                clock_out.play()
+            else:
+                clock_out.pause()
+
+    def wait_grid_step() -> bool:
+        """
+        Espera al instante del próximo step en la rejilla de MIDI clock
+        (suavizada si es externa). Devuelve False si no llega ninguno en
+        100 ms (parado, sin clock), para que el bucle siga dibujando la UI
+        y liberando notas.
+        """
+        nonlocal grid_epoch, grid_tick, step_time
+        tps = grid.ticks_per_step
+        idle_until = now() + 0.1
+        while True:
+            if grid.epoch != grid_epoch:
+                # start / song position: recolocar el motor
+                grid_epoch = grid.epoch
+                grid_tick = -(-grid.epoch_tick // tps) * tps
+                engine.locate(grid_tick // tps)
+            deadline = grid.step_deadline(grid_tick)
+            t_now = now()
+            if deadline is None:
+                if t_now >= idle_until:
+                    return False
+                timeout = 0.002
+            else:
+                if deadline - lead <= t_now:
+                    step_time = deadline
+                    return True
+                # La predicción se afina con cada tick: revisar cada 5 ms
+                timeout = min(deadline - lead - t_now, 0.005)
+            if INBOX.wait(timeout):
+                apply_commands()
+
+    def run_step() -> None:
+        prof = active(profiler)
+        if prof is not None:
+            t0 = now_ns()
+        started = now() if monitor is not None else 0.0
+        engine.step(at=step_time)
+        if monitor is not None:
+            monitor.add(step_time, lead, started, now())
+        if prof is not None:
+            prof.add("step", now_ns() - t0)
+
+    if clock_out is not None:
+        apply_commands()  # arranca el transporte (start) si el motor está en marcha
+    # Cada step se genera `lead` segundos antes de su instante nominal
+    # (step_time) y la cola de notas (o el proceso de salida con --mp) envía
+    # cada nota a su hora exacta. El lead cubre además el micro negativo
+    # más adelantado.
+    base_lead = args.lookahead / 1000
+    lead = base_lead + engine.max_early() * clock.get_step_duration()
+    step_time = now()
+    if stress:
+        # El primer step también con su lead (si no, siempre contaría como tarde)
+        step_time += lead
+    step_due = grid is None
     try:
         while True:
-            step_start_time = now()  # Marca exacta del inicio del step
-
-            # Procesar solo UNA tecla por iteración para no bloquear el audio
-            if not KEY_QUEUE.empty():
-                key = KEY_QUEUE.get()
-
-                # Play/Pause
-                if key == " ":
-                    playing = not playing
-
-                # Modo de escenas - activar/desactivar
-                elif key.lower() == "i":
-                    scene_mode = not scene_mode
-                    mode_label = "Scene" if scene_mode else "Jam"
-                    print(f"\n→ Modo: {mode_label}")
-
-                # Selección de pista (1-8) o carga de escena (1-9 si scene_mode)
-                elif key in ("1", "2", "3", "4", "5", "6", "7", "8", "9"):
-                    if scene_mode:
-                        # Modo escenas: números cargan escenas
-                        slot = int(key)
-                        # Crear un wrapper simple para pasar energía
-                        class _EnergyHolder:
-                            pass
-                        holder = _EnergyHolder()
-                        holder.value = energy
-
-                        if scene_mgr.load_scene(slot, clock, track_states, track_cfgs, holder):
-                            energy = scene_mgr.scenes[slot].energy
-                            print(f"✓ Escena {slot} cargada")
-                        else:
-                            print(f"✗ Escena {slot} no encontrada")
-                    else:
-                        # Modo Jam: números seleccionan pistas (1-8)
-                        if key != "9":  # 9 solo en scene_mode
-                            idx = int(key) - 1
-                            if 0 <= idx < len(track_states):
-                                selected_track = idx
-
-                # BPM -
-                elif key.lower() == "a":
-                    clock.set_bpm(clock.bpm - 2)
-
-                # BPM +
-                elif key.lower() == "s":
-                    clock.set_bpm(clock.bpm + 2)
-
-                # Energy -
-                elif key.lower() == "z":
-                    energy = max(1, energy - 1)
-
-                # Energy +
-                elif key.lower() == "x":
-                    energy = min(5, energy + 1)
-
-                # Mute pista seleccionada
-                elif key.lower() == "q":
-                    ts = track_states[selected_track]
-                    ts.muted = not ts.muted
-                    if ts.muted:
-                        ts.solo = False
-
-                # Solo pista seleccionada
-                elif key.lower() == "w":
-                    target = track_states[selected_track]
-                    if target.solo:
-                        target.solo = False
-                    else:
-                        for i, ts in enumerate(track_states):
-                            ts.solo = (i == selected_track)
-                            if ts.solo:
-                                ts.muted = False
-
-                # Random suave pista seleccionada (si no está lock)
-                elif key.lower() == "e":
-                    ts = track_states[selected_track]
-                    if not ts.locked:
-                        p = track_patterns[selected_track]
-                        p.randomize_mode()
-                        p.randomize_density_soft()
-
-                # Lock / Unlock pista seleccionada
-                elif key.lower() == "l":
-                    ts = track_states[selected_track]
-                    ts.locked = not ts.locked
-
-                # Densidad - pista seleccionada
-                elif key.lower() == "o":
-                    cfg = track_cfgs[selected_track]
-                    cfg.density = max(0.0, cfg.density - 0.1)
-
-                # Densidad + pista seleccionada
-                elif key.lower() == "p":
-                    cfg = track_cfgs[selected_track]
-                    cfg.density = min(1.0, cfg.density + 0.1)
-
-                # Transpose - pista seleccionada
-                elif key == ",":
-                    cfg = track_cfgs[selected_track]
-                    cfg.root = max(12, cfg.root - 1)
-
-                # Transpose + pista seleccionada
-                elif key == ".":
-                    cfg = track_cfgs[selected_track]
-                    cfg.root = min(100, cfg.root + 1)
-
-                # Fill: pedir fill
-                elif key.lower() == "f":
-                    for p in track_patterns:
-                        p.request_fill()
-
-                # Export rápido: todas las pistas activas, 4 compases
-                elif key == "r":
-                    bars = 4
-                    steps_per_bar = session.steps
-                    active_patterns = []
-                    active_names = []
-                    for cfg, pattern, ts in zip(
-                            track_cfgs, track_patterns, track_states
-                    ):
-                        if ts.muted:
-                            continue
-                        cloned = pattern.clone_for_export()
-                        active_patterns.append(cloned)
-                        active_names.append(cfg.name)
-
-                    if active_patterns:
-                        path = exporter.render_loop(
-                            patterns=active_patterns,
-                            track_names=active_names,
-                            bars=bars,
-                            steps_per_bar=steps_per_bar,
-                            bpm=clock.bpm,
-                            energy=energy,
-                            filename=None,
-                        )
-                        last_export = path
-
-                # Guardar escena (Shift+1-9)
-                elif key.startswith("SHIFT+") and key[6:] in "123456789":
-                    slot = int(key[6:])
-                    # Guardar el estado de energía actual
-                    scene_mgr.save_scene(slot, session, clock, track_states, track_cfgs, energy)
-
-                # ESC -> salir
-                elif key == "\x1b":
-                    raise KeyboardInterrupt
+            apply_commands()
+            if stress_end is not None and step_time >= stress_end:
+                break
 
             # Actualizar UI solo cada N iteraciones para no bloquear audio
             ui_update_counter += 1
-            if ui_update_counter >= UI_UPDATE_INTERVAL:
+            if ui_update_counter >= UI_UPDATE_INTERVAL and not args.headless:
                 ui_update_counter = 0
+                prof = active(profiler)
+                if prof is not None:
+                    t0 = now_ns()
+
+                # Deck seleccionado (con un solo deck, el motor)
+                track_states = engine.track_states
+                track_cfgs = engine.track_cfgs
+                scene_mgr = engine.scene_mgr
+                for ts, synth in zip(track_states, engine.synths):
+                    ts.offline = not synth.online
 
                 # Construir línea de info de la pista seleccionada
+                selected_track = engine.selected_track
                 if 0 <= selected_track < len(track_states):
                     cfg = track_cfgs[selected_track]
-                    setup = session.tracks[selected_track]
+                    setup = engine.session.tracks[selected_track]
                     ts = track_states[selected_track]
                     selected_info = (
                         f"SEL: {cfg.name} | ROLE: {cfg.role} | PORT: {setup.port_name} | "
-                        f"ROOT: {cfg.root} | SCALE: {cfg.scale} | DENS: {cfg.density:.2f} | "
+                        f"ROOT: {cfg.root} | SCALE: {cfg.scale} | DENS: {cfg.density:.2f} | SWING: {cfg.swing:.2f} | "
                         f"LOCK: {'YES' if ts.locked else 'NO'}"
                     )
                 else:
                     selected_info = ""
 
+                stats = [
+                    engine.status_line() if len(engines) > 1 else None,
+                    engine.status,
+                    grid.stats() if grid is not None else None,
+                    out_proc.stats() if out_proc is not None else None,
+                    note_queue.stats() if note_queue is not None and note_queue.sent else None,
+                    osc.stats() if osc is not None else None,
+                    INBOX.stats() if INBOX.applied else None,
+                ]
+                if scene_mgr.scenes:
+                    stats.append(engine.prerenderer.stats())
+
                 # Render UI (operación costosa - solo cada N iteraciones)
                 dash.draw(
                     bpm=clock.bpm,
-                    energy=energy,
-                    mode="Scene" if scene_mode else "Jam",
-                    current_step=current_step,
+                    energy=engine.energy,
+                    mode="Scene" if engine.scene_mode else "Jam",
+                    current_step=engine.current_step,
                     tracks=track_states,
                     selected_index=selected_track,
                     selected_info=selected_info,
-                    last_export=last_export,
+                    last_export=engine.last_export,
                     seed=seed_value,
                     current_scene=scene_mgr.current_scene,
+                    pending_scene=engine.pending_scene,
+                    morph=engine.morph_label() or (
+                        f"{engine.morph_bars} bars" if engine.morph_bars else None
+                    ),
+                    stats=" | ".join(s for s in stats if s) or None,
+                    overlay=profiler.overlay(clock.get_step_duration() * 1e9) if prof is not None else None,
+                    steps=engine.session.steps,
                 )
+                if prof is not None:
+                    prof.add("ui", now_ns() - t0)
 
-            # Lógica de generación (ocurre ANTES del sleep para precisión de timing)
-            if playing:
-                any_solo = any(ts.solo for ts in track_states)
-
-                for cfg, pattern, ts, synth in zip(
-                        track_cfgs, track_patterns, track_states, synths
-                ):
-                    if any_solo and not ts.solo:
-                        continue
-                    if ts.muted:
-                        continue
-
-                    role = cfg.role
-                    energy_boost = (energy - 3) * 5  # -10 a +10
-
-                    if role == "kick":
-                        vel, length = 120 + energy_boost, 0.04
-                    elif role == "bass":
-                        vel, length = 112 + energy_boost, 0.09
-                    elif role in ("hats", "perc"):
-                        vel, length = 70 + (energy_boost * 2), 0.02
-                    elif role in ("stab", "lead"):
-                        vel, length = 90 + energy_boost, 0.11
-                    elif role == "pad":
-                        vel, length = 80 + energy_boost, 0.25
-                    else:
-                        vel, length = 90 + energy_boost, 0.08
-
-                    vel = max(1, min(127, vel))
-
-                    note = pattern.step_note(current_step, energy)
-                    if note is not None:
-                        synth.schedule_note(note=note, velocity=vel, length=length)
-
-                # Procesar note_off pendientes
-                for s in synths:
-                    s.process_pending()
-
-                # Avanzar step
-                current_step = (current_step + 1) % session.steps
-
-                # Si hemos completado ciclo, avisar a patrones (para fills, etc.)
-                if current_step == 0:
-                    for p in track_patterns:
-                        p.advance_bar()
-            else:
-                # Pausa: solo mantenemos limpieza de notas
-                for s in synths:
-                    s.process_pending()
+            if grid is not None:
+                if step_due:
+                    run_step()
+                    grid_tick += grid.ticks_per_step
+                else:
+                    engine.process_pending()
+                lead = base_lead + engine.max_early() * clock.get_step_duration()
+                step_due = wait_grid_step()
+                continue
 
-            # Dormir el tiempo exacto que falta para el siguiente step
-            # Esto hace el timing preciso sin depender de console.clear()
-            elapsed = now() - step_start_time
-            sleep_time = clock.get_step_duration() - elapsed
-            if sleep_time > 0:
-                time.sleep(sleep_time)
+            # Lógica de generación (ocurre ANTES del sleep para precisión de timing)
+            run_step()
+
+            # Esperar al siguiente step (deadline absoluto: el retraso de un
+            # step no se acumula). Si llega input mientras tanto se aplica
+            # en el acto y se sigue esperando hasta la misma marca.
+            step_duration = clock.get_step_duration()
+            step_time += step_duration
+            if now() - step_time > step_duration:
+                # Bloqueo largo: reenganchar sin ráfaga de steps atrasados
+                step_time = now()
+            lead = base_lead + engine.max_early() * step_duration
+            deadline = step_time - lead
+            while True:
+                remaining = deadline - now()
+                if remaining <= 0:
+                    break
+                if INBOX.wait(remaining):
+                    apply_commands()
 
     except KeyboardInterrupt:
-        # Apagar notas y guardar sesión
-        for s in synths:
-            s.process_pending()
-
-        print("\nGuardando sesión...")
-        save_last_session(session)
-        print("✓ Sesión guardada.")
-        sys.exit(0)
+        pass
+    finally:
+        # Apagar notas y guardar sesión (también si el bucle cae por un error)
+        engine.process_pending()
+        stress_notes = None
+        if monitor is not None:
+            # Métricas de envío antes de parar la salida (el ring se libera)
+            if note_queue is not None:
+                stress_notes = (note_queue.sent, note_queue.late, note_queue.worst_ms)
+            elif out_proc is not None:
+                sent, _, _, worst = out_proc.ring.read_stats()
+                stress_notes = (sent, out_proc.ring.late_count(args.stress_tol), worst)
+        if note_queue is not None:
+            note_queue.stop()
+        # Panic: note_off de lo que aún suena y CC 123 (All Notes Off)
+        engine.all_notes_off()
+        for deck in engines:
+            deck.prerenderer.stop()
+        port_mgr.stop()
+        if out_proc is not None:
+            out_proc.stop()
+        if clock_out is not None:
+            clock_out.stop()
+        if osc is not None:
+            osc.stop()
+        if sync_source is not None:
+            try:
+                sync_source.close()
+            except Exception:
+                pass
+
+        if control_log is not None:
+            control_log.close(engine.step_index)
+            print(f"✓ Log de control: {control_log.records} registros en {control_log.path}")
+
+        if autosaver is not None:
+            print("\nGuardando sesión...")
+            if autosaver.stop():
+                print("✓ Sesión guardada.")
+        if profiler.has_data():
+            print()
+            print(profiler.dump(clock.get_step_duration() * 1e9))
+        if monitor is not None:
+            child_cpu = children_cpu() if out_proc is not None else None
+            print()
+            print("\n".join(monitor.report(session, clock.get_step_duration(), stress_notes, args.stress_tol, child_cpu)))
+            stress_failed = monitor.failed(stress_notes[1] if stress_notes else 0)
+
+    if stress_failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
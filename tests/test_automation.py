@@ -0,0 +1,56 @@
+import pytest
+
+from core.automation import AutomationMap, ramp_duration
+
+DATA = {"bpm": [[0, 120], [1, 150], [2, 140]], "energy": [[0, 1], [2, 5]]}
+
+
+def _integrate(b0: float, b1: float, beats: float, n: int = 20_000) -> float:
+    """60 / bpm(x) por el punto medio, con el tempo lineal de b0 a b1."""
+    h = beats / n
+    return sum(60.0 / (b0 + (b1 - b0) * (i + 0.5) / n) * h for i in range(n))
+
+
+@pytest.mark.parametrize("b0, b1, beats", [(120, 180, 4), (174, 90, 1), (140, 140, 8), (60, 61, 0.25)])
+def test_ramp_duration_matches_numeric_integration(b0, b1, beats) -> None:
+    assert ramp_duration(b0, b1, beats) == pytest.approx(_integrate(b0, b1, beats), rel=1e-9)
+
+
+def test_tempos_stay_within_one_microsecond_of_times() -> None:
+    for steps_per_beat in (4, 3):
+        auto = AutomationMap(DATA, steps_per_bar=16, steps_per_beat=steps_per_beat)
+        elapsed = 0
+        for k, tempo in enumerate(auto.tempos):
+            elapsed += tempo
+            # tempos es µs por negra: el step dura tempo / steps_per_beat
+            assert abs(elapsed / steps_per_beat - auto.times[k + 1] * 1e6) < 1
+
+
+def test_past_the_end_without_loop_holds_final_values() -> None:
+    auto = AutomationMap(DATA, steps_per_bar=16)
+    assert auto.length == 32
+
+    energies = auto.energies(28, 8, default=3)
+    assert energies[:4] == auto.energy[28:]
+    assert energies[4:] == [5] * 4
+
+    tempo_map = auto.tempo_map(30, 6, ticks_per_step=120)
+    assert tempo_map[:2] == [(0, auto.tempos[30]), (120, auto.tempos[31])]
+    assert tempo_map[2:] == [(240, round(60e6 / 140))]
+    assert auto.tempo_map(40, 4, 120) == [(0, round(60e6 / 140))]
+
+
+def test_past_the_end_with_loop_wraps_around() -> None:
+    auto = AutomationMap(dict(DATA, loop=True), steps_per_bar=16)
+
+    assert auto.energies(30, 4, default=3) == auto.energy[30:] + auto.energy[:2]
+    assert auto.energies(32 * 3 + 5, 1, default=3) == [auto.energy[5]]
+
+    tempo_map = auto.tempo_map(31, 2, ticks_per_step=120)
+    assert tempo_map == [(0, auto.tempos[31]), (120, auto.tempos[0])]
+
+
+def test_missing_lane_leaves_values_untouched() -> None:
+    auto = AutomationMap({"energy": [[0, 2], [1, 4]]}, steps_per_bar=16)
+    assert auto.tempo_map(0, 16, 120) == []
+    assert AutomationMap({"bpm": [[0, 170]]}, 16).energies(0, 3, default=4) == [4, 4, 4]
@@ -0,0 +1,29 @@
+from pathlib import Path
+
+import mido
+
+from core.midi_export import MidiExporter
+from core.pattern import TrackConfig, TrackPattern
+
+
+def _pattern(role: str, root: int, seed: int) -> TrackPattern:
+    cfg = TrackConfig(name=role.upper(), role=role, root=root, scale="darktech", density=0.8, steps=16)
+    return TrackPattern(cfg, seed=seed)
+
+
+def test_stems_with_same_track_name_do_not_overwrite(tmp_path: Path) -> None:
+    # "BASS 1" y "BASS?1" se sanean igual: antes escribían el mismo archivo
+    exporter = MidiExporter(output_dir=str(tmp_path))
+    patterns = [_pattern("kick", 36, 1), _pattern("bass", 40, 2), _pattern("bass", 43, 3)]
+    names = ["KICK", "BASS 1", "BASS?1"]
+
+    results = exporter.render_stems(
+        patterns=patterns, track_names=names, bars=1, steps_per_bar=16, bpm=174, energy=5, filename="loop",
+    )
+
+    paths = [r.path for r in results]
+    assert len(set(paths)) == len(patterns)
+    assert [Path(p).name for p in paths] == ["loop_00_KICK.mid", "loop_01_BASS_1.mid", "loop_02_BASS_1.mid"]
+    for path, name in zip(paths, names):
+        track = mido.MidiFile(path).tracks[0]
+        assert track[0].name == name
@@ -0,0 +1,114 @@
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import mido
+
+from core.commands import Command
+from core.config import SessionConfig, TrackSetup
+from core.control_log import RECORD, ControlLog, read_log
+from core.engine import Engine
+from core.midi_export import MidiExporter
+from core.replay import _CaptureSynth, replay_log
+
+TPS = MidiExporter.TICKS_PER_BEAT // 4  # ticks por step en el .mid del replay
+
+
+def _session() -> SessionConfig:
+    tracks = [
+        TrackSetup(name="KICK", role="kick", port_name="null", root=36, scale="darktech", density=1.0, steps=16),
+        TrackSetup(name="BASS", role="bass", port_name="null", root=40, scale="darktech", density=0.7, steps=16,
+                   swing=0.2),
+        TrackSetup(name="HATS", role="hats", port_name="null", root=42, scale="darktech", density=0.6, steps=16,
+                   micro=[0.0, -0.1, 0.1]),
+    ]
+    return SessionConfig(bpm=174, steps=16, energy=3, tracks=tracks)
+
+
+# Acciones en vivo por step: comandos (o ("locate", step)) antes de generarlo
+SCRIPT: Dict[int, List] = {
+    0: [Command("scene_save", value=1)],
+    5: [Command("density_set", track=1, value=0.2), Command("root_set", track=1, value=43),
+        Command("energy_set", value=5), Command("bpm_set", value=180)],
+    9: [Command("scene_save", value=2)],
+    20: [Command("scene", value=1)],
+    40: [Command("morph_bars", value=2), Command("scene", value=2)],
+    70: [("locate", 3)],
+    90: [Command("mute", track=0)],
+}
+STEPS = 120
+
+
+def _live(log_path: Path) -> List[List[Tuple[int, int, int]]]:
+    """Toca el guion con synths de captura y log de control; notas (tick, nota, vel) por pista."""
+    session = _session()
+    captured = []
+    engine = Engine(session, [_CaptureSynth(i, captured) for i in range(len(session.tracks))], seed=7)
+    log = ControlLog(str(log_path), session, 7)
+    engine.control_log = log
+
+    notes: List[List[Tuple[int, int, int]]] = [[] for _ in session.tracks]
+    t = 0.0
+    for k in range(STEPS):
+        for action in SCRIPT.get(k, ()):
+            if isinstance(action, tuple):
+                engine.locate(action[1])
+            else:
+                engine.apply(action)
+        engine.step(at=t)
+        dur = engine.clock.get_step_duration()
+        for track, at, _, note, vel in captured:
+            notes[track].append((k * TPS + round((at - t) / dur * TPS), note, vel))
+        captured.clear()
+        t += dur
+    log.close(engine.step_index)
+    return [sorted(n) for n in notes]
+
+
+def _replayed(mid_path: str) -> List[List[Tuple[int, int, int]]]:
+    out = []
+    for track in mido.MidiFile(mid_path).tracks[1:]:
+        tick = 0
+        notes = []
+        for msg in track:
+            tick += msg.time
+            if msg.type == "note_on" and msg.velocity > 0:
+                notes.append((tick, msg.note, msg.velocity))
+        out.append(sorted(notes))
+    return out
+
+
+def test_replay_reproduces_live_note_stream(tmp_path: Path) -> None:
+    log_path = tmp_path / "set.dmlog"
+    live = _live(log_path)
+
+    result = replay_log(str(log_path), str(tmp_path / "set.mid"))
+
+    assert result.steps == STEPS
+    assert sum(len(n) for n in live) == result.notes > 0
+    assert _replayed(result.path) == live
+
+
+def test_read_log_round_trip_ignores_truncated_record(tmp_path: Path) -> None:
+    session = _session()
+    path = tmp_path / "set.dmlog"
+    log = ControlLog(str(path), session, 42)
+    written = [
+        (0, Command("scene_save", value=1)),
+        (3, Command("density_set", track=2, value=0.25)),
+        (3, Command("play")),
+        (17, Command("locate", value=5)),
+    ]
+    for step, cmd in written:
+        log.write(step, cmd)
+    log.close(30)
+
+    header, records = read_log(str(path))
+    assert header["seed"] == 42
+    assert header["session"]["tracks"][1]["name"] == "BASS"
+    assert records == written + [(30, Command("end"))]
+
+    # Corte a mitad del último registro: se pierde solo ese
+    data = path.read_bytes()
+    path.write_bytes(data[:-(RECORD.size // 2)])
+    _, records = read_log(str(path))
+    assert records == written
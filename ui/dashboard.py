@@ -1,10 +1,17 @@
 from typing import List, Optional
 
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
+# rich se importa de forma perezosa: TrackState se usa también en caminos
+# sin TUI (render offline) y la importación de rich es de las más caras.
+_console = None
 
-console = Console()
+
+def get_console():
+    global _console
+    if _console is None:
+        from rich.console import Console
+
+        _console = Console()
+    return _console
 
 
 class TrackState:
@@ -18,6 +25,7 @@ class TrackState:
         self.solo: bool = False
         self.muted: bool = False
         self.locked: bool = False
+        self.offline: bool = False  # puerto MIDI no disponible
         self.last_step_hit: bool = False
 
     @property
@@ -32,14 +40,26 @@ class TrackState:
             flags.append("SOLO")
         if self.muted:
             flags.append("MUTE")
+        if self.offline:
+            flags.append("OFFLINE")
         if not flags:
             flags.append("ON")
         return "[" + ",".join(flags) + "]"
 
 
 class Dashboard:
-    def __init__(self, steps: int = 16) -> None:
+    """
+    Vista de la sesión. Solo se dibujan las filas del banco visible (el de
+    la pista seleccionada, `bank_size` pistas): con 64 pistas el coste del
+    frame es el de 8 filas más una línea de resumen con un carácter por
+    pista.
+    """
+
+    def __init__(self, steps: int = 16, console=None, bank_size: int = 8) -> None:
         self.steps = steps
+        # Console de rich propia (p.ej. sobre un StringIO en benchmarks); None = la global
+        self.console = console
+        self.bank_size = bank_size
 
     def _bar(self, current_step: int) -> str:
         """
@@ -47,6 +67,21 @@ class Dashboard:
         """
         return "".join("▓" if i == current_step else "░" for i in range(self.steps))
 
+    def _overview(self, tracks: List[TrackState], bank: int) -> str:
+        """
+        Resumen de todos los bancos, un carácter por pista: S solo, M mute,
+        x offline, · activa. El banco visible va entre corchetes.
+        """
+        size = self.bank_size
+        groups = []
+        for b in range(0, len(tracks), size):
+            chars = "".join(
+                "S" if t.solo else "M" if t.muted else "x" if t.offline else "·"
+                for t in tracks[b:b + size]
+            )
+            groups.append(f"\\[{chars}]" if b // size == bank else chars)
+        return " ".join(groups)
+
     def render(
             self,
             bpm: int,
@@ -59,7 +94,15 @@ class Dashboard:
             last_export: Optional[str] = None,
             seed: Optional[int] = None,
             current_scene: Optional[int] = None,
+            pending_scene: Optional[int] = None,
+            morph: Optional[str] = None,
+            stats: Optional[str] = None,
+            overlay: Optional[List[str]] = None,
     ) -> None:
+        from rich.table import Table
+        from rich.panel import Panel
+
+        console = self.console or get_console()
         table = Table.grid(padding=(0, 1))
 
         header_1 = f"BPM: {bpm}"
@@ -67,6 +110,10 @@ class Dashboard:
         header_3 = f"MODE: {mode}"
         if current_scene is not None:
             header_3 += f" | SCENE: {current_scene}"
+        if pending_scene is not None:
+            header_3 += f" | NEXT: {pending_scene}"
+        if morph is not None:
+            header_3 += f" | MORPH: {morph}"
         if seed is not None:
             header_3 += f" | SEED: {seed}"
 
@@ -75,9 +122,22 @@ class Dashboard:
 
         bar = self._bar(current_step)
 
-        for i, t in enumerate(tracks):
+        size = self.bank_size
+        paged = len(tracks) > size
+        bank = max(0, selected_index) // size
+        first = bank * size
+        if paged:
+            n_banks = (len(tracks) + size - 1) // size
+            table.add_row(f"BANK {bank + 1}/{n_banks}  {self._overview(tracks, bank)}")
+            table.add_row("")
+
+        for i in range(first, min(len(tracks), first + size)):
+            t = tracks[i]
             prefix = ">" if i == selected_index else " "
             name = t.name.ljust(10)
+            if paged:
+                # Número absoluto (el de /select por OSC)
+                name = f"{i + 1:>2} {name}"
             table.add_row(f"{prefix}{name} {bar}  {t.label}")
 
         if selected_info:
@@ -89,15 +149,21 @@ class Dashboard:
         console.clear()
         console.print(panel)
 
+        if overlay:
+            # Perfil por fases (tecla T)
+            console.print(Panel.fit("\n".join(overlay), title="PROFILE", border_style="dim"))
+
         if last_export:
             console.print(f"Last export: {last_export}", style="dim")
+        if stats:
+            console.print(stats, style="dim")
 
         console.print(
-            "[SPACE] Play/Pause  [1-8] Sel  [Q] Mute  [W] Solo  [L] Lock  "
-            "[E] Rand  [A/S] BPM-/+  [Z/X] Energy-/+  "
-            "[O/P] Density-/+  [,/.] Root-/+  "
-            "[r] Export rápido  [R] Export avanzado  "
-            "[Shift+1-9] Save scene  [1-9] Load scene  [ESC] Quit",
+            "[SPACE] Play/Pause  [1-8] Sel  \\[\\[/]] Bank-/+  [Q] Mute  [W] Solo  [L] Lock  "
+            "[E] Rand  [A/S] BPM-/+  [Z/X] Energy-/+  [D] Deck  [C/V] Xfade  "
+            "[O/P] Density-/+  [,/.] Root-/+  [G/H] Swing-/+  "
+            "\\[r] Export rápido  [R] Export stems  [T] Profile  "
+            "[Shift+1-9] Save scene  [1-9] Load scene  [M] Morph bars  [N] Cancel morph  [B] Bar/Beat  [ESC] Quit",
             style="dim",
         )
 
@@ -118,7 +184,15 @@ class LiveDashboard:
             last_export: Optional[str] = None,
             seed: Optional[int] = None,
             current_scene: Optional[int] = None,
+            pending_scene: Optional[int] = None,
+            morph: Optional[str] = None,
+            stats: Optional[str] = None,
+            overlay: Optional[List[str]] = None,
+            steps: Optional[int] = None,
     ) -> None:
+        if steps is not None:
+            # Con varios decks, pasos del deck seleccionado
+            self.dashboard.steps = steps
         self.dashboard.render(
             bpm=bpm,
             energy=energy,
@@ -130,4 +204,8 @@ class LiveDashboard:
             last_export=last_export,
             seed=seed,
             current_scene=current_scene,
+            pending_scene=pending_scene,
+            morph=morph,
+            stats=stats,
+            overlay=overlay,
         )